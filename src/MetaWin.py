@@ -2,12 +2,17 @@
 Primary module for entry into MetaWin via the GUI
 """
 
+import multiprocessing
 import sys
-from PyQt6.QtWidgets import QApplication
-from MetaWinMain import MainWindow
-import MetaWinConfig
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # required for resampling worker processes in frozen executables
+
+    # the interface is only imported here, as the resampling workers import this module when they start
+    from PyQt6.QtWidgets import QApplication
+    from MetaWinMain import MainWindow
+    import MetaWinConfig
+
     app = QApplication(sys.argv)
 
     try:
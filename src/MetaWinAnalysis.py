@@ -16,7 +16,7 @@ import MetaWinAnalysisFunctions
 import MetaWinCharts
 from MetaWinMessages import report_warning
 from MetaWinWidgets import add_ok_cancel_help_button_layout, add_cancel_help_button_layout, add_drag_drop_list, \
-    create_list_item, add_effect_choice_to_dialog
+    create_list_item, add_effect_choice_to_dialog, add_seed_choice_to_dialog, seed_from_dialog
 from MetaWinUtils import get_citation, create_reference_list
 from MetaWinLanguage import get_text
 
@@ -41,14 +41,23 @@ class MetaAnalysisOptions:
         self.independent_variable = None
         self.sample_size = None
         self.tip_names = None
+        self.tree_gls = False
+        self.tree_sample = False
         self.nested_vars = []
         self.categorical_vars = []
         self.continuous_vars = []
         self.random_effects = False
         self.log_transformed = False
         self.bootstrap_mean = None
+        self.jackknife_bootstrap = False
+        self.jackknife_groups = None
+        self.jackknife_k = None
+        self.jackknife_samples = None
         self.randomize_model = None
+        self.randomize_early_stop = False
+        self.randomize_restricted = False
         self.randomize_phylogeny = None
+        self.random_seed = None
         self.rosenberg_failsafe = None
         self.rosenthal_failsafe = None
         self.orwin_failsafe = None
@@ -114,6 +123,10 @@ class MetaAnalysisOptions:
                               get_citation("Lajeunesse_et_2013"))
                 citations.append("Lajeunesse_2009")
                 citations.append("Lajeunesse_et_2013")
+                if self.tree_gls:
+                    output.append("→ " + get_text("Use linear-time tree algorithm (for large phylogenies)"))
+                if self.tree_sample:
+                    output.append("→ " + get_text("Repeat the analysis for every tree in the phylogeny file"))
             # elif self.structure == RANKCOR:
             #     output.append(get_text("Rank Correlation Analysis"))
             #     output.append("→ {}: ".format(get_text("Citations")) + get_citation("Begg_1994") + ", " +
@@ -143,6 +156,12 @@ class MetaAnalysisOptions:
             elif self.structure == NESTED_MA:
                 nest_labels = [x.label for x in self.nested_vars]
                 output.append("→ {}: ".format(get_text("Nested Variables (top to bottom)")) + ", ".join(nest_labels))
+            elif self.structure == JACKKNIFE:
+                if self.jackknife_groups is not None:
+                    output.append("→ {}: ".format(get_text("Leave out each group of")) + self.jackknife_groups.label)
+                elif self.jackknife_k is not None:
+                    output.append("→ " + get_text("Leave out {} random subsets of {} studies").format(
+                        self.jackknife_samples, self.jackknife_k))
             # elif self.structure == TRIM_FILL:
             #     output.append("→ {}: {}<sub>0</sub>".format(get_text("Estimator of Missing Studies"),
             #                                                 self.k_estimator))
@@ -179,6 +198,8 @@ class MetaAnalysisOptions:
                                                     self.bootstrap_mean, get_text("iterations")),
                                "→ {}: ".format(get_text("Citations")) + get_citation("Adams_et_1997") + ", " +
                                get_citation("Dixon_1993")])
+                if self.jackknife_bootstrap:
+                    output.append("→ " + get_text("Bootstrap the mean with each study left out"))
                 citations.append("Adams_et_1997")
                 citations.append("Dixon_1993")
             output_blocks.append(output)
@@ -190,11 +211,20 @@ class MetaAnalysisOptions:
                 output_blocks.append(["→ {}: {} {}".format(get_text("Use randomization to test model structure"),
                                                            self.randomize_model, get_text("iterations")),
                                       "→ {}: ".format(get_text("Citation")) + get_citation("Adams_et_1997")])
+                if self.randomize_early_stop:
+                    output_blocks[-1].append("→ " + get_text("Stop randomization once its outcome is settled"))
+                if self.randomize_restricted:
+                    output_blocks[-1].append("→ " + get_text("Permute only within the groups of the level above"))
                 citations.append("Adams_et_1997")
             if self.randomize_phylogeny is not None:
                 output_blocks.append(["→ {}: {} {}".format(get_text("Use randomization to test phylogenentic "
                                                                     "structure"), self.randomize_phylogeny,
                                                            get_text("iterations"))])
+            if (self.random_seed is not None) and ((self.bootstrap_mean is not None) or
+                                                   (self.randomize_model is not None) or
+                                                   (self.randomize_phylogeny is not None) or
+                                                   (self.jackknife_k is not None)):
+                output_blocks.append(["→ {}: {}".format(get_text("Random Number Seed"), self.random_seed)])
 
         return output_blocks, citations
 
@@ -357,6 +387,8 @@ class MetaAnalysisSimpleStructureExtraDialog(QDialog):
         self.bootstrap_checkbox = None
         self.bootstrap_n_label = None
         self.bootstrap_n_box = None
+        self.seed_label = None
+        self.seed_box = None
         self.rosenberg_checkbox = None
         self.rosenberg_label = None
         self.rosenberg_alpha_box = None
@@ -515,6 +547,7 @@ class MetaAnalysisSimpleStructureExtraDialog(QDialog):
             options.bootstrap_mean = int(self.bootstrap_n_box.text())
         else:
             options.bootstrap_mean = None
+        options.random_seed = seed_from_dialog(self)
         if self.rosenberg_checkbox.isChecked():
             options.rosenberg_failsafe = float(self.rosenberg_alpha_box.text())
         else:
@@ -615,6 +648,8 @@ class MetaAnalysisGroupStructureExtraDialog(QDialog):
         self.bootstrap_checkbox = None
         self.bootstrap_n_label = None
         self.bootstrap_n_box = None
+        self.seed_label = None
+        self.seed_box = None
         self.randomize_checkbox = None
         self.randomize_n_label = None
         self.randomize_n_box = None
@@ -674,6 +709,7 @@ class MetaAnalysisGroupStructureExtraDialog(QDialog):
             options.bootstrap_mean = int(self.bootstrap_n_box.text())
         else:
             options.bootstrap_mean = None
+        options.random_seed = seed_from_dialog(self)
         if self.randomize_checkbox.isChecked():
             options.randomize_model = int(self.randomize_n_box.text())
         else:
@@ -754,6 +790,8 @@ class MetaAnalysisCumulativeStructureExtraDialog(QDialog):
         self.bootstrap_checkbox = None
         self.bootstrap_n_label = None
         self.bootstrap_n_box = None
+        self.seed_label = None
+        self.seed_box = None
         self.graph_checkbox = None
         self.help = MetaWinConstants.help_index["cumulative_analysis"]
         self.init_ui()
@@ -802,6 +840,7 @@ class MetaAnalysisCumulativeStructureExtraDialog(QDialog):
             options.bootstrap_mean = int(self.bootstrap_n_box.text())
         else:
             options.bootstrap_mean = None
+        options.random_seed = seed_from_dialog(self)
         options.create_graph = self.graph_checkbox.isChecked()
 
 
@@ -878,9 +917,12 @@ class MetaAnalysisLinearStructureExtraDialog(QDialog):
         self.bootstrap_checkbox = None
         self.bootstrap_n_label = None
         self.bootstrap_n_box = None
+        self.seed_label = None
+        self.seed_box = None
         self.randomize_checkbox = None
         self.randomize_n_label = None
         self.randomize_n_box = None
+        self.early_stop_checkbox = None
         self.graph_checkbox = None
         self.help = MetaWinConstants.help_index["linear_analysis"]
         self.init_ui()
@@ -891,7 +933,7 @@ class MetaAnalysisLinearStructureExtraDialog(QDialog):
         options_label = QLabel(get_text("Additional Options"))
         options_label.setStyleSheet(MetaWinConstants.title_label_style)
 
-        randomization_group = add_resampling_options_to_dialog(self, True)
+        randomization_group = add_resampling_options_to_dialog(self, True, early_stop=True)
 
         self.graph_checkbox = QCheckBox(get_text("Graph Regression"))
 
@@ -928,19 +970,24 @@ class MetaAnalysisLinearStructureExtraDialog(QDialog):
         if self.randomize_checkbox.isChecked():
             self.randomize_n_label.setEnabled(True)
             self.randomize_n_box.setEnabled(True)
+            self.early_stop_checkbox.setEnabled(True)
         else:
             self.randomize_n_label.setEnabled(False)
             self.randomize_n_box.setEnabled(False)
+            self.early_stop_checkbox.setEnabled(False)
 
     def set_options(self, options: MetaAnalysisOptions):
         if self.bootstrap_checkbox.isChecked():
             options.bootstrap_mean = int(self.bootstrap_n_box.text())
         else:
             options.bootstrap_mean = None
+        options.random_seed = seed_from_dialog(self)
         if self.randomize_checkbox.isChecked():
             options.randomize_model = int(self.randomize_n_box.text())
+            options.randomize_early_stop = self.early_stop_checkbox.isChecked()
         else:
             options.randomize_model = None
+            options.randomize_early_stop = False
         options.create_graph = self.graph_checkbox.isChecked()
 
 
@@ -1045,6 +1092,8 @@ class MetaAnalysisComplexStructureExtraDialog(QDialog):
         self.bootstrap_checkbox = None
         self.bootstrap_n_label = None
         self.bootstrap_n_box = None
+        self.seed_label = None
+        self.seed_box = None
         self.randomize_checkbox = None
         self.randomize_n_label = None
         self.randomize_n_box = None
@@ -1100,6 +1149,7 @@ class MetaAnalysisComplexStructureExtraDialog(QDialog):
             options.bootstrap_mean = int(self.bootstrap_n_box.text())
         else:
             options.bootstrap_mean = None
+        options.random_seed = seed_from_dialog(self)
         if self.randomize_checkbox.isChecked():
             options.randomize_model = int(self.randomize_n_box.text())
         else:
@@ -1198,9 +1248,12 @@ class MetaAnalysisNestedStructureExtraDialog(QDialog):
         self.bootstrap_checkbox = None
         self.bootstrap_n_label = None
         self.bootstrap_n_box = None
+        self.seed_label = None
+        self.seed_box = None
         self.randomize_checkbox = None
         self.randomize_n_label = None
         self.randomize_n_box = None
+        self.restricted_checkbox = None
         self.graph_checkbox = None
         self.help = MetaWinConstants.help_index["nested_analysis"]
         self.init_ui()
@@ -1211,7 +1264,7 @@ class MetaAnalysisNestedStructureExtraDialog(QDialog):
         options_label = QLabel(get_text("Additional Options"))
         options_label.setStyleSheet(MetaWinConstants.title_label_style)
 
-        randomization_group = add_resampling_options_to_dialog(self, True)
+        randomization_group = add_resampling_options_to_dialog(self, True, restricted=True)
         self.graph_checkbox = QCheckBox(get_text("Graph Mean Effect Sizes (Forest Plot)"))
 
         options_layout = QVBoxLayout()
@@ -1247,19 +1300,24 @@ class MetaAnalysisNestedStructureExtraDialog(QDialog):
         if self.randomize_checkbox.isChecked():
             self.randomize_n_label.setEnabled(True)
             self.randomize_n_box.setEnabled(True)
+            self.restricted_checkbox.setEnabled(True)
         else:
             self.randomize_n_label.setEnabled(False)
             self.randomize_n_box.setEnabled(False)
+            self.restricted_checkbox.setEnabled(False)
 
     def set_options(self, options: MetaAnalysisOptions):
         if self.bootstrap_checkbox.isChecked():
             options.bootstrap_mean = int(self.bootstrap_n_box.text())
         else:
             options.bootstrap_mean = None
+        options.random_seed = seed_from_dialog(self)
         if self.randomize_checkbox.isChecked():
             options.randomize_model = int(self.randomize_n_box.text())
+            options.randomize_restricted = self.restricted_checkbox.isChecked()
         else:
             options.randomize_model = None
+            options.randomize_restricted = False
         options.create_graph = self.graph_checkbox.isChecked()
 
 
@@ -1283,6 +1341,7 @@ class MetaAnalysisPhylogeneticStructureDialog(QDialog):
         self.tips_box = None
         self.columns = None
         self.random_effects_checkbox = None
+        self.tree_gls_checkbox = None
         self.log_transform_box = None
         self.init_ui(data, last_effect, last_var)
 
@@ -1333,6 +1392,8 @@ class MetaAnalysisPhylogeneticStructureDialog(QDialog):
         upper_right_layout.addWidget(self.tips_box)
         upper_right_layout.addStretch(1)
         upper_right_layout.addWidget(self.random_effects_checkbox)
+        self.tree_gls_checkbox = QCheckBox(get_text("Use linear-time tree algorithm (for large phylogenies)"))
+        upper_right_layout.addWidget(self.tree_gls_checkbox)
         upper_layout = QHBoxLayout()
         upper_layout.addLayout(upper_left_layout)
         upper_layout.addLayout(upper_right_layout)
@@ -1374,6 +1435,7 @@ class MetaAnalysisPhylogeneticStructureDialog(QDialog):
         for i in range(self.cont_box.count()):
             options.continuous_vars.append(self.cont_box.item(i).column)
         options.random_effects = self.random_effects_checkbox.isChecked()
+        options.tree_gls = self.tree_gls_checkbox.isChecked()
         options.log_transformed = self.log_transform_box.isChecked()
         options.tip_names = self.columns[self.tips_box.currentIndex()]
 
@@ -1390,6 +1452,9 @@ class MetaAnalysisPhylogeneticStructureExtraDialog(QDialog):
         self.randomize_phylogeny_checkbox = None
         self.randomize_phylogeny_n_label = None
         self.randomize_phylogeny_n_box = None
+        self.seed_label = None
+        self.seed_box = None
+        self.tree_sample_checkbox = None
         self.help = MetaWinConstants.help_index["phylogenetic_glm"]
         self.init_ui()
 
@@ -1423,10 +1488,14 @@ class MetaAnalysisPhylogeneticStructureExtraDialog(QDialog):
         self.randomize_phylogeny_n_box.setValidator(QIntValidator(99, 999999))
         randomization_layout.addWidget(self.randomize_phylogeny_n_box)
         self.click_randomize_phylogeny_checkbox()
+        add_seed_choice_to_dialog(self, randomization_layout)
 
         randomization_group.setLayout(randomization_layout)
 
+        self.tree_sample_checkbox = QCheckBox(get_text("Repeat the analysis for every tree in the phylogeny file"))
+
         options_layout = QVBoxLayout()
+        options_layout.addWidget(self.tree_sample_checkbox)
         options_layout.addWidget(randomization_group)
 
         main_frame = QFrame()
@@ -1471,6 +1540,8 @@ class MetaAnalysisPhylogeneticStructureExtraDialog(QDialog):
             options.randomize_phylogeny = int(self.randomize_phylogeny_n_box.text())
         else:
             options.randomize_phylogeny = None
+        options.random_seed = seed_from_dialog(self)
+        options.tree_sample = self.tree_sample_checkbox.isChecked()
 
 
 class MetaAnalysisJackknifeDialog(QDialog):
@@ -1485,6 +1556,14 @@ class MetaAnalysisJackknifeDialog(QDialog):
         self.columns = None
         self.random_effects_checkbox = None
         self.log_transform_box = None
+        self.leave_study_button = None
+        self.leave_group_button = None
+        self.leave_group_box = None
+        self.leave_k_button = None
+        self.leave_k_label = None
+        self.leave_k_box = None
+        self.leave_k_n_label = None
+        self.leave_k_n_box = None
         self.init_ui(data, last_effect, last_var)
 
     def init_ui(self, data: MetaWinData, last_effect, last_var):
@@ -1496,6 +1575,38 @@ class MetaAnalysisJackknifeDialog(QDialog):
         effect_size_label, variance_label = add_effect_choice_to_dialog(self, data, last_effect, last_var)
         self.random_effects_checkbox = QCheckBox(get_text("Include Random Effects Variance?"))
 
+        # what is left out of each analysis
+        leave_out_group = QGroupBox(get_text("Leave Out"))
+        leave_out_layout = QGridLayout()
+        self.leave_study_button = QRadioButton(get_text("Each Study"))
+        self.leave_study_button.clicked.connect(self.click_leave_out_button)
+        leave_out_layout.addWidget(self.leave_study_button, 0, 0, 1, 2)
+        self.leave_group_button = QRadioButton(get_text("Each Group of"))
+        self.leave_group_button.clicked.connect(self.click_leave_out_button)
+        leave_out_layout.addWidget(self.leave_group_button, 1, 0)
+        self.leave_group_box = QComboBox()
+        for col in self.columns:
+            self.leave_group_box.addItem(col.label)
+        leave_out_layout.addWidget(self.leave_group_box, 1, 1)
+        self.leave_k_button = QRadioButton(get_text("Random Subsets of Studies"))
+        self.leave_k_button.clicked.connect(self.click_leave_out_button)
+        leave_out_layout.addWidget(self.leave_k_button, 2, 0, 1, 2)
+        self.leave_k_label = QLabel(get_text("Studies per Subset"))
+        leave_out_layout.addWidget(self.leave_k_label, 3, 0)
+        self.leave_k_box = QLineEdit()
+        self.leave_k_box.setText("2")
+        self.leave_k_box.setValidator(QIntValidator(1, 999999))
+        leave_out_layout.addWidget(self.leave_k_box, 3, 1)
+        self.leave_k_n_label = QLabel(get_text("Number of Subsets"))
+        leave_out_layout.addWidget(self.leave_k_n_label, 4, 0)
+        self.leave_k_n_box = QLineEdit()
+        self.leave_k_n_box.setText("999")
+        self.leave_k_n_box.setValidator(QIntValidator(99, 999999))
+        leave_out_layout.addWidget(self.leave_k_n_box, 4, 1)
+        leave_out_group.setLayout(leave_out_layout)
+        self.leave_study_button.setChecked(True)
+        self.click_leave_out_button()
+
         options_layout = QVBoxLayout()
         options_layout.addWidget(effect_size_label)
         options_layout.addWidget(self.effect_size_box)
@@ -1503,6 +1614,7 @@ class MetaAnalysisJackknifeDialog(QDialog):
         options_layout.addWidget(variance_label)
         options_layout.addWidget(self.variance_box)
         options_layout.addWidget(self.random_effects_checkbox)
+        options_layout.addWidget(leave_out_group)
 
         main_frame = QFrame()
         main_frame.setFrameShape(QFrame.Shape.Panel)
@@ -1521,11 +1633,28 @@ class MetaAnalysisJackknifeDialog(QDialog):
     def show_help(self):
         webbrowser.open(self.help)
 
+    def click_leave_out_button(self):
+        self.leave_group_box.setEnabled(self.leave_group_button.isChecked())
+        self.leave_k_label.setEnabled(self.leave_k_button.isChecked())
+        self.leave_k_box.setEnabled(self.leave_k_button.isChecked())
+        self.leave_k_n_label.setEnabled(self.leave_k_button.isChecked())
+        self.leave_k_n_box.setEnabled(self.leave_k_button.isChecked())
+
     def set_options(self, options: MetaAnalysisOptions):
         options.effect_data = self.columns[self.effect_size_box.currentIndex()]
         options.effect_vars = self.columns[self.variance_box.currentIndex()]
         options.random_effects = self.random_effects_checkbox.isChecked()
         options.log_transformed = self.log_transform_box.isChecked()
+        if self.leave_group_button.isChecked():
+            options.jackknife_groups = self.columns[self.leave_group_box.currentIndex()]
+        else:
+            options.jackknife_groups = None
+        if self.leave_k_button.isChecked():
+            options.jackknife_k = int(self.leave_k_box.text())
+            options.jackknife_samples = int(self.leave_k_n_box.text())
+        else:
+            options.jackknife_k = None
+            options.jackknife_samples = None
 
 
 class MetaAnalysisJackknifeExtraDialog(QDialog):
@@ -1537,6 +1666,9 @@ class MetaAnalysisJackknifeExtraDialog(QDialog):
         self.bootstrap_checkbox = None
         self.bootstrap_n_label = None
         self.bootstrap_n_box = None
+        self.seed_label = None
+        self.seed_box = None
+        self.jackknife_bootstrap_checkbox = None
         self.graph_checkbox = None
         self.help = MetaWinConstants.help_index["basic_analysis"]
         self.init_ui()
@@ -1547,7 +1679,9 @@ class MetaAnalysisJackknifeExtraDialog(QDialog):
         options_label = QLabel(get_text("Additional Options"))
         options_label.setStyleSheet(MetaWinConstants.title_label_style)
 
+        self.jackknife_bootstrap_checkbox = QCheckBox(get_text("Bootstrap the mean with each study left out"))
         randomization_group = add_resampling_options_to_dialog(self, False)
+        randomization_group.layout().insertWidget(3, self.jackknife_bootstrap_checkbox)
 
         self.graph_checkbox = QCheckBox(get_text("Graph Jackknife Means (Forest Plot)"))
 
@@ -1576,23 +1710,31 @@ class MetaAnalysisJackknifeExtraDialog(QDialog):
         if self.bootstrap_checkbox.isChecked():
             self.bootstrap_n_label.setEnabled(True)
             self.bootstrap_n_box.setEnabled(True)
+            self.jackknife_bootstrap_checkbox.setEnabled(True)
         else:
             self.bootstrap_n_label.setEnabled(False)
             self.bootstrap_n_box.setEnabled(False)
+            self.jackknife_bootstrap_checkbox.setEnabled(False)
 
     def set_options(self, options: MetaAnalysisOptions):
         if self.bootstrap_checkbox.isChecked():
             options.bootstrap_mean = int(self.bootstrap_n_box.text())
+            options.jackknife_bootstrap = self.jackknife_bootstrap_checkbox.isChecked()
         else:
             options.bootstrap_mean = None
+            options.jackknife_bootstrap = False
+        options.random_seed = seed_from_dialog(self)
         options.create_graph = self.graph_checkbox.isChecked()
 
 
-def add_resampling_options_to_dialog(sender, test_model: bool = False):
+def add_resampling_options_to_dialog(sender, test_model: bool = False, early_stop: bool = False,
+                                     restricted: bool = False):
     """
     function to add standard resampling test options to a dialog
 
-    this includes bootstrapping, with or without randomization
+    this includes bootstrapping, with or without randomization, and optionally the choice to stop the
+    randomization as soon as its outcome is settled or to restrict the permutations of a nested analysis to
+    within the groups of the level above
     """
     # resampling tests
     randomization_group = QGroupBox(get_text("Resampling Procedures"))
@@ -1618,19 +1760,27 @@ def add_resampling_options_to_dialog(sender, test_model: bool = False):
         sender.randomize_n_box.setText("999")
         sender.randomize_n_box.setValidator(QIntValidator(99, 999999))
         randomization_layout.addWidget(sender.randomize_n_box)
+        if early_stop:
+            sender.early_stop_checkbox = QCheckBox(get_text("Stop randomization once its outcome is settled"))
+            randomization_layout.addWidget(sender.early_stop_checkbox)
+        if restricted:
+            sender.restricted_checkbox = QCheckBox(get_text("Permute only within the groups of the level above"))
+            randomization_layout.addWidget(sender.restricted_checkbox)
         sender.click_randomize_checkbox()
 
+    add_seed_choice_to_dialog(sender, randomization_layout)
     randomization_group.setLayout(randomization_layout)
     return randomization_group
 
 
 def do_meta_analysis(data, options, decimal_places: int = 4, alpha: float = 0.05, tree: Optional = None,
-                     norm_ci: bool = True, sender=None):
+                     norm_ci: bool = True, sender=None, tree_file: Optional[str] = None):
     """
     primary function controlling the execution of an analysis
 
     based on specific options, farms out analysis to computational functions, then collects and returns
-    results
+    results. tree_file is the file the phylogeny was loaded from, used when a phylogenetic analysis is to be
+    repeated for every tree in the file
     """
     output_blocks = [["<h2>{}</h2>".format(get_text("Analysis"))]]
     options.norm_ci = norm_ci
@@ -1667,6 +1817,12 @@ def do_meta_analysis(data, options, decimal_places: int = 4, alpha: float = 0.05
          citations) = MetaWinAnalysisFunctions.jackknife_meta_analysis(data, options, decimal_places, alpha, norm_ci,
                                                                        sender=sender)
         analysis_values = None
+    elif (options.structure == PHYLOGENETIC_MA) and options.tree_sample and (tree_file is not None):
+        output, citations = MetaWinAnalysisFunctions.phylogenetic_sample_meta_analysis(data, options, tree_file,
+                                                                                       decimal_places, alpha,
+                                                                                       sender=sender)
+        analysis_values = None
+        chart_data = None
     elif options.structure == PHYLOGENETIC_MA:
         output, citations = MetaWinAnalysisFunctions.phylogenetic_meta_analysis(data, options, tree, decimal_places,
                                                                                 alpha, norm_ci, sender=sender)
@@ -1684,7 +1840,7 @@ def do_meta_analysis(data, options, decimal_places: int = 4, alpha: float = 0.05
 
 
 def meta_analysis(sender, data, last_effect, last_var, decimal_places: int = 4, alpha: float = 0.05,
-                  tree: Optional = None, norm_ci: bool = True):
+                  tree: Optional = None, norm_ci: bool = True, tree_file: Optional[str] = None):
     """
     primary function for calling various dialogs to retrieve user choices about how to run various analyses
     """
@@ -1723,7 +1879,7 @@ def meta_analysis(sender, data, last_effect, last_var, decimal_places: int = 4,
 
         if meta_analysis_options.structure is not None:
             output, chart_data, _ = do_meta_analysis(data, meta_analysis_options, decimal_places, alpha, tree, norm_ci,
-                                                     sender=sender)
+                                                     sender=sender, tree_file=tree_file)
             sender.last_effect = meta_analysis_options.effect_data
             sender.last_var = meta_analysis_options.effect_vars
             return output, chart_data
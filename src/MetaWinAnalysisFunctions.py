@@ -4,7 +4,10 @@ Primary analysis module
 This module contains the major mathematical analyses in the program
 """
 
+import heapq
+import itertools
 import math
+from functools import partial
 from typing import Tuple, Optional
 from collections import namedtuple
 
@@ -16,8 +19,16 @@ from MetaWinConstants import mean_data_tuple
 from MetaWinUtils import create_output_table, inline_float, interval_to_str, get_citation, exponential_label, \
     prob_z_score, strong_text
 import MetaWinCharts
+import MetaWinTree
 import MetaWinWidgets
 from MetaWinLanguage import get_text
+from MetaWinResampling import run_replicates, run_tasks, seed_sequence
+from MetaWinResamplingTasks import RESAMPLING_CHUNK_SIZE, bootstrap_replicate_means, grouped_randomization_qm, \
+    regression_randomization_qm, weighted_glm, glm_model_projection, glm_randomization_qm, nested_hierarchy_tuple, \
+    nested_replicate_heterogeneity, nested_randomization_qm, leave_k_out_subsets, deletion_bootstrap_means
+from MetaWinPhylogenetics import pruned_phylogeny, phylogenetic_correlation, cholesky_factor, gls_model_projection, \
+    phylogenetic_arrangement_qe, phylogeny_randomization_qe, phylogenetic_glm, study_tree, tree_phylogenetic_glm, \
+    fit_sample_tree
 
 
 heterogeneity_test_tuple = namedtuple("heterogeneity_test_tuple", ["source", "q", "df", "p_chi", "p_rand"])
@@ -34,6 +45,10 @@ reg_ma_values = namedtuple("reg_ma_values", ["global_values", "model_het_values"
 
 i2_values = namedtuple("i2_values", ["source", "i2", "i2_lower", "i2_upper"])
 
+analysis_data_tuple = namedtuple("analysis_data_tuple", ["e", "w", "v", "boot", "numbers", "strings", "order",
+                                                         "sample_sizes", "tips", "study_names", "filtered",
+                                                         "bad_data", "missing_from_tree"])
+
 
 # --- failsafe numbers ---
 def failsafe_numbers(options, output_blocks: list, n: int, e_data, v_data, mean_e, pooled_var,  sum_w, sum_ew,
@@ -265,6 +280,17 @@ def pooled_var_glm(qe, n: int, w: numpy.array, x: numpy.array) -> float:
     return max(pooled, 0)
 
 
+def pooled_var_weighted_glm(qe, n: int, w: numpy.array, x: numpy.array, hat_trace: float) -> float:
+    """
+    the equivalent of pooled_var_glm when the weights are independent and w is a vector, using the trace of the
+    weighted hat matrix already found by weighted_glm rather than forming the n × n matrix
+    """
+    np = numpy.shape(x)[1] - 1
+    numerator = qe - (n - np - 1)
+    pooled = numerator / (numpy.sum(w) - hat_trace)
+    return max(pooled, 0)
+
+
 # --- basic calculations ---
 def mean_effect_var_and_q(e: numpy.array, w: numpy.array):
     """
@@ -291,78 +317,57 @@ def median_effect(e: numpy.array, w: numpy.array):
     tmp_data = tmp_data[tmp_data[:, 0].argsort()]  # sort into ascending order by effect size (1st column)
     i = 0
     rsum = tmp_data[0, 1]
-    while rsum < midp:
+    while (rsum < midp) and not math.isclose(rsum, midp, rel_tol=1e-12):
         i += 1
         rsum += tmp_data[i, 1]
-    if rsum == midp:  # in the unlikely event that the midpoint of the weights is on the boundary of two effect sizes
+    # if the midpoint of the weights is on the boundary of two effect sizes (to within rounding, as when the weights
+    # are all equal), average them
+    if math.isclose(rsum, midp, rel_tol=1e-12) and (i + 1 < len(tmp_data)):
         return (tmp_data[i, 0] + tmp_data[i+1, 0]) / 2
     else:
         return tmp_data[i, 0]
 
 
+def bootstrap_intervals(replicate_means, bootstrap_n, obs_mean, alpha: float = 0.05):
+    """
+    find the percentile and bias-corrected bootstrap confidence intervals around the mean effect size from the
+    means of the bootstrap replicates
+    """
+    # f = 0.5  # count the observation as half less than itself
+    # in MW2 we counted ties as 1/2, that doesn't seem to be common in the lit, but may be due to a lack
+    # of imagination assuming one would never get a tie
+    f = numpy.count_nonzero(replicate_means < obs_mean)
+    all_means = numpy.sort(numpy.append(replicate_means, obs_mean))
+    lower_index = round((bootstrap_n + 1) * alpha / 2)
+    upper_index = round(bootstrap_n - (bootstrap_n + 1) * alpha / 2)
+    lower_bs_ci = all_means[lower_index]
+    upper_bs_ci = all_means[upper_index]
+
+    # bias-corrected bootstrap
+    f /= (bootstrap_n + 1)
+    z_score = -scipy.stats.norm.ppf(alpha / 2)
+    z0 = scipy.stats.norm.ppf(f)
+    lower_bias_index = round((bootstrap_n + 1) * scipy.stats.norm.cdf(2 * z0 - z_score))
+    upper_bias_index = round((bootstrap_n + 1) * scipy.stats.norm.cdf(2 * z0 + z_score))
+    if lower_bias_index < 0:
+        lower_bias_index = 0
+    if upper_bias_index > bootstrap_n:
+        upper_bias_index = bootstrap_n
+    lower_bias_ci = all_means[lower_bias_index]
+    upper_bias_ci = all_means[upper_bias_index]
+    return lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci, all_means
+
+
 def bootstrap_means(bootstrap_n, boot_data, obs_mean, pooled_var, random_effects: bool = False, alpha: float = 0.05,
-                    progress_bar=None):
+                    progress_bar=None, seed=None):
     """
     conduct a bootstrap test to create confidence intervals around mean effect size
     """
     if bootstrap_n is not None:
-        rng = numpy.random.default_rng()
-        all_means = [obs_mean]
-
-        # if sender is not None:
-        #     progress = MetaWinWidgets.progress_bar(sender, "Resampling Analysis", "Bootstrap Progress", bootstrap_n)
-        # else:
-        #     progress = None
-
-        # f = 0.5  # count the observation as half less than itself
-        f = 0
-        for i in range(bootstrap_n):
-            tmp_data = rng.choice(boot_data, len(boot_data))
-            tmp_e = tmp_data[:, 0]
-            tmp_v = tmp_data[:, 1]
-            """
-            for random effects models I'm keeping the process from MW2 where the pooled variance is only
-            calculated once from all of the effect size data, rather than recalculated for each bootstrap
-            replicate
-
-            should consider whether this has to change or should be an either/or option
-            """
-            if random_effects:
-                tmp_w = numpy.reciprocal(tmp_v + pooled_var)
-            else:
-                tmp_w = numpy.reciprocal(tmp_v)
-
-            tmp_mean, *_ = mean_effect_var_and_q(tmp_e, tmp_w)
-            if tmp_mean < obs_mean:
-                f += 1
-            # in MW2 we counted ties as 1/2, that doesn't seem to be common in the lit, but may be due to a lack
-            # of imagination assuming one would never get a tie
-            # elif tmp_mean_e == mean_e:
-            #     f += 0.5
-            all_means.append(tmp_mean)
-            if progress_bar is not None:
-                progress_bar.setValue(progress_bar.value() + 1)
-        all_means.sort()
-        lower_index = round((bootstrap_n + 1) * alpha / 2)
-        upper_index = round(bootstrap_n - (bootstrap_n + 1) * alpha / 2)
-        lower_bs_ci = all_means[lower_index]
-        upper_bs_ci = all_means[upper_index]
-
-        # bias-corrected bootstrap
-        f /= (bootstrap_n + 1)
-        z_score = -scipy.stats.norm.ppf(alpha / 2)
-        z0 = scipy.stats.norm.ppf(f)
-        lower_bias_index = round((bootstrap_n + 1) * scipy.stats.norm.cdf(2 * z0 - z_score))
-        upper_bias_index = round((bootstrap_n + 1) * scipy.stats.norm.cdf(2 * z0 + z_score))
-        if lower_bias_index < 0:
-            lower_bias_index = 0
-        if upper_bias_index > bootstrap_n:
-            upper_bias_index = bootstrap_n
-        lower_bias_ci = all_means[lower_bias_index]
-        upper_bias_ci = all_means[upper_bias_index]
-    else:
-        lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci, all_means = None, None, None, None, None
-    return lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci, all_means
+        replicate_means = run_replicates(bootstrap_replicate_means, bootstrap_n,
+                                         (boot_data, pooled_var, random_effects), seed, progress_bar)
+        return bootstrap_intervals(replicate_means, bootstrap_n, obs_mean, alpha)
+    return None, None, None, None, None
 
 
 def calc_i2(qt, n, alpha: float = 0.05):
@@ -384,6 +389,23 @@ def calc_i2(qt, n, alpha: float = 0.05):
 
 
 # --- common output ---
+def distribution_table(statistics: list, interval_label: str, decimal_places: int = 4, alpha: float = 0.05) -> list:
+    """
+    create a table of the mean, median, standard deviation, and central interval of each of a list of (label,
+    values) statistics found across a sample of analyses, such as a sample of trees
+    """
+    output = []
+    col_headers = [get_text("Statistic"), get_text("Mean"), get_text("Median"), "SD", interval_label]
+    col_formats = ["", "f", "f", "f", ""]
+    table_data = []
+    for label, values in statistics:
+        lower, upper = numpy.quantile(values, [alpha/2, 1 - alpha/2])
+        table_data.append([label, numpy.mean(values), numpy.median(values), numpy.std(values),
+                           interval_to_str(lower, upper, decimal_places)])
+    create_output_table(output, table_data, col_headers, col_formats, decimal_places)
+    return output
+
+
 def mean_effects_table(effect_label, mean_effect_data, bootstrap_mean, decimal_places: int = 4, alpha: float = 0.05,
                        log_transformed: bool = False, inc_median: bool = True) -> list:
     """
@@ -556,6 +578,97 @@ def output_filtered_bad(filtered: list, bad_data: list) -> list:
     return output_blocks
 
 
+def extract_analysis_data(data, effect_sizes, variances, number_cols: tuple = (), string_cols: tuple = (),
+                          order_col=None, sample_sizes=None, tip_col=None, tree_tips=None) -> analysis_data_tuple:
+    """
+    filter and prepare data for analysis
+
+    a row is valid for analysis if it has a numeric effect size, a positive variance, and a value in every
+    requested column (numbers for number_cols and sample_sizes, which must also be positive, and anything for
+    string_cols and order_col). if tip_col is given, the row must also name one of tree_tips
+
+    the valid rows are extracted in one pass into read-only arrays: e, w, v, boot (e and v as two columns),
+    numbers (one column per number col), strings (object array with one column per string col), order (raw
+    order values), sample_sizes, and tips, along with the labels of the valid, filtered, and bad rows and of the
+    rows whose tip is missing from the tree. the result is cached until the data or filters change
+    """
+    if tree_tips is not None:
+        tree_tips = frozenset(tree_tips)
+    key = ("analysis data", effect_sizes, variances, tuple(number_cols), tuple(string_cols), order_col,
+           sample_sizes, tip_col, tree_tips)
+    return data.cached_result(key, lambda: _extract_analysis_data(data, effect_sizes, variances, number_cols,
+                                                                  string_cols, order_col, sample_sizes, tip_col,
+                                                                  tree_tips))
+
+
+def _extract_analysis_data(data, effect_sizes, variances, number_cols, string_cols, order_col, sample_sizes,
+                           tip_col, tree_tips) -> analysis_data_tuple:
+    included = data.filter_mask()
+    e, valid = effect_sizes.numeric_values()
+    v, v_valid = variances.numeric_values()
+    valid = valid & v_valid & (v > 0)
+    numbers = []
+    for col in number_cols:
+        x, x_valid = col.numeric_values()
+        valid &= x_valid
+        numbers.append(x)
+    strings = []
+    for col in string_cols:
+        categories, codes = col.string_codes()
+        valid &= codes >= 0
+        strings.append(numpy.array(categories + [None], dtype=object)[codes])
+    if order_col is not None:
+        _, codes = order_col.string_codes()
+        valid &= codes >= 0
+    if sample_sizes is not None:
+        ns, ns_valid = sample_sizes.numeric_values()
+        valid &= ns_valid & (ns > 0)
+    missing = numpy.zeros(len(included), dtype=bool)
+    if tip_col is not None:
+        categories, codes = tip_col.string_codes()
+        in_tree = numpy.array([t in tree_tips for t in categories] + [False], dtype=bool)
+        missing = included & ~in_tree[codes]
+        valid &= ~missing
+
+    keep = numpy.flatnonzero(included & valid)
+    n = len(keep)
+    e_data = e[keep]
+    v_data = v[keep]
+    w_data = numpy.reciprocal(v_data)
+    boot_data = numpy.column_stack((e_data, v_data))
+    if len(numbers) > 0:
+        x_data = numpy.column_stack(numbers)[keep]
+    else:
+        x_data = numpy.zeros((n, 0))
+    if len(strings) > 0:
+        s_data = numpy.column_stack(strings)[keep]
+    else:
+        s_data = numpy.zeros((n, 0), dtype=object)
+    if order_col is not None:
+        order_data = tuple(order_col.cell(r) for r in keep)
+    else:
+        order_data = None
+    if sample_sizes is not None:
+        n_data = ns[keep]
+    else:
+        n_data = None
+    if tip_col is not None:
+        tip_data = tuple(str(tip_col.cell(r)) for r in keep)
+    else:
+        tip_data = None
+    for array in (e_data, v_data, w_data, boot_data, x_data, s_data, n_data):
+        if array is not None:
+            array.flags.writeable = False
+
+    labels = [row.label for row in data.rows]
+    study_names = tuple(labels[r] for r in keep)
+    filtered = tuple(labels[r] for r in numpy.flatnonzero(~included))
+    bad_data = tuple(labels[r] for r in numpy.flatnonzero(included & ~valid))
+    missing_from_tree = tuple(labels[r] for r in numpy.flatnonzero(missing))
+    return analysis_data_tuple(e_data, w_data, v_data, boot_data, x_data, s_data, order_data, n_data, tip_data,
+                               study_names, filtered, bad_data, missing_from_tree)
+
+
 # ---- I'm not convinced this is correct, which is why I'm removing it for now ---
 # def calc_aic(q: float, n: int, p: int) -> float:
 #     """
@@ -573,33 +686,12 @@ def simple_meta_analysis(data, options, decimal_places: int = 4, alpha: float =
     # filter and prepare data for analysis
     effect_sizes = options.effect_data
     variances = options.effect_vars
-    e_data = []
-    w_data = []
-    v_data = []
-    bad_data = []
-    boot_data = []
-    study_names = []
-    filtered = []
-    for r, row in enumerate(data.rows):
-        if row.not_filtered():
-            e = data.check_value(r, effect_sizes.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            v = data.check_value(r, variances.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            if (e is not None) and (v is not None) and (v > 0):
-                e_data.append(e)
-                w_data.append(1/v)
-                v_data.append(v)
-                boot_data.append([e, v])
-                study_names.append(row.label)
-            else:
-                bad_data.append(row.label)
-        else:
-            filtered.append(row.label)
-    e_data = numpy.array(e_data)
-    w_data = numpy.array(w_data)
-    v_data = numpy.array(v_data)
-    boot_data = numpy.array(boot_data)
+    extracted = extract_analysis_data(data, effect_sizes, variances)
+    e_data, w_data, v_data, boot_data = extracted.e, extracted.w, extracted.v, extracted.boot
+    study_names = extracted.study_names
 
-    output_blocks = output_filtered_bad(filtered, bad_data)
+    output_blocks = output_filtered_bad(extracted.filtered, extracted.bad_data)
+    seeds = seed_sequence(options.random_seed)
 
     chart_data = None
     n = len(e_data)
@@ -634,7 +726,7 @@ def simple_meta_analysis(data, options, decimal_places: int = 4, alpha: float =
             progress_bar = None
         (lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci,
          bs_means) = bootstrap_means(options.bootstrap_mean, boot_data, mean_e, pooled_var,
-                                         options.random_effects, alpha, progress_bar=progress_bar)
+                                         options.random_effects, alpha, progress_bar=progress_bar, seed=seeds)
 
         plot_order = 0
         mean_data = mean_data_tuple(get_text("Mean"), plot_order, n, mean_e, median_e, var_e, mean_v,
@@ -713,37 +805,15 @@ def grouped_meta_analysis(data, options, decimal_places: int = 4, alpha: float =
     effect_sizes = options.effect_data
     variances = options.effect_vars
     groups = options.groups
-    e_data = []
-    w_data = []
-    v_data = []
-    group_data = []
-    bad_data = []
-    boot_data = []
-    filtered = []
-    for r, row in enumerate(data.rows):
-        if row.not_filtered():
-            e = data.check_value(r, effect_sizes.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            v = data.check_value(r, variances.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            g = data.check_value(r, groups.position(), value_type=MetaWinConstants.VALUE_STRING)
-            if (e is not None) and (v is not None) and (v > 0) and (g is not None):
-                e_data.append(e)
-                w_data.append(1 / v)
-                v_data.append(v)
-                group_data.append(g)
-                boot_data.append([e, v])
-            else:
-                bad_data.append(row.label)
-        else:
-            filtered.append(row.label)
-    e_data = numpy.array(e_data)
-    w_data = numpy.array(w_data)
-    v_data = numpy.array(v_data)
-    boot_data = numpy.array(boot_data)
-    group_names = sorted(set(group_data))
-    group_cnts = {g: group_data.count(g) for g in group_names}
-    group_data = numpy.array(group_data)
+    extracted = extract_analysis_data(data, effect_sizes, variances, string_cols=(groups,))
+    e_data, w_data, v_data, boot_data = extracted.e, extracted.w, extracted.v, extracted.boot
+    group_data = extracted.strings[:, 0].astype(str)
+    group_names, group_codes, group_sizes = numpy.unique(group_data, return_inverse=True, return_counts=True)
+    group_names = [str(g) for g in group_names]
+    group_cnts = {g: int(c) for g, c in zip(group_names, group_sizes)}
 
-    output_blocks = output_filtered_bad(filtered, bad_data)
+    output_blocks = output_filtered_bad(extracted.filtered, extracted.bad_data)
+    seeds = seed_sequence(options.random_seed)
 
     chart_data = None
     n = len(e_data)
@@ -754,8 +824,8 @@ def grouped_meta_analysis(data, options, decimal_places: int = 4, alpha: float =
         # do enough to calculate the pooled variance
         group_w_sums = []
         qe = 0
-        for group in group_names:
-            group_mask = [g == group for g in group_data]
+        for i, group in enumerate(group_names):
+            group_mask = group_codes == i
             group_e = e_data[group_mask]
             group_w = w_data[group_mask]
             (group_mean, group_var, group_qw, group_sum_w,
@@ -793,8 +863,8 @@ def grouped_meta_analysis(data, options, decimal_places: int = 4, alpha: float =
         else:
             progress_bar = None
 
-        for group in group_names:
-            group_mask = [g == group for g in group_data]
+        for i, group in enumerate(group_names):
+            group_mask = group_codes == i
             group_e = e_data[group_mask]
             group_w = ws_data[group_mask]
             group_boot = boot_data[group_mask]
@@ -812,7 +882,7 @@ def grouped_meta_analysis(data, options, decimal_places: int = 4, alpha: float =
                                                                   scale=math.sqrt(group_var))
             (group_lower_bs, group_upper_bs, group_lower_bias, group_upper_bias,
              group_bs_results) = bootstrap_means(options.bootstrap_mean, group_boot, group_mean, pooled_var,
-                                                 options.random_effects, alpha, progress_bar=progress_bar)
+                                                 options.random_effects, alpha, progress_bar=progress_bar, seed=seeds)
             group_het_values.append(heterogeneity_test_tuple(group + " (within)", group_qw, group_df, group_p, ""))
             group_i2, group_i2_lower, group_i2_upper = calc_i2(group_qw, group_n, alpha)
 
@@ -831,7 +901,7 @@ def grouped_meta_analysis(data, options, decimal_places: int = 4, alpha: float =
                                                         scale=math.sqrt(var_e))
         (lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci,
          bs_results) = bootstrap_means(options.bootstrap_mean, boot_data, mean_e, pooled_var,
-                                       options.random_effects, alpha, progress_bar=progress_bar)
+                                       options.random_effects, alpha, progress_bar=progress_bar, seed=seeds)
 
         global_mean_data = mean_data_tuple(get_text("Global"), 0, n, mean_e, median_e, var_e, mean_v, lower_ci,
                                            upper_ci, lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci, bs_results)
@@ -857,25 +927,11 @@ def grouped_meta_analysis(data, options, decimal_places: int = 4, alpha: float =
             nreps = options.randomize_model
             # decimal places to use for randomization-based p-value
             rand_p_dec = max(decimal_places, math.ceil(math.log10(nreps+1)))
-            cnt = 1
-            rng = numpy.random.default_rng()
             if progress_bar is not None:
                 progress_bar.setLabelText(get_text("Conducting Randomization Analysis"))
-            for rep in range(nreps):
-                tmp_qe = 0
-                # rand_group_data = rng.permutation(group_data)
-                rand_e_data = rng.permutation(e_data)
-                for group in group_names:
-                    group_mask = [g == group for g in group_data]
-                    group_e = rand_e_data[group_mask]
-                    group_w = ws_data[group_mask]
-                    _, _, group_qw, _, _, _ = mean_effect_var_and_q(group_e, group_w)
-                    tmp_qe += group_qw
-                tmp_qmodel = qt - tmp_qe
-                if tmp_qmodel >= qm:
-                    cnt += 1
-                if progress_bar is not None:
-                    progress_bar.setValue(progress_bar.value() + 1)
+            rand_qm = run_replicates(grouped_randomization_qm, nreps, (e_data, ws_data, group_codes, qt),
+                                     seeds, progress_bar)
+            cnt = 1 + numpy.count_nonzero(rand_qm >= qm)
             p_random = cnt / (nreps + 1)
             p_random_str = format(p_random, inline_float(rand_p_dec))
         else:
@@ -924,47 +980,116 @@ def grouped_meta_analysis(data, options, decimal_places: int = 4, alpha: float =
 
 
 # ---------- cumulative meta-analysis ----------
+cumulative_tuple = namedtuple("cumulative_tuple", ["mean", "var", "qt", "pooled_var", "median", "mean_v", "lower",
+                                                   "upper"])
+
+
+def running_weighted_medians(e_data, w_data) -> numpy.ndarray:
+    """
+    the weighted median (as calculated by median_effect) of the first k effects, for every k from 1 to n
+
+    the effects are kept in two heaps: a max-heap (stored negated) of the smallest effects, just large enough to
+    hold at least half of the total weight, and a min-heap of the remainder. each new effect is pushed onto the
+    appropriate heap and a few effects moved across to restore the balance, so each median takes O(log n) rather
+    than sorting the prefix. as with median_effect, when the lower effects hold exactly half of the weight (to
+    within rounding) the median is the average of the effects on either side of the boundary
+    """
+    lower, upper = [], []
+    lower_w = 0
+    total_w = 0
+    medians = numpy.empty(len(e_data))
+    for k, (e, w) in enumerate(zip(e_data.tolist(), w_data.tolist())):
+        total_w += w
+        if (len(lower) == 0) or (e <= -lower[0][0]):
+            heapq.heappush(lower, (-e, w))
+            lower_w += w
+        else:
+            heapq.heappush(upper, (e, w))
+        midp = total_w / 2
+        while (len(upper) > 0) and (lower_w < midp) and not math.isclose(lower_w, midp, rel_tol=1e-12):
+            e_up, w_up = heapq.heappop(upper)
+            heapq.heappush(lower, (-e_up, w_up))
+            lower_w += w_up
+        while len(lower) > 1 and (lower_w - lower[0][1] >= midp or
+                                  math.isclose(lower_w - lower[0][1], midp, rel_tol=1e-12)):
+            e_low, w_low = heapq.heappop(lower)
+            heapq.heappush(upper, (-e_low, w_low))
+            lower_w -= w_low
+        if (len(upper) > 0) and math.isclose(lower_w, midp, rel_tol=1e-12):
+            medians[k] = (-lower[0][0] + upper[0][0]) / 2
+        else:
+            medians[k] = -lower[0][0]
+    return medians
+
+
+def cumulative_statistics(e_data, w_data, v_data, random_effects: bool, alpha: float = 0.05,
+                          norm_ci: bool = True) -> cumulative_tuple:
+    """
+    calculate the mean effect, its variance, heterogeneity, pooled variance, median, mean variance, and confidence
+    interval of the first k studies, for every k from 2 to n, returned as arrays
+
+    the fixed-effects values of every prefix come from running sums of w, w·e, w·e², and w², with the effects
+    centered on their mean to avoid cancellation when Qt is found from the sums. under random effects the weights
+    of each prefix depend on its own pooled variance, so the weighted sums are found for a chunk of prefixes at a
+    time as the rows of a lower triangular matrix of weights. all of the confidence intervals come from a single
+    call to scipy
+    """
+    n = len(e_data)
+    df = numpy.arange(1, n)
+    center = numpy.mean(e_data)
+    d_data = e_data - center
+    sum_w = numpy.cumsum(w_data)[1:]
+    sum_wd = numpy.cumsum(w_data*d_data)[1:]
+    sum_wd2 = numpy.cumsum(w_data*numpy.square(d_data))[1:]
+    sum_w2 = numpy.cumsum(numpy.square(w_data))[1:]
+    qt = numpy.maximum(sum_wd2 - numpy.square(sum_wd)/sum_w, 0)
+    pooled_var = numpy.maximum((qt - df) / (sum_w - sum_w2/sum_w), 0)
+    if random_effects:
+        sum_w = numpy.empty(n - 1)
+        sum_wd = numpy.empty(n - 1)
+        sum_wd2 = numpy.empty(n - 1)
+        chunk_n = max(1, RESAMPLING_CHUNK_SIZE // n)
+        for start in range(0, n - 1, chunk_n):
+            end = min(start + chunk_n, n - 1)
+            m = end + 1  # the number of studies in the longest prefix of the chunk
+            ws_data = numpy.reciprocal(v_data[:m] + pooled_var[start:end, numpy.newaxis])
+            ws_data *= numpy.arange(m) <= numpy.arange(start + 1, end + 1)[:, numpy.newaxis]
+            sum_w[start:end] = numpy.sum(ws_data, axis=1)
+            sum_wd[start:end] = numpy.matmul(ws_data, d_data[:m])
+            sum_wd2[start:end] = numpy.matmul(ws_data, numpy.square(d_data[:m]))
+        qt = numpy.maximum(sum_wd2 - numpy.square(sum_wd)/sum_w, 0)
+    mean_e = center + sum_wd/sum_w
+    var_e = 1 / sum_w
+    if norm_ci:
+        lower_ci, upper_ci = scipy.stats.norm.interval(confidence=1-alpha, loc=mean_e, scale=numpy.sqrt(var_e))
+    else:
+        lower_ci, upper_ci = scipy.stats.t.interval(confidence=1-alpha, df=df, loc=mean_e, scale=numpy.sqrt(var_e))
+    medians = running_weighted_medians(e_data, w_data)[1:]
+    mean_v = numpy.cumsum(v_data)[1:] / numpy.arange(2, n + 1)
+    return cumulative_tuple(mean_e, var_e, qt, pooled_var, medians, mean_v, lower_ci, upper_ci)
+
+
 def cumulative_meta_analysis(data, options, decimal_places: int = 4, alpha: float = 0.05, norm_ci: bool = True,
                              sender=None):
     # filter and prepare data for analysis
     effect_sizes = options.effect_data
     variances = options.effect_vars
     order = options.cumulative_order
-    bad_data = []
-    tmp_data = []
-    filtered = []
-    for r, row in enumerate(data.rows):
-        if row.not_filtered():
-            e = data.check_value(r, effect_sizes.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            v = data.check_value(r, variances.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            g = data.check_value(r, order.position(), value_type=MetaWinConstants.VALUE_ANY)
-            if (e is not None) and (v is not None) and (v > 0) and (g is not None):
-                tmp_data.append([g, e, v])
-            else:
-                bad_data.append(row.label)
-        else:
-            filtered.append(row.label)
+    extracted = extract_analysis_data(data, effect_sizes, variances, order_col=order)
 
-    output_blocks = output_filtered_bad(filtered, bad_data)
+    output_blocks = output_filtered_bad(extracted.filtered, extracted.bad_data)
+    seeds = seed_sequence(options.random_seed)
 
     chart_data = None
-    n = len(tmp_data)
+    n = len(extracted.e)
     if n > 1:
         output_blocks.append([get_text("{} studies will be included in this analysis").format(n)])
-        tmp_data.sort()
-        e_data = []
-        v_data = []
-        w_data = []
-        boot_data = []
-        for data in tmp_data:
-            e_data.append(data[1])
-            v_data.append(data[2])
-            w_data.append(1/data[2])
-            boot_data.append([data[1], data[2]])
-        e_data = numpy.array(e_data)
-        w_data = numpy.array(w_data)
-        v_data = numpy.array(v_data)
-        boot_data = numpy.array(boot_data)
+        # sort by order, breaking ties by effect size and then variance
+        sort_order = sorted(range(n), key=lambda i: (extracted.order[i], extracted.e[i], extracted.v[i]))
+        e_data = extracted.e[sort_order]
+        w_data = extracted.w[sort_order]
+        v_data = extracted.v[sort_order]
+        boot_data = extracted.boot[sort_order]
 
         cumulative_means = []
         cumulative_het = []
@@ -976,34 +1101,22 @@ def cumulative_meta_analysis(data, options, decimal_places: int = 4, alpha: floa
         else:
             progress_bar = None
 
+        stats = cumulative_statistics(e_data, w_data, v_data, options.random_effects, alpha, norm_ci)
+        p_values = 1 - scipy.stats.chi2.cdf(stats.qt, df=numpy.arange(1, n))
         chart_order = 0
-        for ns in range(2, n+1):
+        for k, ns in enumerate(range(2, n+1)):
             ns_label = get_text("{} studies").format(ns)
-            tmp_e = e_data[:ns]
-            tmp_w = w_data[:ns]
-            tmp_v = v_data[:ns]
-            tmp_boot = boot_data[:ns]
             df = ns - 1
-            mean_e, var_e, qt, sum_w, sum_w2, sum_ew = mean_effect_var_and_q(tmp_e, tmp_w)
-            median_e = median_effect(tmp_e, tmp_w)
-            mean_v = numpy.sum(tmp_v) / ns
-            pooled_var = pooled_var_no_structure(qt, sum_w, sum_w2, df)
-            if options.random_effects:
-                ws_data = numpy.reciprocal(tmp_v + pooled_var)
-                mean_e, var_e, qt, *_ = mean_effect_var_and_q(tmp_e, ws_data)
-            p = 1 - scipy.stats.chi2.cdf(qt, df=df)
-            if norm_ci:
-                lower_ci, upper_ci = scipy.stats.norm.interval(confidence=1-alpha, loc=mean_e, scale=math.sqrt(var_e))
-            else:
-                lower_ci, upper_ci = scipy.stats.t.interval(confidence=1-alpha, df=df, loc=mean_e,
-                                                            scale=math.sqrt(var_e))
+            mean_e = stats.mean[k]
+            pooled_var = stats.pooled_var[k]
             (lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci,
-             bs_results) = bootstrap_means(options.bootstrap_mean, tmp_boot, mean_e, pooled_var,
-                                           options.random_effects, alpha, progress_bar=progress_bar)
-            mean_data = mean_data_tuple(ns_label, chart_order, ns, mean_e, median_e, var_e, mean_v, lower_ci, upper_ci,
-                                        lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci, bs_results)
+             bs_results) = bootstrap_means(options.bootstrap_mean, boot_data[:ns], mean_e, pooled_var,
+                                           options.random_effects, alpha, progress_bar=progress_bar, seed=seeds)
+            mean_data = mean_data_tuple(ns_label, chart_order, ns, mean_e, stats.median[k], stats.var[k],
+                                        stats.mean_v[k], stats.lower[k], stats.upper[k], lower_bs_ci, upper_bs_ci,
+                                        lower_bias_ci, upper_bias_ci, bs_results)
             cumulative_means.append(mean_data)
-            het_data = heterogeneity_test_tuple("{} Qtotal".format(ns_label), qt, df, p, None)
+            het_data = heterogeneity_test_tuple("{} Qtotal".format(ns_label), stats.qt[k], df, p_values[k], None)
             cumulative_het.append(het_data)
             chart_order += 1
 
@@ -1041,41 +1154,28 @@ def calculate_regression_ma_values(e_data, w_data, x_data, sum_w, sum_we, qt):
     return qm, qe, b1_slope, b0_intercept, var_b1, var_b0, sum_wx, sum_wx2
 
 
+def randomization_settled(rand_qm, nreps: int, qm: float, alpha: float = 0.05) -> bool:
+    """
+    determine whether the replicates in rand_qm have already decided whether a randomization test of nreps
+    replicates will be significant at alpha, regardless of the outcome of the replicates not yet run
+    """
+    cnt = 1 + numpy.count_nonzero(rand_qm >= qm)
+    remaining = nreps - len(rand_qm)
+    return (cnt > alpha*(nreps + 1)) or (cnt + remaining <= alpha*(nreps + 1))
+
+
 def regression_meta_analysis(data, options, decimal_places: int = 4, alpha: float = 0.05, norm_ci: bool = True,
                              sender=None):
     # filter and prepare data for analysis
     effect_sizes = options.effect_data
     variances = options.effect_vars
     ind_var = options.independent_variable
-    e_data = []
-    w_data = []
-    v_data = []
-    x_data = []
-    bad_data = []
-    boot_data = []
-    filtered = []
-    for r, row in enumerate(data.rows):
-        if row.not_filtered():
-            e = data.check_value(r, effect_sizes.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            v = data.check_value(r, variances.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            x = data.check_value(r, ind_var.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            if (e is not None) and (v is not None) and (v > 0) and (x is not None):
-                e_data.append(e)
-                w_data.append(1 / v)
-                v_data.append(v)
-                x_data.append(x)
-                boot_data.append([e, v])
-            else:
-                bad_data.append(row.label)
-        else:
-            filtered.append(row.label)
-    e_data = numpy.array(e_data)
-    w_data = numpy.array(w_data)
-    v_data = numpy.array(v_data)
-    x_data = numpy.array(x_data)
-    boot_data = numpy.array(boot_data)
+    extracted = extract_analysis_data(data, effect_sizes, variances, number_cols=(ind_var,))
+    e_data, w_data, v_data, boot_data = extracted.e, extracted.w, extracted.v, extracted.boot
+    x_data = extracted.numbers[:, 0]
 
-    output_blocks = output_filtered_bad(filtered, bad_data)
+    output_blocks = output_filtered_bad(extracted.filtered, extracted.bad_data)
+    seeds = seed_sequence(options.random_seed)
 
     chart_data = None
     model_het = None
@@ -1098,11 +1198,14 @@ def regression_meta_analysis(data, options, decimal_places: int = 4, alpha: floa
             ws_data = numpy.reciprocal(v_data + pooled_var)
             mean_e, var_e, qt, sum_ws, sum_ws2, sum_wse = mean_effect_var_and_q(e_data, ws_data)
             (qm, qe, b1_slope, b0_intercept,
-             var_b1, var_b0, _, _) = calculate_regression_ma_values(e_data, ws_data, x_data, sum_ws, sum_wse, qt)
+             var_b1, var_b0, sum_wsx, sum_wsx2) = calculate_regression_ma_values(e_data, ws_data, x_data, sum_ws,
+                                                                                 sum_wse, qt)
         else:
             ws_data = w_data
             sum_ws = sum_w
             sum_wse = sum_we
+            sum_wsx = sum_wx
+            sum_wsx2 = sum_wx2
 
         if ((options.bootstrap_mean is not None) or (options.randomize_model is not None)) and (sender is not None):
             if options.randomize_model is not None:
@@ -1127,7 +1230,7 @@ def regression_meta_analysis(data, options, decimal_places: int = 4, alpha: floa
         lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci, _ = bootstrap_means(options.bootstrap_mean, boot_data,
                                                                                  mean_e, pooled_var,
                                                                                  options.random_effects, alpha,
-                                                                                 progress_bar=progress_bar)
+                                                                                 progress_bar=progress_bar, seed=seeds)
 
         mean_data = mean_data_tuple(get_text("Global"), 0, n, mean_e, median_e, var_e, mean_v, lower_ci, upper_ci,
                                     lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci, None)
@@ -1152,20 +1255,22 @@ def regression_meta_analysis(data, options, decimal_places: int = 4, alpha: floa
             nreps = options.randomize_model
             # decimal places to use for randomization-based p-value
             rand_p_dec = max(decimal_places, math.ceil(math.log10(nreps+1)))
-            cnt_q = 1
-            rng = numpy.random.default_rng()
-            for rep in range(nreps):
-                rand_e_data = rng.permutation(e_data)
-                (rand_qm, rand_qe, rand_b1_slope, rand_b0_intercept,
-                 _, _, _, _) = calculate_regression_ma_values(rand_e_data, ws_data, x_data, sum_ws, sum_wse, qt)
-                if rand_qm >= qm:
-                    cnt_q += 1
-                if progress_bar is not None:
-                    progress_bar.setValue(progress_bar.value() + 1)
-            p_random = cnt_q / (nreps + 1)
+            if options.randomize_early_stop:
+                stop = partial(randomization_settled, qm=qm, alpha=alpha)
+            else:
+                stop = None
+            rand_qm = run_replicates(regression_randomization_qm, nreps,
+                                     (e_data, ws_data, x_data, sum_ws, sum_wsx, sum_wsx2), seeds, progress_bar,
+                                     stop=stop)
+            rand_n = len(rand_qm)
+            cnt_q = 1 + numpy.count_nonzero(rand_qm >= qm)
+            p_random = cnt_q / (rand_n + 1)
             p_random_str = format(p_random, inline_float(rand_p_dec))
+            if (rand_n < nreps) and (progress_bar is not None):
+                progress_bar.setValue(progress_bar.maximum())
         else:
             p_random_str = ""
+            rand_n = None
 
         # output
         output_blocks.append(["<h3>{}</h3>".format(get_text("Regression Results"))])
@@ -1185,6 +1290,9 @@ def regression_meta_analysis(data, options, decimal_places: int = 4, alpha: floa
         model_table = [model_het, error_het, global_het_data]
         output_blocks.append(heterogeneity_table(model_table, decimal_places, total_line=True,
                                                  randomization=options.randomize_model))
+        if (rand_n is not None) and (rand_n < options.randomize_model):
+            output_blocks.append([get_text("Randomization test stopped early after {} of {} iterations, once its "
+                                           "outcome was settled").format(rand_n, options.randomize_model)])
 
         output_blocks.append(["<h3>{}</h3>".format(get_text("Global Results"))])
 
@@ -1238,6 +1346,47 @@ def check_data_for_glm(output_blocks, n, cat_data, cat_labels) -> bool:
     return True
 
 
+def glm_design_matrix(extracted: analysis_data_tuple, continuous_vars: list,
+                      categorical_vars: list) -> Tuple[numpy.ndarray, list, bool]:
+    """
+    construct the design matrix of a glm from extracted analysis data
+
+    the first column is the intercept (or mean if there are no predictors), followed by the continuous
+    variables, and then the categorical variables, each coded as (number of groups - 1) contrast columns in
+    which the first group is -1
+    """
+    if len(continuous_vars) + len(categorical_vars) > 0:
+        predictor_labels = ["intercept"]
+        has_model = True
+    else:
+        predictor_labels = ["mean"]
+        has_model = False
+    for c in continuous_vars:
+        predictor_labels.append(c.label)
+    n = len(extracted.e)
+    x_columns = [numpy.ones((n, 1)), extracted.numbers]
+    # create columns in x for categorical vars
+    if n > 0:
+        for c, cat_var in enumerate(categorical_vars):
+            column = extracted.strings[:, c]
+            groups = sorted(set(column))
+            if len(groups) > 1:
+                first = column == groups[0]
+                new_dat = numpy.zeros((n, len(groups)-1))
+                for i, g in enumerate(groups[1:]):
+                    new_dat[column == g, i] = 1
+                    new_dat[first, i] = -1
+                x_columns.append(new_dat)
+                if len(groups) == 2:
+                    predictor_labels.append(cat_var.label)
+                else:
+                    for i in range(len(groups)-1):
+                        predictor_labels.append(cat_var.label + "_{}".format(i+1))
+            else:
+                pass  # put warning here?
+    return numpy.hstack(x_columns), predictor_labels, has_model
+
+
 def calculate_glm(e: numpy.array, x: numpy.array, w: numpy.array):
     xt = numpy.transpose(x)
     xtwx = numpy.matmul(numpy.matmul(xt, w), x)
@@ -1258,91 +1407,13 @@ def complex_meta_analysis(data, options, decimal_places: int = 4, alpha: float =
     variances = options.effect_vars
     continuous_vars = options.continuous_vars
     categorical_vars = options.categorical_vars
-    e_data = []
-    w_data = []
-    v_data = []
-    x_data = []
-    tmp_x_data = []
-    bad_data = []
-    boot_data = []
-    filtered = []
-    for r, row in enumerate(data.rows):
-        if row.not_filtered():
-            e = data.check_value(r, effect_sizes.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            v = data.check_value(r, variances.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            x_row = [1]  # first column is for the mean
-            bad_x = False
-            for c in continuous_vars:
-                x = data.check_value(r, c.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-                if x is None:
-                    bad_x = True
-                else:
-                    x_row.append(x)
-            tmp_x_row = []
-            for c in categorical_vars:
-                x = data.check_value(r, c.position(), value_type=MetaWinConstants.VALUE_STRING)
-                if x is None:
-                    bad_x = True
-                else:
-                    tmp_x_row.append(x)
-
-            if (e is not None) and (v is not None) and (v > 0) and (not bad_x):
-                e_data.append(e)
-                w_data.append(1 / v)
-                v_data.append(v)
-                x_data.append(x_row)
-                tmp_x_data.append(tmp_x_row)
-                boot_data.append([e, v])
-            else:
-                bad_data.append(row.label)
-        else:
-            filtered.append(row.label)
+    extracted = extract_analysis_data(data, effect_sizes, variances, number_cols=tuple(continuous_vars),
+                                      string_cols=tuple(categorical_vars))
+    e_data, w_data, v_data, boot_data = extracted.e, extracted.w, extracted.v, extracted.boot
+    x_data, predictor_labels, has_model = glm_design_matrix(extracted, continuous_vars, categorical_vars)
 
-    if len(continuous_vars) + len(categorical_vars) > 0:
-        predictor_labels = ["intercept"]
-        has_model = True
-    else:
-        predictor_labels = ["mean"]
-        has_model = False
-    for c in continuous_vars:
-        predictor_labels.append(c.label)
-    # create columns in x for categorical vars
-    if len(tmp_x_data) > 0:
-        nc = len(tmp_x_data[0])
-        for c in range(nc):
-            column = [r[c] for r in tmp_x_data]  # extract column c
-            groups = sorted(set(column))
-            new_dat = []
-            if len(groups) > 1:
-                for g in groups[1:]:
-                    new_col = []
-                    for r in column:
-                        if g == r:
-                            new_col.append(1)
-                        elif groups[0] == r:
-                            new_col.append(-1)
-                        else:
-                            new_col.append(0)
-                    new_dat.append(new_col)
-                if len(groups) == 2:
-                    predictor_labels.append(categorical_vars[c].label)
-                else:
-                    for i in range(len(groups)-1):
-                        predictor_labels.append(categorical_vars[c].label + "_{}".format(i+1))
-            else:
-                pass  # put warning here?
-            for r, row in enumerate(x_data):
-                for col in new_dat:
-                    row.append(col[r])
-
-    e_data = numpy.array(e_data)
-    w_data = numpy.array(w_data)
-    w_matrix = numpy.diag(w_data)  # convert w to n x n matrix with w on the diagonal
-    v_data = numpy.array(v_data)
-    x_data = numpy.array(x_data)
-    boot_data = numpy.array(boot_data)
-
-    output_blocks = output_filtered_bad(filtered, bad_data)
+    output_blocks = output_filtered_bad(extracted.filtered, extracted.bad_data)
+    seeds = seed_sequence(options.random_seed)
 
     model_het = None
     error_het = None
@@ -1350,18 +1421,17 @@ def complex_meta_analysis(data, options, decimal_places: int = 4, alpha: float =
     global_values = None
     n = len(e_data)
     citations = []
-    if check_data_for_glm(output_blocks, n, tmp_x_data, [c.label for c in categorical_vars]):
+    if check_data_for_glm(output_blocks, n, extracted.strings, [c.label for c in categorical_vars]):
         output_blocks.append([get_text("{} studies will be included in this analysis").format(n)])
 
         try:
-            qm, qe, beta, sigma_b = calculate_glm(e_data, x_data, w_matrix)
-            pooled_var = pooled_var_glm(qe, n, w_matrix, x_data)
+            qm, qe, beta, sigma_b, hat_trace = weighted_glm(e_data, x_data, w_data)
+            pooled_var = pooled_var_weighted_glm(qe, n, w_data, x_data, hat_trace)
             if options.random_effects:
                 output_blocks.append([get_text("Estimate of pooled variance") + ": " +
                                       format(pooled_var, inline_float(decimal_places))])
                 ws_data = numpy.reciprocal(v_data + pooled_var)
-                w_matrix = numpy.diag(ws_data)
-                qm, qe, beta, sigma_b = calculate_glm(e_data, x_data, w_matrix)
+                qm, qe, beta, sigma_b, _ = weighted_glm(e_data, x_data, ws_data)
             else:
                 ws_data = w_data
             median_e = median_effect(e_data, ws_data)
@@ -1398,7 +1468,8 @@ def complex_meta_analysis(data, options, decimal_places: int = 4, alpha: float =
             lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci, _ = bootstrap_means(options.bootstrap_mean, boot_data,
                                                                                      mean_e, pooled_var,
                                                                                      options.random_effects, alpha,
-                                                                                     progress_bar=progress_bar)
+                                                                                     progress_bar=progress_bar,
+                                                                                     seed=seeds)
             mean_data = mean_data_tuple(get_text("Global"), 0, n, mean_e, median_e, var_e, mean_v, lower_ci, upper_ci,
                                         lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci, None)
 
@@ -1416,15 +1487,9 @@ def complex_meta_analysis(data, options, decimal_places: int = 4, alpha: float =
                 nreps = options.randomize_model
                 # decimal places to use for randomization-based p-value
                 rand_p_dec = max(decimal_places, math.ceil(math.log10(nreps+1)))
-                cnt_q = 1
-                rng = numpy.random.default_rng()
-                for rep in range(nreps):
-                    rand_e_data = rng.permutation(e_data)
-                    rand_qm, _, _, _ = calculate_glm(rand_e_data, x_data, w_matrix)
-                    if rand_qm >= qm:
-                        cnt_q += 1
-                    if progress_bar is not None:
-                        progress_bar.setValue(progress_bar.value() + 1)
+                projection = glm_model_projection(x_data, ws_data)
+                rand_qm = run_replicates(glm_randomization_qm, nreps, (e_data, projection), seeds, progress_bar)
+                cnt_q = 1 + numpy.count_nonzero(rand_qm >= qm)
                 p_random = cnt_q / (nreps + 1)
                 p_random_str = format(p_random, inline_float(rand_p_dec))
             else:
@@ -1506,31 +1571,6 @@ class NestedGroup:
         self.parent = None
         self.includes_rows = []
 
-    def qm(self, index, parent_mean, w):
-        q = 0
-        n = 0
-        if index == self.index:
-            n += 1
-            for r in self.includes_rows:
-                q += w[r]*(self.mean - parent_mean)**2
-        else:
-            for child in self.children:
-                tq, tn = child.qm(index, self.mean, w)
-                q += tq
-                n += tn
-        return q, n
-
-    def qe(self, index):
-        if self.index == index:
-            return self.qw, 1
-        else:
-            sq, sn = 0, 0
-            for child in self.children:
-                cq, cn = child.qe(index)
-                sq += cq
-                sn += cn
-            return sq, sn
-
     def nested_count(self):
         """
         count the total number of nested groups, including this one
@@ -1541,14 +1581,13 @@ class NestedGroup:
         return count
 
     def group_calculations(self, e, w, chart_order: int, boot_data, bootstrap_mean, alpha: float = 0.05,
-                           norm_ci: bool = True, progress_bar=None):
+                           norm_ci: bool = True, progress_bar=None, seeds=None):
         chart_order += 1
         mean_output = []
         het_output = []
-        group_mask = [r in self.includes_rows for r in range(len(e))]
-        group_e = e[group_mask]
-        group_w = w[group_mask]
-        group_boot = boot_data[group_mask]
+        group_e = e[self.includes_rows]
+        group_w = w[self.includes_rows]
+        group_boot = boot_data[self.includes_rows]
         group_n = len(group_e)
         group_df = group_n - 1
         self.mean, group_var, self.qw, group_sum_w, _, group_sum_ew = mean_effect_var_and_q(group_e, group_w)
@@ -1563,7 +1602,7 @@ class NestedGroup:
                                                               scale=math.sqrt(group_var))
         (group_lower_bs, group_upper_bs, group_lower_bias, group_upper_bias,
          group_bs_results) = bootstrap_means(bootstrap_mean, group_boot, self.mean, 0, False, alpha,
-                                             progress_bar=progress_bar)
+                                             progress_bar=progress_bar, seed=seeds)
         if self.index > 0:
             indent = "  " + "→ "*self.index
         else:
@@ -1575,7 +1614,7 @@ class NestedGroup:
         for child in self.children:
             child_het, child_mean, chart_order = child.group_calculations(e, w, chart_order, boot_data,
                                                                           bootstrap_mean, alpha,
-                                                                          progress_bar=progress_bar)
+                                                                          progress_bar=progress_bar, seeds=seeds)
             het_output.extend(child_het)
             mean_output.extend(child_mean)
         if len(self.children) > 0:
@@ -1609,24 +1648,60 @@ class NestedGroup:
         return []
 
 
-def find_next_nested_level(index, group_data, parent) -> list:
-    group_list = []
-    if parent is None:
-        level_names = sorted(set(row[index] for row in group_data))
-    else:
-        level_names = sorted(set(row[index] for row in group_data if row[index-1] == parent.name))
-    for name in level_names:
-        new_group = NestedGroup(name, index)
-        if parent is None:
-            new_group.includes_rows = [r for r, row in enumerate(group_data) if row[index] == name]
-        else:
-            new_group.parent = parent
-            new_group.includes_rows = [r for r, row in enumerate(group_data) if (row[index-1] == parent.name) and
-                                       (row[index] == name) and r in parent.includes_rows]
-        group_list.append(new_group)
-        if index < len(group_data[0]) - 1:
-            new_group.children = find_next_nested_level(index+1, group_data, new_group)
-    return group_list
+def nested_hierarchy(group_data: numpy.ndarray) -> nested_hierarchy_tuple:
+    """
+    factorize the columns of a nested hierarchy (one row per study, one column per level, from the highest level
+    to the lowest) into integer group codes
+
+    a group is identified by its own name together with the names of the groups it is nested within, so the same
+    name may be reused under different higher-level groups. at each level the groups are numbered in order of the
+    group they are nested within and then by name, which is the order in which they are reported. for each level
+    the result holds the names of the groups, the code of the group of every study, the code of the group at the
+    level above that each group is nested within (0 for the top level), and the number of studies in each group
+    """
+    names, codes, parents, sizes = [], [], [], []
+    parent_codes = numpy.zeros(len(group_data), dtype=int)
+    for k in range(numpy.shape(group_data)[1]):
+        level_names, name_codes = numpy.unique(group_data[:, k].astype(str), return_inverse=True)
+        name_cnt = len(level_names)
+        pairs, level_codes, level_sizes = numpy.unique(parent_codes*name_cnt + name_codes, return_inverse=True,
+                                                       return_counts=True)
+        names.append([str(level_names[p]) for p in pairs % name_cnt])
+        codes.append(level_codes)
+        parents.append(pairs // name_cnt)
+        sizes.append(level_sizes)
+        parent_codes = level_codes
+    return nested_hierarchy_tuple(names, codes, parents, sizes)
+
+
+def nested_groups(hierarchy: nested_hierarchy_tuple) -> list:
+    """
+    build the tree of nested groups, with the rows of the studies in each, from a factorized hierarchy and return
+    the groups of the top level
+    """
+    levels = []
+    for k, level_names in enumerate(hierarchy.names):
+        rows = numpy.split(numpy.argsort(hierarchy.codes[k], kind="stable"), numpy.cumsum(hierarchy.sizes[k])[:-1])
+        groups = [NestedGroup(name, k) for name in level_names]
+        for g, group in enumerate(groups):
+            group.includes_rows = rows[g]
+            if k > 0:
+                group.parent = levels[-1][hierarchy.parents[k][g]]
+                group.parent.children.append(group)
+        levels.append(groups)
+    return levels[0]
+
+
+def nested_heterogeneity(e_data, w_data, hierarchy: nested_hierarchy_tuple, mean_e) -> Tuple[numpy.ndarray, float]:
+    """
+    partition the heterogeneity of a nested hierarchy, returning the model heterogeneity (Qm) of each level and the
+    residual heterogeneity (Qe) within the groups of the lowest level
+
+    Qm of a level is the weighted squared deviation of the mean of each of its groups from the mean of the group it
+    is nested within (mean_e for the top level)
+    """
+    qm, qe = nested_replicate_heterogeneity(e_data[numpy.newaxis, :], w_data, hierarchy, mean_e)
+    return qm[0], qe[0]
 
 
 def nested_meta_analysis(data, options, decimal_places: int = 4, alpha: float = 0.05, norm_ci: bool = True,
@@ -1635,42 +1710,13 @@ def nested_meta_analysis(data, options, decimal_places: int = 4, alpha: float =
     effect_sizes = options.effect_data
     variances = options.effect_vars
     group_levels = options.nested_vars
-    e_data = []
-    w_data = []
-    v_data = []
-    group_data = []
-    bad_data = []
-    boot_data = []
-    filtered = []
-    for r, row in enumerate(data.rows):
-        if row.not_filtered():
-            e = data.check_value(r, effect_sizes.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            v = data.check_value(r, variances.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            g_dat = []
-            for level in group_levels:
-                g = data.check_value(r, level.position(), value_type=MetaWinConstants.VALUE_STRING)
-                if g is not None:
-                    g_dat.append(g)
-            if len(g_dat) < len(group_levels):
-                g_dat = None
-            if (e is not None) and (v is not None) and (v > 0) and (g_dat is not None):
-                e_data.append(e)
-                w_data.append(1 / v)
-                v_data.append(v)
-                group_data.append(g_dat)
-                boot_data.append([e, v])
-            else:
-                bad_data.append(row.label)
-        else:
-            filtered.append(row.label)
+    extracted = extract_analysis_data(data, effect_sizes, variances, string_cols=tuple(group_levels))
+    e_data, w_data, v_data, boot_data = extracted.e, extracted.w, extracted.v, extracted.boot
+    hierarchy = nested_hierarchy(extracted.strings)
 
-    e_data = numpy.array(e_data)
-    w_data = numpy.array(w_data)
-    v_data = numpy.array(v_data)
-    boot_data = numpy.array(boot_data)
-
-    top_level = find_next_nested_level(0, group_data, None)
-    output_blocks = output_filtered_bad(filtered, bad_data)
+    top_level = nested_groups(hierarchy)
+    output_blocks = output_filtered_bad(extracted.filtered, extracted.bad_data)
+    seeds = seed_sequence(options.random_seed)
 
     n = len(e_data)
 
@@ -1711,7 +1757,7 @@ def nested_meta_analysis(data, options, decimal_places: int = 4, alpha: float =
                                                         scale=math.sqrt(var_e))
         (lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci,
          bs_results) = bootstrap_means(options.bootstrap_mean, boot_data, mean_e, 0, False, alpha,
-                                       progress_bar=progress_bar)
+                                       progress_bar=progress_bar, seed=seeds)
         global_mean_data = mean_data_tuple(get_text("Global"), 0, n, mean_e, median_e, var_e, mean_v, lower_ci,
                                            upper_ci, lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci, bs_results)
         df = n-1
@@ -1729,33 +1775,24 @@ def nested_meta_analysis(data, options, decimal_places: int = 4, alpha: float =
         for group in top_level:
             het_out, mean_out, chart_order = group.group_calculations(e_data, w_data, chart_order, boot_data,
                                                                       options.bootstrap_mean, alpha,
-                                                                      progress_bar=progress_bar)
+                                                                      progress_bar=progress_bar, seeds=seeds)
             group_het_values.extend(het_out)
             group_mean_values.extend(mean_out)
 
+        level_qm, qe = nested_heterogeneity(e_data, w_data, hierarchy, mean_e)
         model_het_values = []
         prev_n = 1
         for i in range(len(group_levels)):
             level_name = group_levels[i].label
-            qm = 0
-            ng = 0
-            for level in top_level:
-                tq, tn = level.qm(i, mean_e, w_data)
-                qm += tq
-                ng += tn
+            qm = level_qm[i]
+            ng = len(hierarchy.names[i])
             dfm = ng - prev_n
             prev_n = ng
             pqm = 1 - scipy.stats.chi2.cdf(qm, df=dfm)
             model_het_values.append(heterogeneity_test_tuple("Qm ({})".format(level_name), qm, dfm, pqm, ""))
 
-        # extract Qerror from the lowest level of the nested hierarchy
-        qe = 0
-        ng = 0
-        for group in top_level:
-            cq, cn = group.qe(len(group_levels)-1)
-            qe += cq
-            ng += cn
-        dfe = n - ng
+        # Qerror is from within the groups of the lowest level of the nested hierarchy
+        dfe = n - len(hierarchy.names[-1])
         pqe = 1 - scipy.stats.chi2.cdf(qe, df=dfe)
         error_het_values = heterogeneity_test_tuple("Qe", qe, dfe, pqe, "")
 
@@ -1771,23 +1808,11 @@ def nested_meta_analysis(data, options, decimal_places: int = 4, alpha: float =
             nreps = options.randomize_model
             # decimal places to use for randomization-based p-value
             rand_p_dec = max(decimal_places, math.ceil(math.log10(nreps+1)))
-            cnt_list = [1 for _ in range(len(group_levels))]
-            rng = numpy.random.default_rng()
-            for rep in range(nreps):
-                rand_e_data = rng.permutation(e_data)
-                rand_level = find_next_nested_level(0, group_data, None)
-                for group in rand_level:
-                    group.group_calculations(rand_e_data, w_data, 0, boot_data, None, alpha)
-
-                for i in range(len(group_levels)):
-                    tmp_qm = 0
-                    for level in rand_level:
-                        tq, _ = level.qm(i, mean_e, w_data)
-                        tmp_qm += tq
-                    if tmp_qm >= model_het_values[i].q:
-                        cnt_list[i] += 1
-                if progress_bar is not None:
-                    progress_bar.setValue(progress_bar.value() + 1)
+            rand_qm = run_replicates(nested_randomization_qm, nreps,
+                                     (e_data, w_data, hierarchy, mean_e, options.randomize_restricted), seeds,
+                                     progress_bar)
+            cnt_list = [1 + numpy.count_nonzero(rand_qm[:, i] >= model_het_values[i].q)
+                        for i in range(len(group_levels))]
             for i in range(len(group_levels)):
                 p_random = cnt_list[i] / (nreps + 1)
                 p_random_str = format(p_random, inline_float(rand_p_dec))
@@ -1986,30 +2011,6 @@ def nested_meta_analysis(data, options, decimal_places: int = 4, alpha: float =
 
 
 # ---------- phylogenetic meta-analysis ----------
-def phylogenetic_correlation(tip_names, root):
-    n = len(tip_names)
-    p = numpy.zeros(shape=(n, n))
-    # find depth of most recent common ancestor of included taxa
-    mrca = root.find_tip_by_name(tip_names[0])
-    for name1 in tip_names[1:]:
-        tip1 = root.find_tip_by_name(name1)
-        mrca = tip1.common_ancestor(mrca)
-    max_depth = mrca.max_node_tip_length()
-    for i, name1 in enumerate(tip_names):
-        tip1 = root.find_tip_by_name(name1)
-        for j in range(i+1):  # take advantage of symmetry
-            name2 = tip_names[j]
-            tip2 = root.find_tip_by_name(name2)
-            if i == j:
-                p[i, j] = 1
-            else:
-                common_ancestor = tip1.common_ancestor(tip2)
-                shared_dist = common_ancestor.distance_to_ancestor(mrca)
-                p[i, j] = shared_dist/max_depth
-                p[j, i] = p[i, j]
-    return p
-
-
 def phylogenetic_meta_analysis(data, options, tree, decimal_places: int = 4, alpha: float = 0.05, norm_ci: bool = True,
                                sender=None):
     # filter and prepare data for analysis
@@ -2018,117 +2019,22 @@ def phylogenetic_meta_analysis(data, options, tree, decimal_places: int = 4, alp
     continuous_vars = options.continuous_vars
     categorical_vars = options.categorical_vars
     data_tips = options.tip_names
-    tree_tips = tree.tip_names()
-    e_data = []
-    w_data = []
-    v_data = []
-    x_data = []
-    tip_names = []
-    tmp_x_data = []
-    bad_data = []
-    boot_data = []
-    filtered = []
-    missing_from_tree = []
-    for r, row in enumerate(data.rows):
-        if row.not_filtered():
-            e = data.check_value(r, effect_sizes.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            v = data.check_value(r, variances.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            x_row = [1]  # first column is for the mean
-            bad_x = False
-            for c in continuous_vars:
-                x = data.check_value(r, c.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-                if x is None:
-                    bad_x = True
-                else:
-                    x_row.append(x)
-            tmp_x_row = []
-            for c in categorical_vars:
-                x = data.check_value(r, c.position(), value_type=MetaWinConstants.VALUE_STRING)
-                if x is None:
-                    bad_x = True
-                else:
-                    tmp_x_row.append(x)
-            t_name = data.check_value(r, data_tips.position(), value_type=MetaWinConstants.VALUE_STRING)
-            if t_name not in tree_tips:
-                bad_x = True
-                missing_from_tree.append(row.label)
-            if (e is not None) and (v is not None) and (v > 0) and (not bad_x):
-                e_data.append(e)
-                w_data.append(1 / v)
-                v_data.append(v)
-                x_data.append(x_row)
-                tmp_x_data.append(tmp_x_row)
-                boot_data.append([e, v])
-                tip_names.append(t_name)
-            else:
-                bad_data.append(row.label)
-        else:
-            filtered.append(row.label)
-
-    if len(continuous_vars) + len(categorical_vars) > 0:
-        predictor_labels = ["intercept"]
-        has_model = True
-    else:
-        predictor_labels = ["mean"]
-        has_model = False
-    for c in continuous_vars:
-        predictor_labels.append(c.label)
-    # create columns in x for categorical vars
-    if len(tmp_x_data) > 0:
-        nc = len(tmp_x_data[0])
-        for c in range(nc):
-            column = [r[c] for r in tmp_x_data]  # extract column c
-            groups = sorted(set(column))
-            new_dat = []
-            if len(groups) > 1:
-                for g in groups[1:]:
-                    new_col = []
-                    for r in column:
-                        if g == r:
-                            new_col.append(1)
-                        elif groups[0] == r:
-                            new_col.append(-1)
-                        else:
-                            new_col.append(0)
-                    new_dat.append(new_col)
-                if len(groups) == 2:
-                    predictor_labels.append(categorical_vars[c].label)
-                else:
-                    for i in range(len(groups)-1):
-                        predictor_labels.append(categorical_vars[c].label + "_{}".format(i+1))
-            else:
-                pass  # put warning here?
-            for r, row in enumerate(x_data):
-                for col in new_dat:
-                    row.append(col[r])
-
-    e_data = numpy.array(e_data)
-    # w_data = numpy.array(w_data)
+    tree_tips = set(tree.tip_names())
+    extracted = extract_analysis_data(data, effect_sizes, variances, number_cols=tuple(continuous_vars),
+                                      string_cols=tuple(categorical_vars), tip_col=data_tips, tree_tips=tree_tips)
+    e_data, v_data, tip_names = extracted.e, extracted.v, extracted.tips
+    x_data, predictor_labels, has_model = glm_design_matrix(extracted, continuous_vars, categorical_vars)
     n = len(e_data)
-    v_data = numpy.array(v_data)
-    x_data = numpy.array(x_data)
-    # boot_data = numpy.array(boot_data)
-
-    p_matrix = phylogenetic_correlation(tip_names, tree)
 
-    v_matrix = numpy.diag(v_data)  # convert w to n x n matrix with w on the diagonal
-    # add phylogenetic covariances to v_matrix
-    for i in range(n):
-        for j in range(i):
-            v_matrix[i, j] = p_matrix[i, j]*math.sqrt(v_data[i])*math.sqrt(v_data[j])
-            v_matrix[j, i] = v_matrix[i, j]
-    w_matrix = numpy.linalg.inv(v_matrix)
-
-    if len(missing_from_tree) > 0:
-        print(missing_from_tree)
-    output_blocks = output_filtered_bad(filtered, bad_data)
+    if len(extracted.missing_from_tree) > 0:
+        print(extracted.missing_from_tree)
+    output_blocks = output_filtered_bad(extracted.filtered, extracted.bad_data)
+    seeds = seed_sequence(options.random_seed)
 
 
     output_blocks.append(["<h2>Warning: The phylogenetic glm meta-analysis is still experimental and has some kinks "
                           "that have not definitively been worked out yet.<p>Not all of the intended output from this "
-                          "analysis is included at this time and the randomization tests have not been "
-                          "activated.</h2>"])
-
+                          "analysis is included at this time.</h2>"])
 
 
     # model_het = None
@@ -2136,25 +2042,27 @@ def phylogenetic_meta_analysis(data, options, tree, decimal_places: int = 4, alp
     # predictor_table_data = None
     # global_values = None
     citations = []
-    if check_data_for_glm(output_blocks, n, tmp_x_data, [c.label for c in categorical_vars]):
+    if check_data_for_glm(output_blocks, n, extracted.strings, [c.label for c in categorical_vars]):
         try:
             output_blocks.append([get_text("{} studies will be included in this analysis").format(n)])
-            qm, qe, beta, sigma_b = calculate_glm(e_data, x_data, w_matrix)
-            pooled_var = pooled_var_glm(qe, n, w_matrix, x_data)
+            pruned_tree = pruned_phylogeny(tip_names, tree)
+            if options.tree_gls:
+                phylogeny = study_tree(tip_names, pruned_tree)
+            else:
+                phylogeny = phylogenetic_correlation(tip_names, pruned_tree)
+            if phylogeny is None:
+                phylogenetic_fit = None
+            elif options.tree_gls:
+                phylogenetic_fit = tree_phylogenetic_glm(e_data, x_data, v_data, phylogeny, options.random_effects)
+            else:
+                phylogenetic_fit = phylogenetic_glm(e_data, x_data, v_data, phylogeny, options.random_effects)
+            if phylogenetic_fit is None:
+                output_blocks.append([strong_text(get_text("Analysis Error Encountered")), get_text("AE-singular")])
+                return output_blocks, citations
+            qm, qe, beta, sigma_b, pooled_var, wx = phylogenetic_fit
             if options.random_effects:
                 output_blocks.append([get_text("Estimate of pooled variance") + ": " +
                                       format(pooled_var, inline_float(decimal_places))])
-                vs_data = v_data + pooled_var
-                # ws_data = numpy.reciprocal(v_data + pooled_var)
-                v_matrix = numpy.diag(vs_data)  # convert w to n x n matrix with w on the diagonal
-                # add phylogenetic covariances to v_matrix
-                for i in range(n):
-                    for j in range(i):
-                        v_matrix[i, j] = p_matrix[i, j] * math.sqrt(vs_data[i]) * math.sqrt(vs_data[j])
-                        v_matrix[j, i] = v_matrix[i, j]
-                w_matrix = numpy.linalg.inv(v_matrix)
-
-                qm, qe, beta, sigma_b = calculate_glm(e_data, x_data, w_matrix)
             # else:
             #     ws_data = w_data
             # median_e = median_effect(e_data, ws_data)
@@ -2190,23 +2098,55 @@ def phylogenetic_meta_analysis(data, options, tree, decimal_places: int = 4, alp
             # i2, i2_lower, i2_upper = calc_i2(qt, n, alpha)
             # i2_data = [i2_values(get_text("Total"), i2, i2_lower, i2_upper)]
 
-            # randomization test
-            p_random_str = ""  # temp
-            # if options.randomize_model and has_model:
-            #     nreps = options.randomize_model
-            #     # decimal places to use for randomization-based p-value
-            #     rand_p_dec = max(decimal_places, math.ceil(math.log10(nreps+1)))
-            #     cnt_q = 1
-            #     rng = numpy.random.default_rng()
-            #     for rep in range(nreps):
-            #         rand_x_data = rng.permutation(x_data)
-            #         rand_qm, _, _, _ = calculate_glm(e_data, rand_x_data, w_matrix)
-            #         if rand_qm >= qm:
-            #             cnt_q += 1
-            #     p_random = cnt_q / (nreps + 1)
-            #     p_random_str = format(p_random, inline_float(rand_p_dec))
-            # else:
-            #     p_random_str = ""
+            if ((((options.randomize_model is not None) and has_model) or (options.randomize_phylogeny is not None))
+                    and (sender is not None)):
+                total_steps = 0
+                if (options.randomize_model is not None) and has_model:
+                    total_steps += options.randomize_model
+                if options.randomize_phylogeny is not None:
+                    total_steps += options.randomize_phylogeny
+                progress_bar = MetaWinWidgets.progress_bar(sender, get_text("Resampling Progress"),
+                                                           get_text("Conducting Randomization Analysis"), total_steps)
+            else:
+                progress_bar = None
+
+            # randomization test of the model, permuting the effects against the predictors
+            if options.randomize_model and has_model:
+                nreps = options.randomize_model
+                # decimal places to use for randomization-based p-value
+                rand_p_dec = max(decimal_places, math.ceil(math.log10(nreps+1)))
+                projection = gls_model_projection(x_data, wx)
+                rand_qm = run_replicates(glm_randomization_qm, nreps, (e_data, projection), seeds, progress_bar)
+                cnt_q = 1 + numpy.count_nonzero(rand_qm >= qm)
+                p_random = cnt_q / (nreps + 1)
+                p_random_str = format(p_random, inline_float(rand_p_dec))
+            else:
+                p_random_str = ""
+
+            # randomization test of the phylogeny, arranging the studies randomly among the tips
+            phylogeny_output = []
+            if options.randomize_phylogeny:
+                phylogeny_output.append("<h4>{}</h4>".format(get_text("Randomization Test for Phylogenetic Structure")))
+                if options.tree_gls:
+                    p_factor = phylogeny
+                else:
+                    p_factor = cholesky_factor(numpy.array(phylogeny))
+                if p_factor is None:
+                    phylogeny_output.extend([strong_text(get_text("Analysis Error Encountered")),
+                                             get_text("AE-singular")])
+                else:
+                    nreps = options.randomize_phylogeny
+                    rand_p_dec = max(decimal_places, math.ceil(math.log10(nreps+1)))
+                    fixed_qe = phylogenetic_arrangement_qe(e_data, x_data, v_data, p_factor,
+                                                           numpy.arange(n)[numpy.newaxis, :])[0]
+                    rand_qe = run_replicates(phylogeny_randomization_qe, nreps, (e_data, x_data, v_data, p_factor),
+                                             seeds, progress_bar)
+                    p_phylogeny = (1 + numpy.count_nonzero(rand_qe <= fixed_qe)) / (nreps + 1)
+                    phylogeny_output.extend([get_text("Fixed effects residual heterogeneity (Qe)") + ": " +
+                                             format(fixed_qe, inline_float(decimal_places)),
+                                             get_text("Probability of as small a Qe with the tips randomly "
+                                                      "rearranged") + ": " + format(p_phylogeny,
+                                                                                    inline_float(rand_p_dec))])
 
             # output
             output_blocks.append(["<h3>{}</h3>".format(get_text("Model Results"))])
@@ -2246,6 +2186,8 @@ def phylogenetic_meta_analysis(data, options, tree, decimal_places: int = 4, alp
                                                  pooled_var, i2_data, options.bootstrap_mean, decimal_places, alpha,
                                                  options.log_transformed, inc_median=False)
                 citations.extend(new_cites)
+            if phylogeny_output:
+                output_blocks.append(phylogeny_output)
         except numpy.linalg.LinAlgError as error_msg:
             if str(error_msg) == "Singular matrix":
                 output_blocks.append([strong_text(get_text("Analysis Error Encountered")), get_text("AE-singular")])
@@ -2255,39 +2197,272 @@ def phylogenetic_meta_analysis(data, options, tree, decimal_places: int = 4, alp
     return output_blocks, citations
 
 
+def phylogenetic_sample_meta_analysis(data, options, tree_file: str, decimal_places: int = 4, alpha: float = 0.05,
+                                      sender=None):
+    """
+    repeat the phylogenetic glm for every tree in a file, such as a sample from the posterior distribution of a
+    Bayesian analysis, and summarize the distribution of the model coefficients, heterogeneity, and pooled variance
+    across the trees
+
+    the trees are read one at a time and fit by the resampling workers. the data are extracted and the design
+    matrix built only once, using the tips of the first tree; trees lacking any of the tips used are skipped.
+    randomization tests are not conducted for a sample of trees
+    """
+    effect_sizes = options.effect_data
+    variances = options.effect_vars
+    continuous_vars = options.continuous_vars
+    categorical_vars = options.categorical_vars
+    output_blocks = []
+    citations = []
+    try:
+        with open(tree_file, "r") as infile:
+            trees = MetaWinTree.read_trees(infile)
+            first_tree = next(trees, None)
+            if first_tree is None:
+                raise ValueError("No tree found")
+            extracted = extract_analysis_data(data, effect_sizes, variances, number_cols=tuple(continuous_vars),
+                                              string_cols=tuple(categorical_vars), tip_col=options.tip_names,
+                                              tree_tips=first_tree.tip_names())
+            e_data, v_data, tip_names = extracted.e, extracted.v, extracted.tips
+            x_data, predictor_labels, has_model = glm_design_matrix(extracted, continuous_vars, categorical_vars)
+            n = len(e_data)
+            output_blocks.extend(output_filtered_bad(extracted.filtered, extracted.bad_data))
+            if not check_data_for_glm(output_blocks, n, extracted.strings, [c.label for c in categorical_vars]):
+                return output_blocks, citations
+            output_blocks.append([get_text("{} studies will be included in this analysis").format(n)])
+            if sender is not None:
+                progress_bar = MetaWinWidgets.progress_bar(sender, get_text("Phylogeny Sample Progress"),
+                                                           get_text("Analyzing Trees"), 0)
+            else:
+                progress_bar = None
+            results = run_tasks(fit_sample_tree, itertools.chain([first_tree], trees),
+                                (tip_names, e_data, x_data, v_data, options.random_effects, options.tree_gls),
+                                progress_bar)
+            if progress_bar is not None:
+                progress_bar.close()
+    except IOError:
+        output_blocks.append([strong_text(get_text("Analysis Error Encountered")),
+                              get_text("Error reading file {}").format(tree_file)])
+        return output_blocks, citations
+    except (ValueError, UnicodeDecodeError):
+        output_blocks.append([strong_text(get_text("Analysis Error Encountered")),
+                              get_text("error_not_newick").format(tree_file)])
+        return output_blocks, citations
+
+    fits = [result for result in results if result is not None]
+    output_blocks.append(["<h3>{}</h3>".format(get_text("Results Across Sample of Trees")),
+                          get_text("{} of {} trees were analyzed").format(len(fits), len(results))])
+    if len(fits) == 0:
+        output_blocks.append([strong_text(get_text("Analysis Error Encountered")), get_text("AE-singular")])
+        return output_blocks, citations
+
+    qm = numpy.array([fit[0] for fit in fits])
+    qe = numpy.array([fit[1] for fit in fits])
+    beta = numpy.array([fit[2] for fit in fits])
+    statistics = [("β{} ({})".format(b, predictor_labels[b]), beta[:, b]) for b in range(numpy.shape(beta)[1])]
+    if has_model:
+        statistics.append(("Qm", qm))
+    statistics.extend([("Qe", qe), ("Qt", qm + qe)])
+    if options.random_effects:
+        statistics.append((get_text("Pooled Variance"), numpy.array([fit[3] for fit in fits])))
+
+    output_blocks.append(distribution_table(statistics, get_text("Central {:0.0%} of Trees").format(1 - alpha),
+                                            decimal_places, alpha))
+    return output_blocks, citations
+
+
 # ---------- jackknife meta-analysis ----------
+jackknife_tuple = namedtuple("jackknife_tuple", ["mean", "var", "qt", "pooled_var", "median", "mean_v", "lower",
+                                                 "upper"])
+
+
+def leave_one_out_sums(x) -> numpy.ndarray:
+    """
+    the sum of all but one of the values of x, leaving out each value in turn
+
+    each sum is found from the running sums of the values before and after the one left out, rather than by
+    subtracting it from the total, so a value holding most of the total does not leave only rounding error behind
+    """
+    before = numpy.concatenate(([0], numpy.cumsum(x)[:-1]))
+    after = numpy.concatenate((numpy.cumsum(x[::-1])[-2::-1], [0]))
+    return before + after
+
+
+def leave_one_out_medians(e_data, w_data) -> numpy.ndarray:
+    """
+    the weighted median (as calculated by median_effect) of the effects with each one left out in turn
+
+    the effects are sorted once and the running sum of their weights found; for each deletion the point at which
+    the remaining weights reach half of their total is then found by a binary search of the running sums, on the
+    part before the deleted effect as is and on the part after it less the deleted weight
+    """
+    n = len(e_data)
+    order = numpy.argsort(e_data)
+    sorted_e = e_data[order]
+    cum_w = numpy.cumsum(w_data[order])
+    p = numpy.empty(n, dtype=int)
+    p[order] = numpy.arange(n)  # the position of each effect in sorted order
+    midp = leave_one_out_sums(w_data) / 2
+    threshold = midp * (1 - 1e-12)
+    k = numpy.searchsorted(cum_w, threshold)
+    after = numpy.maximum(numpy.searchsorted(cum_w, threshold + w_data), p + 1)
+    k = numpy.minimum(numpy.where(k < p, k, after), n - 1)
+    k = numpy.where(k == p, k - 1, k)
+    rsum = cum_w[k] - numpy.where(k > p, w_data, 0)
+    # average with the next remaining effect when the midpoint falls on the boundary between them
+    next_k = k + 1 + (k + 1 == p)
+    boundary = (numpy.abs(rsum - midp) <= 1e-12*numpy.maximum(rsum, midp)) & (next_k < n)
+    next_e = sorted_e[numpy.minimum(next_k, n - 1)]
+    return numpy.where(boundary, (sorted_e[k] + next_e) / 2, sorted_e[k])
+
+
+def masked_weight_statistics(ws_data, sorted_e, sorted_d):
+    """
+    the sums of w, w·d, and w·d², and the weighted median (as calculated by median_effect), for each row of a
+    matrix of the weights of effects sorted into ascending order, in which the studies left out have no weight
+
+    d is the effects centered as for the sums of the studies that are not left out
+    """
+    n = len(sorted_e)
+    rows = numpy.arange(len(ws_data))
+    sum_w = numpy.sum(ws_data, axis=1)
+    sum_wd = numpy.matmul(ws_data, sorted_d)
+    sum_wd2 = numpy.matmul(ws_data, numpy.square(sorted_d))
+    cum_w = numpy.cumsum(ws_data, axis=1)
+    midp = cum_w[:, -1] / 2
+    below = (cum_w < midp[:, numpy.newaxis]) & (numpy.abs(cum_w - midp[:, numpy.newaxis]) >
+                                                 1e-12*numpy.maximum(cum_w, midp[:, numpy.newaxis]))
+    k = numpy.count_nonzero(below, axis=1)
+    rsum = cum_w[rows, k]
+    # average with the next effect not left out when the midpoint falls on the boundary between them
+    later = (ws_data > 0) & (numpy.arange(n) > k[:, numpy.newaxis])
+    next_k = numpy.argmax(later, axis=1)
+    boundary = (numpy.abs(rsum - midp) <= 1e-12*numpy.maximum(rsum, midp)) & numpy.any(later, axis=1)
+    medians = numpy.where(boundary, (sorted_e[k] + sorted_e[next_k]) / 2, sorted_e[k])
+    return sum_w, sum_wd, sum_wd2, medians
+
+
+def jackknife_statistics(e_data, w_data, v_data, random_effects: bool, alpha: float = 0.05,
+                         norm_ci: bool = True) -> jackknife_tuple:
+    """
+    calculate the mean effect, its variance, heterogeneity, pooled variance, median, mean variance, and confidence
+    interval of the studies with each one left out in turn, returned as arrays
+
+    the fixed-effects values of every deletion come from the sums of w, w·e, w·e², and w² over all of the studies
+    but the one left out, with the effects centered on their mean to avoid cancellation when Qt is found from the
+    sums. under random effects the weights of each deletion depend on its own pooled variance, so the weighted sums
+    and medians are found for a chunk of deletions at a time by masked_weight_statistics; deletions with no pooled
+    variance keep their fixed-effects values. all of the confidence intervals come from a single call to scipy
+    """
+    n = len(e_data)
+    df = n - 2
+    center = numpy.mean(e_data)
+    d_data = e_data - center
+    sum_w = leave_one_out_sums(w_data)
+    sum_wd = leave_one_out_sums(w_data*d_data)
+    sum_wd2 = leave_one_out_sums(w_data*numpy.square(d_data))
+    sum_w2 = leave_one_out_sums(numpy.square(w_data))
+    qt = numpy.maximum(sum_wd2 - numpy.square(sum_wd)/sum_w, 0)
+    pooled_var = numpy.maximum((qt - df) / (sum_w - sum_w2/sum_w), 0)
+    medians = leave_one_out_medians(e_data, w_data)
+    if random_effects:
+        order = numpy.argsort(e_data)
+        sorted_e = e_data[order]
+        sorted_v = v_data[order]
+        sorted_d = d_data[order]
+        position = numpy.empty(n, dtype=int)
+        position[order] = numpy.arange(n)
+        heterogeneous = numpy.flatnonzero(pooled_var > 0)
+        chunk_n = max(1, RESAMPLING_CHUNK_SIZE // n)
+        for start in range(0, len(heterogeneous), chunk_n):
+            rows = heterogeneous[start:start + chunk_n]
+            ws_data = numpy.reciprocal(sorted_v + pooled_var[rows, numpy.newaxis])
+            ws_data[numpy.arange(len(rows)), position[rows]] = 0
+            (sum_w[rows], sum_wd[rows], sum_wd2[rows],
+             medians[rows]) = masked_weight_statistics(ws_data, sorted_e, sorted_d)
+        qt = numpy.maximum(sum_wd2 - numpy.square(sum_wd)/sum_w, 0)
+    mean_e = center + sum_wd/sum_w
+    var_e = 1 / sum_w
+    if norm_ci:
+        lower_ci, upper_ci = scipy.stats.norm.interval(confidence=1-alpha, loc=mean_e, scale=numpy.sqrt(var_e))
+    else:
+        lower_ci, upper_ci = scipy.stats.t.interval(confidence=1-alpha, df=df, loc=mean_e, scale=numpy.sqrt(var_e))
+    mean_v = leave_one_out_sums(v_data) / (n - 1)
+    return jackknife_tuple(mean_e, var_e, qt, pooled_var, medians, mean_v, lower_ci, upper_ci)
+
+
+def deletion_statistics(e_data, w_data, v_data, deleted, deletion, n_deletions: int, random_effects: bool,
+                        alpha: float = 0.05, norm_ci: bool = True) -> jackknife_tuple:
+    """
+    calculate the same values as jackknife_statistics for any set of deletions, each of which may leave out
+    several studies, such as every study in a group or a random subset of studies
+
+    the studies left out are given as two parallel arrays, the row of each study left out (deleted) and the
+    deletion it belongs to (deletion, numbered from zero and in ascending order). the fixed-effects sums of every
+    deletion are found by subtracting the sums of the studies it leaves out from the sums of all of the studies;
+    the medians, and under random effects the re-weighted sums, are found for a chunk of deletions at a time by
+    masked_weight_statistics
+    """
+    n = len(e_data)
+    n_kept = n - numpy.bincount(deletion, minlength=n_deletions)
+    df = n_kept - 1
+    center = numpy.mean(e_data)
+    d_data = e_data - center
+
+    def deletion_sums(x):
+        return numpy.sum(x) - numpy.bincount(deletion, weights=x[deleted], minlength=n_deletions)
+
+    sum_w = deletion_sums(w_data)
+    sum_wd = deletion_sums(w_data*d_data)
+    sum_wd2 = deletion_sums(w_data*numpy.square(d_data))
+    sum_w2 = deletion_sums(numpy.square(w_data))
+    qt = numpy.maximum(sum_wd2 - numpy.square(sum_wd)/sum_w, 0)
+    pooled_var = numpy.maximum((qt - df) / (sum_w - sum_w2/sum_w), 0)
+    order = numpy.argsort(e_data)
+    sorted_e = e_data[order]
+    sorted_d = d_data[order]
+    position = numpy.empty(n, dtype=int)
+    position[order] = numpy.arange(n)
+    medians = numpy.empty(n_deletions)
+    chunk_n = max(1, RESAMPLING_CHUNK_SIZE // n)
+    for start in range(0, n_deletions, chunk_n):
+        end = min(start + chunk_n, n_deletions)
+        if random_effects:
+            ws_data = numpy.reciprocal(v_data[order] + pooled_var[start:end, numpy.newaxis])
+        else:
+            ws_data = numpy.tile(w_data[order], (end - start, 1))
+        first, last = numpy.searchsorted(deletion, [start, end])
+        ws_data[deletion[first:last] - start, position[deleted[first:last]]] = 0
+        chunk_sums = masked_weight_statistics(ws_data, sorted_e, sorted_d)
+        medians[start:end] = chunk_sums[3]
+        if random_effects:
+            sum_w[start:end], sum_wd[start:end], sum_wd2[start:end] = chunk_sums[:3]
+    if random_effects:
+        qt = numpy.maximum(sum_wd2 - numpy.square(sum_wd)/sum_w, 0)
+    mean_e = center + sum_wd/sum_w
+    var_e = 1 / sum_w
+    if norm_ci:
+        lower_ci, upper_ci = scipy.stats.norm.interval(confidence=1-alpha, loc=mean_e, scale=numpy.sqrt(var_e))
+    else:
+        lower_ci, upper_ci = scipy.stats.t.interval(confidence=1-alpha, df=df, loc=mean_e, scale=numpy.sqrt(var_e))
+    mean_v = deletion_sums(v_data) / n_kept
+    return jackknife_tuple(mean_e, var_e, qt, pooled_var, medians, mean_v, lower_ci, upper_ci)
+
+
 def jackknife_meta_analysis(data, options, decimal_places: int = 4, alpha: float = 0.05, norm_ci: bool = True,
                             sender=None):
     # filter and prepare data for analysis
     effect_sizes = options.effect_data
     variances = options.effect_vars
-    e_data = []
-    w_data = []
-    v_data = []
-    bad_data = []
-    boot_data = []
-    study_names = []
-    filtered = []
-    for r, row in enumerate(data.rows):
-        if row.not_filtered():
-            e = data.check_value(r, effect_sizes.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            v = data.check_value(r, variances.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            if (e is not None) and (v is not None) and (v > 0):
-                e_data.append(e)
-                w_data.append(1/v)
-                v_data.append(v)
-                boot_data.append([e, v])
-                study_names.append(row.label)
-            else:
-                bad_data.append(row.label)
-        else:
-            filtered.append(row.label)
-    e_data = numpy.array(e_data)
-    w_data = numpy.array(w_data)
-    v_data = numpy.array(v_data)
-    boot_data = numpy.array(boot_data)
+    if options.jackknife_groups is not None:
+        extracted = extract_analysis_data(data, effect_sizes, variances, string_cols=(options.jackknife_groups,))
+    else:
+        extracted = extract_analysis_data(data, effect_sizes, variances)
+    e_data, w_data, v_data, boot_data = extracted.e, extracted.w, extracted.v, extracted.boot
+    study_names = extracted.study_names
 
-    output_blocks = output_filtered_bad(filtered, bad_data)
+    output_blocks = output_filtered_bad(extracted.filtered, extracted.bad_data)
+    seeds = seed_sequence(options.random_seed)
 
     chart_data = None
     n = len(e_data)
@@ -2295,8 +2470,24 @@ def jackknife_meta_analysis(data, options, decimal_places: int = 4, alpha: float
     if n > 1:
         output_blocks.append([get_text("{} studies will be included in this analysis").format(n)])
 
+        # the means with studies left out are only bootstrapped when specifically requested, and never for random
+        # subsets, of which only the two most extreme are reported
+        if options.jackknife_bootstrap and (options.jackknife_k is None):
+            jackknife_bootstrap_n = options.bootstrap_mean
+        else:
+            jackknife_bootstrap_n = None
+        if options.jackknife_groups is not None:
+            group_names, group_codes, group_sizes = numpy.unique(extracted.strings[:, 0].astype(str),
+                                                                 return_inverse=True, return_counts=True)
+            # a group can only be left out if at least two studies remain
+            omit = group_sizes <= n - 2
+            n_deletions = numpy.count_nonzero(omit)
+        else:
+            n_deletions = n
         if (options.bootstrap_mean is not None) and (sender is not None):
-            total_steps = options.bootstrap_mean*(n + 1)
+            total_steps = options.bootstrap_mean
+            if jackknife_bootstrap_n is not None:
+                total_steps += n_deletions
             progress_bar = MetaWinWidgets.progress_bar(sender, get_text("Resampling Progress"),
                                                        get_text("Conducting Bootstrap Analysis"),
                                                        total_steps)
@@ -2324,7 +2515,7 @@ def jackknife_meta_analysis(data, options, decimal_places: int = 4, alpha: float
 
         (lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci,
          bs_results) = bootstrap_means(options.bootstrap_mean, boot_data, mean_e, pooled_var,
-                                       options.random_effects, alpha, progress_bar=progress_bar)
+                                       options.random_effects, alpha, progress_bar=progress_bar, seed=seeds)
         plot_order = 0
         mean_data = mean_data_tuple(get_text("Mean"), plot_order, n, mean_e, median_e, var_e, mean_v, lower_ci,
                                     upper_ci, lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci, bs_results)
@@ -2339,51 +2530,85 @@ def jackknife_meta_analysis(data, options, decimal_places: int = 4, alpha: float
         global_mean_data = mean_data_tuple("", plot_order, n, mean_e, median_e, var_e, mean_v, lower_ci, upper_ci,
                                            lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci, bs_results)
 
-        # do jackknife
+        # do jackknife, leaving out each study, each group, or random subsets of studies
+        jackknife_output = []
+        if options.jackknife_k is not None:
+            k = options.jackknife_k
+            if k > n - 2:
+                labels, deleted_rows = [], []
+                stats = jackknife_tuple(*([] for _ in jackknife_tuple._fields))
+                jackknife_output.append([get_text("{} studies cannot be left out while keeping at least two in the "
+                                                  "analysis").format(k)])
+            else:
+                nreps = options.jackknife_samples
+                subsets = run_replicates(leave_k_out_subsets, nreps, (n, k), seeds)
+                stats = deletion_statistics(e_data, w_data, v_data, subsets.ravel(),
+                                            numpy.repeat(numpy.arange(nreps), k), nreps, options.random_effects,
+                                            alpha, norm_ci)
+                statistics = [(get_text("Mean"), stats.mean), (get_text("Median"), stats.median), ("Qt", stats.qt)]
+                if options.random_effects:
+                    statistics.append((get_text("Pooled Variance"), stats.pooled_var))
+                jackknife_output.append(["<h4>{}</h4>".format(get_text("Results Across Random Subsets"))])
+                jackknife_output.append(distribution_table(statistics, get_text("Central {:0.0%} of "
+                                                                                "Subsets").format(1 - alpha),
+                                                           decimal_places, alpha))
+                # only the subsets giving the lowest and highest mean effects are shown individually
+                shown = [numpy.argmin(stats.mean), numpy.argmax(stats.mean)]
+                stats = jackknife_tuple(*(x[shown] for x in stats))
+                deleted_rows = [subsets[j] for j in shown]
+                labels = ["w/o " + ", ".join(study_names[i] for i in rows) for rows in deleted_rows]
+        elif options.jackknife_groups is not None:
+            if n_deletions < len(group_names):
+                jackknife_output.append([get_text("Groups whose omission would leave fewer than two studies were not "
+                                                  "left out")])
+            deleted = numpy.argsort(group_codes, kind="stable")
+            deleted = deleted[omit[group_codes[deleted]]]
+            deletion = (numpy.cumsum(omit) - 1)[group_codes[deleted]]
+            stats = deletion_statistics(e_data, w_data, v_data, deleted, deletion, n_deletions,
+                                        options.random_effects, alpha, norm_ci)
+            deleted_rows = numpy.split(deleted, numpy.cumsum(group_sizes[omit]))[:-1]
+            labels = ["w/o " + str(g) for g in group_names[omit]]
+        else:
+            stats = jackknife_statistics(e_data, w_data, v_data, options.random_effects, alpha, norm_ci)
+            deleted_rows = [[j] for j in range(n)]
+            labels = ["w/o " + name for name in study_names]
+        n_kept = [n - len(rows) for rows in deleted_rows]
+        p_values = 1 - scipy.stats.chi2.cdf(stats.qt, df=numpy.subtract(n_kept, 1))
+        if jackknife_bootstrap_n is not None:
+            # each deletion is sent with only its own rows, pooled variance, and seed; the data are sent to each
+            # worker once, when it is started
+            replicates = run_tasks(deletion_bootstrap_means,
+                                   zip(deleted_rows, stats.pooled_var, seeds.spawn(len(labels))),
+                                   (jackknife_bootstrap_n, options.random_effects), progress_bar,
+                                   work=len(labels)*jackknife_bootstrap_n*numpy.size(boot_data), shared=boot_data)
+            bootstraps = [bootstrap_intervals(replicate_means, jackknife_bootstrap_n, stats.mean[j], alpha)
+                          for j, replicate_means in enumerate(replicates)]
+        else:
+            bootstraps = [(None, None, None, None, None) for _ in labels]
         jackknife_means = []
         jackknife_het = []
-        for j in range(n):
-            j_label = "w/o " + study_names[j]
-            s_filter = [True for _ in range(n)]
-            s_filter[j] = False
-            tmp_e = e_data[s_filter]
-            tmp_w = w_data[s_filter]
-            tmp_v = v_data[s_filter]
-            tmp_boot = boot_data[s_filter]
-            df = n - 2
-            mean_e, var_e, qt, sum_w, sum_w2, sum_ew = mean_effect_var_and_q(tmp_e, tmp_w)
-            median_e = median_effect(tmp_e, tmp_w)
-            mean_v = numpy.sum(tmp_v) / (n-1)
-            pooled_var = pooled_var_no_structure(qt, sum_w, sum_w2, df)
-            if options.random_effects:
-                ws_data = numpy.reciprocal(tmp_v + pooled_var)
-                mean_e, var_e, qt, *_ = mean_effect_var_and_q(tmp_e, ws_data)
-                median_e = median_effect(tmp_e, ws_data)
-            p = 1 - scipy.stats.chi2.cdf(qt, df=df)
-            if norm_ci:
-                lower_ci, upper_ci = scipy.stats.norm.interval(confidence=1-alpha, loc=mean_e, scale=math.sqrt(var_e))
-            else:
-                lower_ci, upper_ci = scipy.stats.t.interval(confidence=1-alpha, df=df, loc=mean_e,
-                                                            scale=math.sqrt(var_e))
-            (lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci,
-             bs_results) = bootstrap_means(options.bootstrap_mean, tmp_boot, mean_e, pooled_var,
-                                           options.random_effects, alpha, progress_bar=progress_bar)
-            mean_data = mean_data_tuple(j_label, plot_order, n-1, mean_e, median_e, var_e, mean_v, lower_ci, upper_ci,
-                                        lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci, bs_results)
+        for j, j_label in enumerate(labels):
+            (lower_bs_ci, upper_bs_ci, lower_bias_ci, upper_bias_ci, bs_results) = bootstraps[j]
+            mean_data = mean_data_tuple(j_label, plot_order, n_kept[j], stats.mean[j], stats.median[j],
+                                        stats.var[j], stats.mean_v[j], stats.lower[j], stats.upper[j], lower_bs_ci,
+                                        upper_bs_ci, lower_bias_ci, upper_bias_ci, bs_results)
             jackknife_means.append(mean_data)
-            het_data = heterogeneity_test_tuple("{} Qtotal".format(j_label), qt, df, p, None)
+            het_data = heterogeneity_test_tuple("{} Qtotal".format(j_label), stats.qt[j], n_kept[j] - 1,
+                                                p_values[j], None)
             jackknife_het.append(het_data)
             forest_data.append(mean_data)
             plot_order += 1
 
         # output
         output_blocks.append(["<h3>{}</h3>".format(get_text("Jackknife Results"))])
-        output_blocks.append(["<h4>{}</h4>".format(get_text("Heterogeneity"))])
-        output_blocks.append(heterogeneity_table(jackknife_het, decimal_places))
+        output_blocks.extend(jackknife_output)
+        if len(labels) > 0:
+            output_blocks.append(["<h4>{}</h4>".format(get_text("Heterogeneity"))])
+            output_blocks.append(heterogeneity_table(jackknife_het, decimal_places))
 
-        output_blocks.append(["<h4>{}</h4>".format(get_text("Mean Effect Sizes"))])
-        output_blocks.append(mean_effects_table(effect_sizes.label, jackknife_means, options.bootstrap_mean,
-                             decimal_places, alpha, options.log_transformed))
+            output_blocks.append(["<h4>{}</h4>".format(get_text("Mean Effect Sizes"))])
+            output_blocks.append(mean_effects_table(effect_sizes.label, jackknife_means, jackknife_bootstrap_n,
+                                 decimal_places, alpha, options.log_transformed))
 
         output_blocks.append(["<h3>{}</h3>".format(get_text("Global Results"))])
         new_cites = create_global_output(output_blocks, effect_sizes.label, global_mean_data, global_het_data,
@@ -2393,7 +2618,7 @@ def jackknife_meta_analysis(data, options, decimal_places: int = 4, alpha: float
 
         if options.create_graph:
             chart_data = MetaWinCharts.chart_forest_plot("jackknife analysis", effect_sizes.label, forest_data, alpha,
-                                                         options.bootstrap_mean, normal_ci=norm_ci)
+                                                         jackknife_bootstrap_n, normal_ci=norm_ci)
     else:
         output_blocks.append([get_text("Fewer than two studies were valid for analysis")])
 
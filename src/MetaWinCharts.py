@@ -2042,71 +2042,68 @@ def draw_tree(faxes, tree, minx, maxx, miny, maxy, scale, draw_labels: bool = Fa
     miny and maxy representing the vertical positioning of the node and all of its descendants.
 
     scale is a precalculated value that converts branch lengths to the coordinate system
-    """
 
+    the bounds of every node are found in a pre-order pass over the tree and the nodes are then drawn in a
+    post-order pass, so the descendants of each node are drawn (and positioned) before the node itself
     """
-    the following calculates the horizontal area necessary for the horizontal line connecting the node to it's 
-    ancestor
-    """
-    x = tree.branch_length * scale
+    nodes = tree.tree
+    n_tips = nodes.tip_counts(tree.index)
 
     """
-    if the node has descendants, first draw all of the descendants in the box which goes from the right edge of 
-    the horizontal line for this node to the right hand edge of the drawing window, and the vertical box defined 
-    for the entire node
+    the horizontal line for each node connects its ancestor to it, and the vertical plotting area of each node is
+    divided among its descendants proportional to the number of tips contained within each descendant
     """
-    if tree.n_descendants() > 0:  # this is an internal node
-        top_vert_line = 0
-        bottom_vert_line = 0
-        nd = tree.n_tips()
-        top_y = miny
-        for i, d in enumerate(tree.descendants):
+    bounds = {tree.index: (minx, miny, maxy)}
+    for i in nodes.preorder(tree.index):
+        node_minx, node_miny, node_maxy = bounds[i]
+        x = nodes.branch_lengths[i] * scale
+        top_y = node_miny
+        for d in nodes.children(i):
+            bottom_y = top_y + (n_tips[d] / n_tips[i]) * (node_maxy - node_miny)
+            bounds[d] = (node_minx + x, top_y, bottom_y)
+            top_y = bottom_y
+
+    y_pos = {}
+    for i in nodes.postorder(tree.index):
+        node_minx, node_miny, node_maxy = bounds[i]
+        x = nodes.branch_lengths[i] * scale
+        descendants = nodes.children(i)
+        if len(descendants) > 0:  # this is an internal node
             """
-            divide the vertical plotting area for each descendant proportional to the number of tips contained 
-            within that descendant
+            the vertical position of the first and last descendants represent the positions to draw the vertical
+            line connecting all of the descendants, at the horizontal position of the node
             """
-            ndd = d.n_tips()
-            bottom_y = top_y + (ndd / nd) * (maxy - miny)
-            # draw the descendant in its own smaller bounded box
-            y = draw_tree(faxes, d, minx + x, maxx, top_y, bottom_y, scale, draw_labels, draw_branch_lengths)
+            bottom_vert_line = y_pos[descendants[0]]
+            if len(descendants) > 1:
+                top_vert_line = y_pos[descendants[-1]]
+            else:
+                top_vert_line = 0
+            faxes.plot([node_minx+x, node_minx+x], [bottom_vert_line, top_vert_line], color="black")
 
             """
-            the vertical position of the first and last descendants represent the positions to draw the vertical 
-            line connecting all of the descendants
+            the vertical position of the node should be the midpoint of the
+            vertical line connecting the descendants
             """
-            if i == 0:
-                bottom_vert_line = y
-            elif i == tree.n_descendants() - 1:
-                top_vert_line = y
-            top_y = bottom_y
-        """
-        draw the vertical line connecting the descendants at the horizontal position of the node
-        """
-        faxes.plot([minx+x, minx+x], [bottom_vert_line, top_vert_line], color="black")
-
-        """
-        the vertical position of the node should be the midpoint of the
-        vertical line connecting the descendants
-        """
-        y = ((top_vert_line - bottom_vert_line) / 2) + bottom_vert_line
-    else:  # this is a tip node
-        """
-        if the node has no descendants, figure out the vertical position as the
-        midpoint of the vertical bounds
-        """
-        y = (maxy - miny)/2 + miny
-        if draw_labels:  # if desired, label the node
-            faxes.annotate(tree.name, (minx + x + 5, y - 5))
+            y = ((top_vert_line - bottom_vert_line) / 2) + bottom_vert_line
+        else:  # this is a tip node
+            """
+            if the node has no descendants, figure out the vertical position as the
+            midpoint of the vertical bounds
+            """
+            y = (node_maxy - node_miny)/2 + node_miny
+            if draw_labels:  # if desired, label the node
+                faxes.annotate(nodes.names[i], (node_minx + x + 5, y - 5))
+        y_pos[i] = y
 
-    # draw the horizontal line connecting the node to its ancestor
-    faxes.plot([minx, minx + x], [y, y], color="black")
+        # draw the horizontal line connecting the node to its ancestor
+        faxes.plot([node_minx, node_minx + x], [y, y], color="black")
 
     # add branch lengths
     if draw_branch_lengths:
         pass
         # not enabled
 
-    return y
+    return y_pos[tree.index]
 
 
 def chart_phylogeny(root) -> FigureCanvasQTAgg:
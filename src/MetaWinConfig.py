@@ -8,6 +8,7 @@ from matplotlib.colors import is_color_like
 
 import MetaWinLanguage
 import MetaWinCharts
+import MetaWinResampling
 
 CONFIG_FILE = os.path.join(os.path.dirname(__file__), "metawin.config")
 
@@ -49,7 +50,8 @@ def default_config() -> dict:
         "auto update check": True,
         "alpha": 0.05,
         "confidence interval distribution": "Normal",
-        "color name space": "xkcd"
+        "color name space": "xkcd",
+        "resampling workers": os.cpu_count() or 1
     }
 
 
@@ -97,6 +99,14 @@ def validate_config(key: str, value: str):
         if value == "X11/CSS4":
             return value
         return "xkcd"
+    elif key == "resampling workers":
+        try:
+            value = int(value)
+            if value < 1:
+                raise ValueError
+            return value
+        except ValueError:
+            return None
     return value
 
 
@@ -116,5 +126,6 @@ def export_config(main_window) -> None:
             outfile.write(f"alpha={main_window.alpha}\n")
             outfile.write(f"confidence interval distribution={main_window.confidence_interval_dist}\n")
             outfile.write(f"color name space={MetaWinCharts.color_name_space}\n")
+            outfile.write(f"resampling workers={MetaWinResampling.workers:d}\n")
     except IOError:
         pass
@@ -1,20 +1,53 @@
 """
 Module describing the data container
+
+Values are stored by column: each column holds a float64 array of numbers with a validity mask, and an object
+array only for values which cannot be held as numbers (e.g., strings). MetaWinValue objects are created on
+request as views of single cells.
 """
 
 from typing import Tuple, Optional, Union
 
+import numpy
+
 from MetaWinUtils import format_number
 from MetaWinConstants import VALUE_STRING, VALUE_NUMBER
 from MetaWinLanguage import get_text
 
+# kinds of values which can be stored within a cell
+CELL_EMPTY = 0
+CELL_FLOAT = 1
+CELL_INT = 2
+CELL_OBJECT = 3
+
+# largest integer which can be stored exactly in the float64 array
+MAX_EXACT_INT = 2**53
+
+# initial number of rows allocated for the column arrays
+INITIAL_CAPACITY = 16
+
 
 class MetaWinValue:
+    """
+    A view of a single cell of the data
+
+    Changing the value of a view bound to a row and column writes the new value back into the column storage
+    """
     def __init__(self, r=None, c=None, v=None):
-        self.value = v
+        self.__value = v
         self.row = r
         self.col = c
 
+    @property
+    def value(self):
+        return self.__value
+
+    @value.setter
+    def value(self, v):
+        self.__value = v
+        if (self.row is not None) and (self.col is not None) and (self.col.data is not None):
+            self.col.set_cell(self.row.position(), v)
+
     def position(self) -> Tuple[int, int]:
         return self.row.position(), self.col.position()
 
@@ -38,15 +71,40 @@ class MetaWinValue:
 class MetaWinCol:
     def __init__(self):
         self.label = ""
-        self.values = []
         self.data = None
         self.effect_size = None  # effect size function used to create this column, if any
         self.effect_var = None  # column with matching variance if this column contains an effect size
-        self.group_filter = []
+        self.__group_filter = ()
+        self._kind = numpy.zeros(0, dtype=numpy.int8)
+        self._numbers = numpy.zeros(0, dtype=numpy.float64)
+        self._valid = numpy.zeros(0, dtype=bool)
+        self._objects = None  # only allocated once a value requiring it is stored
+        self._version = 0  # incremented whenever the contents or filter of the column change
+        self._codes_cache = None
+        self._exclusion_cache = None
 
     def position(self) -> int:
         return self.data.col_number(self)
 
+    @property
+    def group_filter(self) -> tuple:
+        """
+        the string forms of the values whose rows are excluded from analyses
+
+        the filter is stored as a tuple and must be replaced, rather than modified in place, to change it
+        """
+        return self.__group_filter
+
+    @group_filter.setter
+    def group_filter(self, value) -> None:
+        self.__group_filter = tuple(value)
+        self.modified()
+
+    def modified(self) -> None:
+        self._version += 1
+        if self.data is not None:
+            self.data.version += 1
+
     def log_transformed(self) -> bool:
         if self.effect_size is None:
             return False
@@ -59,36 +117,224 @@ class MetaWinCol:
         else:
             return self.effect_size.z_transformed
 
+    # --- column storage ---
+    def resize(self, capacity: int) -> None:
+        """
+        grow (or shrink) the storage arrays of the column to the requested number of rows
+        """
+        old_n = min(len(self._kind), capacity)
+        new_kind = numpy.zeros(capacity, dtype=numpy.int8)
+        new_kind[:old_n] = self._kind[:old_n]
+        new_numbers = numpy.full(capacity, numpy.nan)
+        new_numbers[:old_n] = self._numbers[:old_n]
+        new_valid = numpy.zeros(capacity, dtype=bool)
+        new_valid[:old_n] = self._valid[:old_n]
+        self._kind, self._numbers, self._valid = new_kind, new_numbers, new_valid
+        if self._objects is not None:
+            new_objects = numpy.full(capacity, None, dtype=object)
+            new_objects[:old_n] = self._objects[:old_n]
+            self._objects = new_objects
+
+    def set_cell(self, r: int, v) -> None:
+        """
+        store a value in row r of the column
+        """
+        if v is None:
+            self.clear_cell(r)
+            return
+        self.modified()
+        if isinstance(v, float):
+            self._kind[r] = CELL_FLOAT
+            self._numbers[r] = v
+            self._valid[r] = True
+            if self._objects is not None:
+                self._objects[r] = None
+        elif (type(v) is int) and (abs(v) <= MAX_EXACT_INT):
+            self._kind[r] = CELL_INT
+            self._numbers[r] = v
+            self._valid[r] = True
+            if self._objects is not None:
+                self._objects[r] = None
+        else:
+            if self._objects is None:
+                self._objects = numpy.full(len(self._kind), None, dtype=object)
+            self._kind[r] = CELL_OBJECT
+            self._objects[r] = v
+            try:
+                self._numbers[r] = float(v)
+                self._valid[r] = True
+            except (ValueError, TypeError, OverflowError):
+                self._numbers[r] = numpy.nan
+                self._valid[r] = False
+
+    def clear_cell(self, r: int) -> None:
+        self.modified()
+        self._kind[r] = CELL_EMPTY
+        self._numbers[r] = numpy.nan
+        self._valid[r] = False
+        if self._objects is not None:
+            self._objects[r] = None
+
+    def cell(self, r: int):
+        """
+        return the raw value stored in row r of the column, or None if the cell is empty
+        """
+        kind = self._kind[r]
+        if kind == CELL_FLOAT:
+            return float(self._numbers[r])
+        elif kind == CELL_INT:
+            return int(self._numbers[r])
+        elif kind == CELL_OBJECT:
+            return self._objects[r]
+        return None
+
+    def remove_cell(self, r: int, n: int) -> None:
+        """
+        remove row r from the column, shifting the following rows up; n is the number of rows after removal
+        """
+        for array in (self._kind, self._numbers, self._valid, self._objects):
+            if array is not None:
+                array[r:n] = array[r+1:n+1]
+        self.clear_cell(n)
+
+    def reorder_cells(self, new_order: list) -> None:
+        n = len(new_order)
+        for array in (self._kind, self._numbers, self._valid, self._objects):
+            if array is not None:
+                array[:n] = array[new_order]
+        self.modified()
+
+    def is_number(self, r: int) -> bool:
+        return bool(self._valid[r])
+
+    def numeric_values(self) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        return the numeric interpretation of every row of the column, along with a boolean mask indicating
+        which of those rows contain a valid number
+
+        the returned arrays are read-only views of the storage
+        """
+        n = self.data.nrows()
+        values = self._numbers[:n]
+        valid = self._valid[:n]
+        values.flags.writeable = False
+        valid.flags.writeable = False
+        return values, valid
+
+    def string_values(self) -> numpy.ndarray:
+        """
+        return an object array containing the string form of every row of the column, with None for empty cells
+        """
+        n = self.data.nrows()
+        output = numpy.full(n, None, dtype=object)
+        for r in numpy.flatnonzero(self._kind[:n]):
+            output[r] = str(self.cell(r))
+        return output
+
+    def string_codes(self) -> Tuple[list, numpy.ndarray]:
+        """
+        factorize the string form of the column
+
+        returns a sorted list of the distinct strings in the column and an integer array giving the index of
+        each row's string within that list, with -1 for empty cells. the result is cached until the column changes
+        """
+        n = self.data.nrows()
+        if (self._codes_cache is None) or (self._codes_cache[0] != (self._version, n)):
+            strings = self.string_values()
+            not_empty = self._kind[:n] != CELL_EMPTY
+            codes = numpy.full(n, -1, dtype=numpy.int64)
+            if numpy.any(not_empty):
+                categories, codes[not_empty] = numpy.unique(strings[not_empty].astype(str), return_inverse=True)
+                categories = [str(x) for x in categories]
+            else:
+                categories = []
+            codes.flags.writeable = False
+            self._codes_cache = ((self._version, n), categories, codes)
+        return self._codes_cache[1], self._codes_cache[2]
+
+    def filter_exclusions(self) -> numpy.ndarray:
+        """
+        return a boolean array marking the rows excluded by the group filter of this column
+        """
+        n = self.data.nrows()
+        blank = f"[{get_text("blanks")}]"
+        key = (self._version, n, blank)
+        if (self._exclusion_cache is None) or (self._exclusion_cache[0] != key):
+            if len(self.group_filter) > 0:
+                categories, codes = self.string_codes()
+                filtered_codes = [i for i, g in enumerate(categories) if g in self.group_filter]
+                if blank in self.group_filter:
+                    filtered_codes.append(-1)
+                excluded = numpy.isin(codes, filtered_codes)
+            else:
+                excluded = numpy.zeros(n, dtype=bool)
+            excluded.flags.writeable = False
+            self._exclusion_cache = (key, excluded)
+        return self._exclusion_cache[1]
+
+    @property
+    def values(self) -> list:
+        """
+        views of every non-empty cell in the column
+        """
+        rows = self.data.rows
+        return [MetaWinValue(rows[r], self, self.cell(r)) for r in numpy.flatnonzero(self._kind[:len(rows)])]
+
 
 class MetaWinRow:
     def __init__(self):
         self.label = ""
-        self.values = []
         self.data = None
-        self.include_row = True
+        self.__include_row = True
 
     def position(self) -> int:
         return self.data.row_number(self)
 
+    @property
+    def include_row(self) -> bool:
+        return self.__include_row
+
+    @include_row.setter
+    def include_row(self, value: bool) -> None:
+        self.__include_row = value
+        if self.data is not None:
+            self.data.row_filter_changed(self)
+
     def not_filtered(self) -> bool:
-        if not self.include_row:
-            return False
-        for c, col in enumerate(self.data.cols):
-            d = self.data.value(self.position(), c)
-            if d is not None:
-                d = d.value
-            else:
-                d = f"[{get_text("blanks")}]"
-            if str(d) in col.group_filter:
-                return False
-        return True
+        return bool(self.data.filter_mask()[self.position()])
+
+    @property
+    def values(self) -> list:
+        """
+        views of every non-empty cell in the row
+        """
+        r = self.position()
+        output = []
+        for col in self.data.cols:
+            v = col.cell(r)
+            if v is not None:
+                output.append(MetaWinValue(self, col, v))
+        return output
 
 
 class MetaWinData:
+    """
+    The rows and cols lists should only be changed through the methods of this class, as the class keeps a
+    map of each row and column to its position so that positions can be found in constant time
+    """
     def __init__(self):
         self.rows = []
         self.cols = []
-        self.data = {}
+        self._capacity = 0
+        self._row_positions = {}
+        self._col_positions = {}
+        self.version = 0  # incremented whenever the data or filters change
+        self._include = None  # cached include_row flags of all rows
+        self._excluded = None  # cached rows excluded by any column filter
+        self._mask = None
+        self._mask_version = -1
+        self._result_cache = {}
+        self._result_cache_version = -1
 
     def nrows(self) -> int:
         return len(self.rows)
@@ -99,7 +345,13 @@ class MetaWinData:
     def add_row(self, label=None) -> MetaWinRow:
         new_row = MetaWinRow()
         new_row.data = self
+        self._row_positions[new_row] = len(self.rows)
         self.rows.append(new_row)
+        self.rows_changed()
+        if self.nrows() > self._capacity:
+            self._capacity = max(INITIAL_CAPACITY, 2*self._capacity)
+            for col in self.cols:
+                col.resize(self._capacity)
         if label is None:
             new_row.label = "Row {}".format(self.nrows())
         else:
@@ -109,49 +361,160 @@ class MetaWinData:
     def add_col(self, label=None) -> MetaWinCol:
         new_col = MetaWinCol()
         new_col.data = self
+        new_col.resize(self._capacity)
+        self._col_positions[new_col] = len(self.cols)
         self.cols.append(new_col)
+        self.version += 1
         if label is None:
             new_col.label = "Column {}".format(self.ncols())
         else:
             new_col.label = label
         return new_col
 
+    def delete_row(self, r: int) -> None:
+        r = self.row_index(r)
+        row = self.rows.pop(r)
+        del self._row_positions[row]
+        for col in self.cols:
+            col.remove_cell(r, len(self.rows))
+        self.update_row_positions(r)
+        self.rows_changed()
+
+    def delete_col(self, c: int) -> None:
+        c = range(len(self.cols))[c]
+        col = self.cols.pop(c)
+        del self._col_positions[col]
+        self.update_col_positions(c)
+        self.version += 1
+
+    def reorder_rows(self, new_order: list) -> None:
+        """
+        rearrange the rows so that the row currently at position new_order[i] is moved to position i
+        """
+        if sorted(new_order) != list(range(self.nrows())):
+            raise ValueError("new row order must contain each current row position exactly once")
+        self.rows = [self.rows[r] for r in new_order]
+        for col in self.cols:
+            col.reorder_cells(new_order)
+        self.update_row_positions()
+        self.rows_changed()
+
+    def reorder_cols(self, new_order: list) -> None:
+        """
+        rearrange the columns so that the column currently at position new_order[i] is moved to position i
+        """
+        if sorted(new_order) != list(range(self.ncols())):
+            raise ValueError("new column order must contain each current column position exactly once")
+        self.cols = [self.cols[c] for c in new_order]
+        self.update_col_positions()
+        self.version += 1
+
+    def rows_changed(self) -> None:
+        self._include = None
+        self.version += 1
+
+    def row_filter_changed(self, row: MetaWinRow) -> None:
+        """
+        update the cached filter mask after the include_row flag of a single row has changed
+        """
+        mask_current = self._mask_version == self.version
+        self.version += 1
+        if self._include is not None:
+            r = row.position()
+            self._include[r] = row.include_row
+            if mask_current:
+                self._mask[r] = row.include_row and not self._excluded[r]
+                self._mask_version = self.version
+
+    def cached_result(self, key, calculate):
+        """
+        return the result of calculate() for key, reusing the result of an earlier call if neither the data nor
+        the filters have changed since it was made
+        """
+        if self._result_cache_version != self.version:
+            self._result_cache = {}
+            self._result_cache_version = self.version
+        if key not in self._result_cache:
+            self._result_cache[key] = calculate()
+        return self._result_cache[key]
+
+    def filter_mask(self) -> numpy.ndarray:
+        """
+        return a read-only boolean array marking every row which is not filtered from analyses, either because
+        the row was excluded directly or because one of its values is excluded by a column filter
+
+        the mask is cached and only rebuilt when the data or filters change
+        """
+        if self._mask_version != self.version:
+            n = self.nrows()
+            if self._include is None:
+                self._include = numpy.fromiter((row.include_row for row in self.rows), dtype=bool, count=n)
+            self._excluded = numpy.zeros(n, dtype=bool)
+            for col in self.cols:
+                if len(col.group_filter) > 0:
+                    self._excluded |= col.filter_exclusions()
+            self._mask = self._include & ~self._excluded
+            self._mask_version = self.version
+        mask = self._mask.view()
+        mask.flags.writeable = False
+        return mask
+
+    def update_row_positions(self, start: int = 0) -> None:
+        for r in range(start, len(self.rows)):
+            self._row_positions[self.rows[r]] = r
+
+    def update_col_positions(self, start: int = 0) -> None:
+        for c in range(start, len(self.cols)):
+            self._col_positions[self.cols[c]] = c
+
     def row_number(self, row: MetaWinRow) -> int:
-        return self.rows.index(row)
+        try:
+            return self._row_positions[row]
+        except KeyError:
+            raise ValueError("row is not part of this data")
 
     def col_number(self, col: MetaWinCol) -> int:
-        return self.cols.index(col)
+        try:
+            return self._col_positions[col]
+        except KeyError:
+            raise ValueError("column is not part of this data")
+
+    def row_index(self, r: int) -> int:
+        """
+        validate a row number, converting negative (from the end) row numbers into their positive equivalent
+        """
+        return range(len(self.rows))[r]
 
     def value(self, r: int, c: int) -> Optional[MetaWinValue]:
-        return self.data.get((self.rows[r], self.cols[c]), None)
+        r = self.row_index(r)
+        col = self.cols[c]
+        v = col.cell(r)
+        if v is None:
+            return None
+        return MetaWinValue(self.rows[r], col, v)
 
     def check_value(self, r: int, c: int, value_type: int = VALUE_NUMBER):
-        x = self.value(r, c)
+        r = self.row_index(r)
+        col = self.cols[c]
+        x = col.cell(r)
         if x is not None:
             if value_type == VALUE_NUMBER:
-                if x.is_number():
-                    return x.value
+                if col.is_number(r):
+                    return x
             elif value_type == VALUE_STRING:
-                return str(x.value)
+                return str(x)
             else:
-                return x.value
+                return x
         return None
 
     def add_value(self, r: int, c: int, v: Union[int, float, str]) -> MetaWinValue:
-        row = self.rows[r]
+        r = self.row_index(r)
         col = self.cols[c]
-        new_value = MetaWinValue(row, col, v)
-        row.values.append(new_value)
-        col.values.append(new_value)
-        self.data[row, col] = new_value
-        return new_value
+        col.set_cell(r, v)
+        return MetaWinValue(self.rows[r], col, v)
 
     def delete_value(self, r: int, c: int) -> None:
-        value = self.value(r, c)
-        if value is not None:
-            value.row.values.remove(value)
-            value.col.values.remove(value)
-            self.data.pop((value.row, value.col))
+        self.cols[c].clear_cell(self.row_index(r))
 
     def replace_value(self, r: int, c: int, v: Union[int, float, str]) -> MetaWinValue:
         self.delete_value(r, c)
@@ -418,8 +418,9 @@ def draw_scatter_plot(data, x_data_col, y_data_col):
     y_data = []
     bad_data = []
     filtered = []
+    included = data.filter_mask()
     for r, row in enumerate(data.rows):
-        if row.not_filtered():
+        if included[r]:
             x = data.check_value(r, x_data_col.position(), value_type=MetaWinConstants.VALUE_NUMBER)
             y = data.check_value(r, y_data_col.position(), value_type=MetaWinConstants.VALUE_NUMBER)
             if (x is not None) and (y is not None):
@@ -470,8 +471,9 @@ def draw_normal_quantile_plot(data, e_data_col, v_data_col, alpha: float = 0.05)
     y_data = []
     bad_data = []
     filtered = []
+    included = data.filter_mask()
     for r, row in enumerate(data.rows):
-        if row.not_filtered():
+        if included[r]:
             e = data.check_value(r, e_data_col.position(), value_type=MetaWinConstants.VALUE_NUMBER)
             v = data.check_value(r, v_data_col.position(), value_type=MetaWinConstants.VALUE_NUMBER)
             if (e is not None) and (v is not None) and (v > 0):
@@ -514,8 +516,9 @@ def draw_radial_plot(data, e_data_col, v_data_col, is_log: bool = False):
     tmp_e = []
     bad_data = []
     filtered = []
+    included = data.filter_mask()
     for r, row in enumerate(data.rows):
-        if row.not_filtered():
+        if included[r]:
             e = data.check_value(r, e_data_col.position(), value_type=MetaWinConstants.VALUE_NUMBER)
             v = data.check_value(r, v_data_col.position(), value_type=MetaWinConstants.VALUE_NUMBER)
             if (e is not None) and (v is not None) and (v > 0):
@@ -559,8 +562,9 @@ def draw_histogram_plot(data, e_data_col, w_data_col, weight_type, n_bins: int):
     w_data = []
     bad_data = []
     filtered = []
+    included = data.filter_mask()
     for r, row in enumerate(data.rows):
-        if row.not_filtered():
+        if included[r]:
             e = data.check_value(r, e_data_col.position(), value_type=MetaWinConstants.VALUE_NUMBER)
             if weight_type != MetaWinCharts.WEIGHT_NONE:
                 w = data.check_value(r, w_data_col.position(), value_type=MetaWinConstants.VALUE_NUMBER)
@@ -614,8 +618,9 @@ def draw_forest_plot(data, e_data_col, v_data_col, alpha: float = 0.05, fp_style
     filtered = []
     y = 0
     data_list = []
+    included = data.filter_mask()
     for r, row in enumerate(data.rows):
-        if row.not_filtered():
+        if included[r]:
             e = data.check_value(r, e_data_col.position(), value_type=MetaWinConstants.VALUE_NUMBER)
             v = data.check_value(r, v_data_col.position(), value_type=MetaWinConstants.VALUE_NUMBER)
             if (e is not None) and (v is not None) and (v > 0):
@@ -661,8 +666,9 @@ def draw_marc_plot(data, e_data_col, v_data_col, alpha: float = 0.05, marc_style
     filtered = []
     y = 0
     data_list = []
+    included = data.filter_mask()
     for r, row in enumerate(data.rows):
-        if row.not_filtered():
+        if included[r]:
             e = data.check_value(r, e_data_col.position(), value_type=MetaWinConstants.VALUE_NUMBER)
             v = data.check_value(r, v_data_col.position(), value_type=MetaWinConstants.VALUE_NUMBER)
             if (e is not None) and (v is not None) and (v > 0):
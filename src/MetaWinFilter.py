@@ -96,9 +96,10 @@ def filter_within_column(sender, data, column) -> bool:
     """
     sender.filter_within_col_dialog = FilterWithinColumnDialog(data, column)
     if sender.filter_within_col_dialog.exec():
-        column.group_filter = []
+        group_filter = []
         for i, name in enumerate(sender.filter_within_col_dialog.group_names):
             if not sender.filter_within_col_dialog.checkbox_list[i].isChecked():
-                column.group_filter.append(name)
+                group_filter.append(name)
+        column.group_filter = group_filter
         return True
     return False
@@ -319,18 +319,27 @@ def import_phylogeny(sender, filename: str) -> Tuple[Optional[MetaWinTree.Node],
     If successful, returns the root of the phylogeny and a list containing output text
     """
     try:
-        with open(filename, "r") as infile:
-            newick_str = infile.read()
         try:
-            new_phylogeny = MetaWinTree.read_newick_tree(newick_str)
+            with open(filename, "r") as infile:
+                trees = MetaWinTree.read_trees(infile)
+                new_phylogeny = next(trees, None)
+                # only read far enough to know whether the file contains further trees
+                more_trees = (new_phylogeny is not None) and (next(trees, None) is not None)
+            if new_phylogeny is None:
+                raise ValueError("No tree found")
             output_blocks = [["<h3>{}</h3>".format(get_text("Load Phylogeny"))]]
             output = [get_text("Imported phylogeny from {}").format(filename),
                       get_text("Imported phylogeny contains {} tips").format(new_phylogeny.n_tips())]
+            if more_trees:
+                output.append(get_text("File contains more than one tree; only the first was imported"))
             output_blocks.append(output)
             return new_phylogeny, output_blocks
-        except IndexError:
+        except (IndexError, ValueError):
             MetaWinMessages.report_critical(sender, get_text("Import Error"),
                                             get_text("error_not_newick").format(filename))
+        except UnicodeDecodeError:
+            MetaWinMessages.report_critical(sender, get_text("Import Error"),
+                                            get_text("error_not_text_file").format(filename))
     except IOError:
         MetaWinMessages.report_critical(sender, get_text("Input/Output Error"),
                                         get_text("Error reading file {}").format(filename))
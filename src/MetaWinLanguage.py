@@ -7,12 +7,16 @@ current_language = "English"
 
 
 ENGLISH_DICTIONARY = {"error_not_text_file": "{} does not appear to be a text file.",
-                      "error_not_newick": "{} does not appear to contain a phylogeny in Newick format.",
+                      "error_not_newick": "{} does not appear to contain a phylogeny in Newick or NEXUS format.",
                       "{} studies": "{} studies",
+                      "{} studies cannot be left out while keeping at least two in the analysis":
+                          "{} studies cannot be left out while keeping at least two in the analysis",
                       "{} studies will be included in this analysis": "{} studies will be included in this analysis",
+                      "{} of {} trees were analyzed": "{} of {} trees were analyzed",
                       "About Localization": "About Localization",
                       "About MetaWin": "About MetaWin",
                       "Additional Options": "Additional Options",
+                      "Analyzing Trees": "Analyzing Trees",
                       "Analysis": "Analysis",
                       "Analysis Error Encountered": "Analysis Error Encountered",
                       "AE-singular": "The design matrix was singular and could not be inverted. This is most likely "
@@ -35,7 +39,10 @@ ENGLISH_DICTIONARY = {"error_not_text_file": "{} does not appear to be a text fi
                                            "values are indicated by the {} raindrop.",
                       "Bootstrap Confidence Limits": "Bootstrap Confidence Limits",
                       "Bootstrap Distribution": "Bootstrap Distribution",
+                      "Bootstrap the mean with each study left out": "Bootstrap the mean with each study left out",
                       "Bias-corrected Bootstrap Confidence Limits": "Bias-corrected Bootstrap Confidence Limits",
+                      "Central {:0.0%} of Trees": "Central {:0.0%} of Trees",
+                      "Central {:0.0%} of Subsets": "Central {:0.0%} of Subsets",
                       "Calculate Effect Sizes": "Calculate Effect Sizes",
                       "Cancel": "Cancel",
                       "Categorical Variables": "Categorical Variables",
@@ -99,6 +106,8 @@ ENGLISH_DICTIONARY = {"error_not_text_file": "{} does not appear to be a text fi
                       "drag_nesting":
                           "Drag and drop variables to indicate desired nested structure, from top to bottom.",
                       "Draw": "Draw",
+                      "Each Group of": "Each Group of",
+                      "Each Study": "Each Study",
                       "Edge Color": "Edge Color",
                       "Edge Style": "Edge Style",
                       "Edge Width": "Edge Width",
@@ -134,6 +143,8 @@ ENGLISH_DICTIONARY = {"error_not_text_file": "{} does not appear to be a text fi
                                       "nesting.",
                       "Figure": "Figure",
                       "File": "File",
+                      "File contains more than one tree; only the first was imported":
+                          "File contains more than one tree; only the first was imported",
                       "Filter within Column": "Filter within Column",
                       "Filtered Row Color": "Filtered Row Color",
                       "Filtered within Column Color": "Filtered within Column Color",
@@ -141,6 +152,7 @@ ENGLISH_DICTIONARY = {"error_not_text_file": "{} does not appear to be a text fi
                       "First Row Contains Column Headers": "First Row Contains Column Headers",
                       "fixed effects": "fixed effects",
                       "Fixed Effects Model": "Fixed Effects Model",
+                      "Fixed effects residual heterogeneity (Qe)": "Fixed effects residual heterogeneity (Qe)",
                       "Font": "Font",
                       "Forest Plot": "Forest Plot",
                       "Forest plot of individual effect sizes for each study.":
@@ -204,6 +216,8 @@ ENGLISH_DICTIONARY = {"error_not_text_file": "{} does not appear to be a text fi
                       "Grouped": "Grouped",
                       "Grouped Meta-Analysis": "Grouped Meta-Analysis",
                       "Groups": "Groups",
+                      "Groups whose omission would leave fewer than two studies were not left out":
+                          "Groups whose omission would leave fewer than two studies were not left out",
                       "Help": "Help",
                       "Heterogeneity": "Heterogeneity",
                       "Hide Data Toolbar": "Hide Data Toolbar",
@@ -238,6 +252,9 @@ ENGLISH_DICTIONARY = {"error_not_text_file": "{} does not appear to be a text fi
                       "jackknife_forest_plot": "Forest plot of mean effect sizes from a jackknife meta-analysis, "
                                                "with the summary repeated with each study removed, one by one.",
                       "Language": "Language",
+                      "Leave Out": "Leave Out",
+                      "Leave out each group of": "Leave out each group of",
+                      "Leave out {} random subsets of {} studies": "Leave out {} random subsets of {} studies",
                       "Line of No Effect": "Line of No Effect",
                       "Lines of No Effect and Weight": "Lines of No Effect and Weight",
                       "Linear Meta-Regression Analysis": "Linear Meta-Regression Analysis",
@@ -303,6 +320,7 @@ ENGLISH_DICTIONARY = {"error_not_text_file": "{} does not appear to be a text fi
                       "Number of decimal places": "Number of decimal places",
                       "Number of Decimal Places to Display": "Number of Decimal Places to Display",
                       "Number of Iterations": "Number of Iterations",
+                      "Number of Subsets": "Number of Subsets",
                       "Ok": "Ok",
                       "Options": "Options",
                       "Original Data": "Original Data",
@@ -314,9 +332,12 @@ ENGLISH_DICTIONARY = {"error_not_text_file": "{} does not appear to be a text fi
                       "Output has not been saved": "Output has not been saved",
                       "Output Options": "Output Options",
                       "Pairs of Means": "Pairs of Means",
+                      "Permute only within the groups of the level above":
+                          "Permute only within the groups of the level above",
                       "Phylogenetic GLM Meta-Analysis": "Phylogenetic GLM Meta-Analysis",
                       "Phylogeny": "Phylogeny",
                       "Phylogeny contains {} tips": "Phylogeny contains {} tips",
+                      "Phylogeny Sample Progress": "Phylogeny Sample Progress",
                       "Phylogeny Tip Names": "Phylogeny Tip Names",
                       "phylogeny_ind_error":
                           "You must choose at least one independent variable in either the categorical or continous "
@@ -324,6 +345,7 @@ ENGLISH_DICTIONARY = {"error_not_text_file": "{} does not appear to be a text fi
                       "Plain Text": "Plain Text",
                       "Please filter problematic data to continue": "Please filter problematic data to continue",
                       "Point Data": "Point Data",
+                      "Pooled Variance": "Pooled Variance",
                       "Power": "Power",
                       "Precision": "Precision",
                       "Pre-filtered studies excluded from analysis": "Pre-filtered studies excluded from analysis",
@@ -331,6 +353,8 @@ ENGLISH_DICTIONARY = {"error_not_text_file": "{} does not appear to be a text fi
                       "Predictors": "Predictors",
                       "Probabilities": "Probabilities",
                       "Probability": "Probability",
+                      "Probability of as small a Qe with the tips randomly rearranged":
+                          "Probability of as small a Qe with the tips randomly rearranged",
                       "prompt_data_save_clear": "Do you want to save the data before clearing it?",
                       "prompt_data_save_quit": "Do you want to save the data before quitting?",
                       "prompt_output_save_quit": "Do you want to save the output before quitting?",
@@ -344,9 +368,14 @@ ENGLISH_DICTIONARY = {"error_not_text_file": "{} does not appear to be a text fi
                       "Random (Mixed) Effects Model": "Random (Mixed) Effects Model",
                       "random effects": "random effects",
                       "Random Effects Model": "Random Effects Model",
+                      "Random Number Seed": "Random Number Seed",
+                      "Random Number Seed (optional)": "Random Number Seed (optional)",
+                      "Random Subsets of Studies": "Random Subsets of Studies",
                       "randomization": "randomization",
                       "Randomization Test for Model Structure": "Randomization Test for Model Structure",
                       "Randomization Test for Phylogenetic Structure": "Randomization Test for Phylogenetic Structure",
+                      "Randomization test stopped early after {} of {} iterations, once its outcome was settled":
+                          "Randomization test stopped early after {} of {} iterations, once its outcome was settled",
                       "Randomization to test correlation": "Randomization to test correlation",
                       "Rank Correlation Analysis": "Rank Correlation Analysis",
                       "Rank Correlation Method": "Rank Correlation Method",
@@ -361,7 +390,11 @@ ENGLISH_DICTIONARY = {"error_not_text_file": "{} does not appear to be a text fi
                       "stndregression_caption": "Plot of {} vs. {}, under a {} model.",
                       "Regression Line": "Regression Line",
                       "Resampling Procedures": "Resampling Procedures",
+                      "Repeat the analysis for every tree in the phylogeny file":
+                          "Repeat the analysis for every tree in the phylogeny file",
                       "Response": "Response",
+                      "Results Across Sample of Trees": "Results Across Sample of Trees",
+                      "Results Across Random Subsets": "Results Across Random Subsets",
                       "rosenberg_fs_error":
                           "Estimate of pooled variance was less than zero. This fail-safe number cannot be calculated.",
                       "rosenberg_fs_rand":
@@ -393,8 +426,12 @@ ENGLISH_DICTIONARY = {"error_not_text_file": "{} does not appear to be a text fi
                       "Standardized": "Standardized",
                       "Standardized Effect Size": "Standardized Effect Size",
                       "Started at ": "Started at ",
+                      "Statistic": "Statistic",
                       "Statistical Calculator": "Statistical Calculator",
+                      "Stop randomization once its outcome is settled":
+                          "Stop randomization once its outcome is settled",
                       "Structure": "Structure",
+                      "Studies per Subset": "Studies per Subset",
                       "Studies with invalid data": "Studies with invalid data",
                       "Study": "Study",
                       "Style": "Style",
@@ -424,6 +461,8 @@ ENGLISH_DICTIONARY = {"error_not_text_file": "{} does not appear to be a text fi
                       # "Upper Prediction Limit": "Upper Prediction Limit",
                       "Use bootstrap for confidence intervals around means":
                           "Use bootstrap for confidence intervals around means",
+                      "Use linear-time tree algorithm (for large phylogenies)":
+                          "Use linear-time tree algorithm (for large phylogenies)",
                       "Use randomization to test model structure": "Use randomization to test model structure",
                       "Use randomization to test phylogenentic structure":
                           "Use randomization to test phylogenentic structure",
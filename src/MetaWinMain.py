@@ -6,6 +6,8 @@ import webbrowser
 import datetime
 import sys
 
+import numpy
+
 from PyQt6.QtWidgets import QMainWindow, QTabWidget, QTableWidget, QFileDialog, QTableWidgetItem, QMenu, QInputDialog, \
     QApplication, QTextEdit, QColorDialog, QToolBar, QFrame, QHBoxLayout, QVBoxLayout, QLabel, QFontDialog, \
     QWidgetAction, QComboBox
@@ -24,12 +26,14 @@ import MetaWinSave
 import MetaWinEffects
 import MetaWinMessages
 import MetaWinAnalysis
+import MetaWinPhylogenetics
 import MetaWinPubBias
 import MetaWinDraw
 import MetaWinFilter
 import MetaWinLanguage
 from MetaWinLanguage import get_text
 import MetaWinConfig
+import MetaWinResampling
 
 
 class MainWindow(QMainWindow):
@@ -40,11 +44,14 @@ class MainWindow(QMainWindow):
         self.output_area = None
         self.graph_area = None
         self.phylogeny = None
+        self.phylogeny_file = None
         self.tree_area = None
         self.tree_info_label = None
         self.clicked_header = None
+        self.filter_state = None  # filter status of every displayed cell, used to repaint only changes
         MetaWinLanguage.current_language = config["language"]
         MetaWinCharts.color_name_space = config["color name space"]
+        MetaWinResampling.workers = config["resampling workers"]
         self.output_decimals = config["output decimals"]
         self.data_decimals = config["data decimals"]
         self.filtered_row_color = config["filtered row color"]
@@ -506,7 +513,6 @@ class MainWindow(QMainWindow):
             row_headers = [row.label for row in self.data.rows]
             col_headers = [col.label for col in self.data.cols]
             for r in range(nrows):
-                not_filtered = self.data.rows[r].not_filtered()
                 for c, column in enumerate(self.data.cols):
                     dat = self.data.value(r, c)
                     if dat is None:
@@ -515,26 +521,40 @@ class MainWindow(QMainWindow):
                         new_item = QTableWidgetItem(format_number(dat.value, decimals=self.data_decimals))
                     else:
                         new_item = QTableWidgetItem(dat.value)
-                    if not not_filtered:
-                        # if dat is None:
-                        #     new_item.setBackground(QColor(self.filtered_row_color))
-                        # elif str(dat.value) in column.group_filter:
-                        #     new_item.setBackground(QColor(self.filtered_col_color))
-                        # else:
-                        #     new_item.setBackground(QColor(self.filtered_row_color))
-                        if dat is None:
-                            dat_value = f"[{get_text("blanks")}]"
-                        else:
-                            dat_value = str(dat.value)
-                        if dat_value in column.group_filter:
-                            new_item.setBackground(QColor(self.filtered_col_color))
-                        else:
-                            new_item.setBackground(QColor(self.filtered_row_color))
-
                     new_item.setFlags(QtCore.Qt.ItemFlag.ItemIsSelectable | QtCore.Qt.ItemFlag.ItemIsEnabled)
                     self.data_area.setItem(r, c, new_item)
         self.data_area.setVerticalHeaderLabels(row_headers)
         self.data_area.setHorizontalHeaderLabels(col_headers)
+        self.filter_state = None
+        self.refresh_filters()
+
+    def refresh_filters(self) -> None:
+        """
+        Recolor the data table to reflect the current row and column filters
+
+        Only cells whose filter status has changed since the last call are repainted
+        """
+        if self.data is None:
+            self.filter_state = None
+            return
+        mask = self.data.filter_mask()
+        state = numpy.column_stack([mask] + [col.filter_exclusions() for col in self.data.cols])
+        if (self.filter_state is None) or (self.filter_state.shape != state.shape):
+            changed_rows = numpy.flatnonzero(~mask)
+        else:
+            changed_rows = numpy.flatnonzero(numpy.any(state != self.filter_state, axis=1))
+        for r in changed_rows:
+            for c in range(self.data.ncols()):
+                item = self.data_area.item(r, c)
+                if item is None:
+                    continue
+                if mask[r]:
+                    item.setData(QtCore.Qt.ItemDataRole.BackgroundRole, None)
+                elif state[r, c+1]:
+                    item.setBackground(QColor(self.filtered_col_color))
+                else:
+                    item.setBackground(QColor(self.filtered_row_color))
+        self.filter_state = state
 
     def calculate_effect_sizes(self) -> None:
         if self.data is not None:
@@ -600,7 +620,7 @@ class MainWindow(QMainWindow):
 
     def toggle_row(self) -> None:
         self.clicked_header.include_row = not self.clicked_header.include_row
-        self.refresh_data()
+        self.refresh_filters()
 
     def column_header_popup(self, pos) -> None:
         """
@@ -617,7 +637,7 @@ class MainWindow(QMainWindow):
     def filter_by_column(self) -> None:
         if self.data is not None:
             if MetaWinFilter.filter_within_column(self, self.data, self.clicked_header):
-                self.refresh_data()
+                self.refresh_filters()
 
     def set_data_decimal_places(self) -> None:
         x, ok_pressed = QInputDialog.getInt(self, get_text("Data Decimals"),
@@ -756,7 +776,7 @@ class MainWindow(QMainWindow):
                 norm_ci = True
             output, chart_data = MetaWinAnalysis.meta_analysis(self, self.data, self.last_effect, self.last_var,
                                                                self.output_decimals, self.alpha, self.phylogeny,
-                                                               norm_ci)
+                                                               norm_ci, self.phylogeny_file)
             if output is not None:
                 self.write_multi_output_blocks(output)
                 self.main_area.setCurrentIndex(1)
@@ -797,6 +817,8 @@ class MainWindow(QMainWindow):
             new_tree, output = MetaWinImport.import_phylogeny(self, inname[0])
             if new_tree is not None:
                 self.phylogeny = new_tree
+                self.phylogeny_file = inname[0]
+                MetaWinPhylogenetics.clear_phylogenetic_cache()
                 self.tree_info_label.setText(get_text("Phylogeny contains {} tips").format(self.phylogeny.n_tips()))
                 self.refresh_tree_panel()
                 self.write_multi_output_blocks(output)
@@ -859,19 +881,21 @@ class MainWindow(QMainWindow):
             for col in self.data.cols:
                 col.group_filter = []
 
-            self.refresh_data()
+            self.refresh_filters()
 
     def set_filter_row_color(self) -> None:
         color = QColorDialog.getColor(initial=QColor(self.filtered_row_color))
         if color.isValid():
             self.filtered_row_color = color
-            self.refresh_data()
+            self.filter_state = None
+            self.refresh_filters()
 
     def set_filter_col_color(self) -> None:
         color = QColorDialog.getColor(initial=QColor(self.filtered_col_color))
         if color.isValid():
             self.filtered_col_color = color
-            self.refresh_data()
+            self.filter_state = None
+            self.refresh_filters()
 
     def set_output_font(self) -> None:
         new_font, ok = QFontDialog.getFont(self.output_area.currentFont())
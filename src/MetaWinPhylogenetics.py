@@ -0,0 +1,519 @@
+"""
+Phylogenetic calculation module
+
+This module contains the generalized least squares calculations of the phylogenetic meta-analyses, along with the
+caches of phylogenetic correlation matrices and pruned trees. It is kept apart from the interface modules so that
+it may also be imported quickly by the resampling workers
+"""
+
+from typing import Tuple, Optional
+from collections import namedtuple, Counter, OrderedDict
+
+import numpy
+import scipy.linalg
+
+from MetaWinResamplingTasks import RESAMPLING_CHUNK_SIZE, weighted_glm
+
+
+study_tree_tuple = namedtuple("study_tree_tuple", ["node_parent", "node_variance", "study_parent", "study_variance"])
+
+correlation_cache_entry = namedtuple("correlation_cache_entry", ["tree", "token", "root", "tips", "mrca", "matrix"])
+
+pruned_tree_entry = namedtuple("pruned_tree_entry", ["tree", "token", "root", "tips", "mrca", "pruned"])
+
+# phylogenetic correlation matrices already calculated, from the least to the most recently used, keyed by the tree
+# and the ordered tip names, and the limit on the total size of the cached matrices in bytes
+phylogenetic_correlation_cache = OrderedDict()
+PHYLOGENETIC_CACHE_BYTES = 2**28
+
+# trees pruned to the tips of an analysis, from the least to the most recently used, and the number kept
+pruned_tree_cache = OrderedDict()
+PRUNED_TREE_CACHE_SIZE = 16
+
+
+def clear_phylogenetic_cache() -> None:
+    phylogenetic_correlation_cache.clear()
+    pruned_tree_cache.clear()
+
+
+def cache_phylogenetic_correlation(key: tuple, entry: correlation_cache_entry) -> None:
+    """
+    add a matrix to the cache as the most recently used, discarding the least recently used matrices as needed to
+    keep the cache within its size limit
+    """
+    entry.matrix.setflags(write=False)
+    phylogenetic_correlation_cache[key] = entry
+    phylogenetic_correlation_cache.move_to_end(key)
+    total_bytes = sum(e.matrix.nbytes for e in phylogenetic_correlation_cache.values())
+    while total_bytes > PHYLOGENETIC_CACHE_BYTES:
+        _, removed = phylogenetic_correlation_cache.popitem(last=False)
+        total_bytes -= removed.matrix.nbytes
+
+
+def superset_rows(superset_tips: tuple, tip_names) -> Optional[list]:
+    """
+    find a distinct row of a larger list of tip names for each of tip_names, or None if the larger list does not
+    contain all of them (including each repeated tip as many times)
+    """
+    rows = {}
+    for r, name in enumerate(superset_tips):
+        rows.setdefault(name, []).append(r)
+    used = Counter()
+    subset = []
+    for name in tip_names:
+        if used[name] >= len(rows.get(name, [])):
+            return None
+        subset.append(rows[name][used[name]])
+        used[name] += 1
+    return subset
+
+
+def phylogenetic_tips(tip_names, root) -> Tuple[list, int]:
+    """
+    find the node of each of a list of tip names and the most recent common ancestor of all of them
+    """
+    tree = root.tree
+    tip_nodes = [tree.find_by_name(root.index, name) for name in tip_names]
+    mrca = tip_nodes[0]
+    for tip in tip_nodes[1:]:
+        mrca = tree.common_ancestor(tip, mrca)
+    return tip_nodes, mrca
+
+
+def pruned_phylogeny(tip_names, root, use_cache: bool = True):
+    """
+    the tree pruned to a list of tip names (which may repeat), rooted at their most recent common ancestor, with
+    ancestors left with a single descendant collapsed into it
+
+    the branch below the new root is lengthened to the greatest distance from the ancestor to any of its tips in the
+    full tree, so the phylogenetic correlations calculated from the pruned tree are the same as from the full tree,
+    while every later traversal only visits the nodes connecting the tips. pruned trees are cached until the tree is
+    modified or replaced; a tree pruned to a larger set of tips with the same common ancestor is reused for any
+    subset of them, which also lets the correlation matrix of the subset be sliced from that of the larger set
+    """
+    tree = root.tree
+    tip_nodes, mrca = phylogenetic_tips(tip_names, root)
+    token = tree.cached("correlation cache token", object)
+    tips = frozenset(tip_names)
+    key = (id(tree), root.index, tips)
+    if use_cache:
+        for entry_key, entry in reversed(pruned_tree_cache.items()):
+            if ((entry.tree is tree) and (entry.token is token) and (entry.root == root.index) and
+                    (entry.mrca == mrca) and (tips <= entry.tips)):
+                pruned_tree_cache.move_to_end(entry_key)
+                return entry.pruned
+
+    # studies which share a tip are correlated through the ancestor of the tip, so the ancestors are kept as well
+    pruned = tree.induced_subtree(tip_nodes + [tree.parent[tip] for tip in tip_nodes if tip != mrca], mrca)
+    pruned.branch_lengths[0] += tree.max_node_tip_lengths(mrca)[mrca] - pruned.max_node_tip_lengths(0)[0]
+    pruned.modified()
+    pruned_root = pruned.node(0)
+    if use_cache:
+        pruned_tree_cache[key] = pruned_tree_entry(tree, token, root.index, tips, mrca, pruned_root)
+        pruned_tree_cache.move_to_end(key)
+        while len(pruned_tree_cache) > PRUNED_TREE_CACHE_SIZE:
+            pruned_tree_cache.popitem(last=False)
+    return pruned_root
+
+
+def phylogenetic_correlation(tip_names, root, use_cache: bool = True):
+    """
+    create the matrix of phylogenetic correlations among a list of tip names (which may repeat), as the branch
+    length each pair shares below the most recent common ancestor of all of them, relative to the greatest distance
+    from that ancestor to any of its tips
+
+    rather than searching the tree for each pair of tips, the tree is traversed once and the tips are ordered so
+    that those below every node are contiguous. each pair of tips is then filled exactly once, as part of a block
+    between the tips below two different descendants of their common ancestor, so the work is O(n²) overall. each
+    value is calculated the same way as by Node.common_ancestor and Node.distance_to_ancestor, so the matrix is
+    identical to comparing each pair of tips on the tree
+
+    matrices are cached (and returned read-only) until the tree is modified or replaced. a list of tips contained
+    within a cached list, such as one with some rows filtered out, is sliced from the cached matrix as long as the
+    tips share the same common ancestor, which makes the values identical. use_cache should be False for trees which
+    will not be used again, such as each of a sample of trees
+    """
+    n = len(tip_names)
+    tree = root.tree
+    tip_nodes, mrca = phylogenetic_tips(tip_names, root)
+
+    # the token is kept with the derived values of the tree, so is replaced whenever the tree is modified
+    token = tree.cached("correlation cache token", object)
+    tips = tuple(tip_names)
+    key = (id(tree), root.index, tips)
+    if use_cache:
+        entry = phylogenetic_correlation_cache.get(key)
+        if (entry is not None) and (entry.tree is tree) and (entry.token is token):
+            phylogenetic_correlation_cache.move_to_end(key)
+            return entry.matrix
+        for entry in reversed(phylogenetic_correlation_cache.values()):
+            if ((entry.tree is tree) and (entry.token is token) and (entry.root == root.index) and
+                    (entry.mrca == mrca)):
+                rows = superset_rows(entry.tips, tips)
+                if rows is not None:
+                    p = entry.matrix[numpy.ix_(rows, rows)]
+                    cache_phylogenetic_correlation(key, correlation_cache_entry(tree, token, root.index, tips, mrca,
+                                                                                p))
+                    return p
+
+    max_depth = tree.max_node_tip_lengths(mrca)[mrca]
+    subtree = tree.preorder(mrca)
+
+    # order the rows by the pre-order of their tips, so the rows below each node form a contiguous range
+    node_rows = {i: [] for i in subtree}
+    for r, tip in enumerate(tip_nodes):
+        node_rows[tip].append(r)
+    order = [r for i in subtree for r in node_rows[i]]
+    start = {}
+    row_cnt = 0
+    for i in subtree:
+        start[i] = row_cnt
+        row_cnt += len(node_rows[i])
+    below = {}
+    for i in reversed(subtree):  # descendants before ancestors
+        below[i] = len(node_rows[i]) + sum(below[j] for j in tree.children(i))
+
+    ordered_p = numpy.zeros(shape=(n, n))
+    for i in subtree:
+        p_value = None
+        for j in tree.children(i):
+            # pairs between the rows below this descendant and those of the node and its earlier descendants, plus
+            # pairs of rows on the descendant itself, have this node as their common ancestor
+            blocks = [(slice(start[j], start[j] + below[j]), slice(start[i], start[j]))]
+            if len(node_rows[j]) > 1:
+                blocks.append((slice(start[j], start[j] + len(node_rows[j])),
+                               slice(start[j], start[j] + len(node_rows[j]))))
+            for rows, cols in blocks:
+                if (rows.stop > rows.start) and (cols.stop > cols.start):
+                    if p_value is None:
+                        p_value = tree.distance_to_ancestor(i, mrca)/max_depth
+                    ordered_p[rows, cols] = p_value
+                    ordered_p[cols, rows] = p_value
+    numpy.fill_diagonal(ordered_p, 1)
+    p = numpy.empty(shape=(n, n))
+    p[numpy.ix_(order, order)] = ordered_p
+    if use_cache:
+        cache_phylogenetic_correlation(key, correlation_cache_entry(tree, token, root.index, tips, mrca, p))
+    return p
+
+
+def phylogenetic_covariance(p_matrix: numpy.ndarray, v: numpy.ndarray) -> numpy.ndarray:
+    """
+    the covariance matrix of the effects, with the variances on the diagonal and the phylogenetic correlations
+    scaled by the square roots of the variances of each pair off of it
+    """
+    sqrt_v = numpy.sqrt(v)
+    v_matrix = numpy.outer(sqrt_v, sqrt_v)
+    v_matrix *= p_matrix
+    numpy.fill_diagonal(v_matrix, v)
+    return v_matrix
+
+
+def cholesky_factor(v_matrix: numpy.ndarray) -> Optional[numpy.ndarray]:
+    """
+    the lower triangular Cholesky factor, L, of a covariance matrix (V = LLᵀ), overwriting the matrix
+
+    returns None if the matrix is not positive definite or is too close to singular for the factor to be reliable,
+    judged from the ratio of the largest to smallest diagonal element of the factor
+    """
+    try:
+        chol = scipy.linalg.cholesky(v_matrix, lower=True, overwrite_a=True)
+    except numpy.linalg.LinAlgError:
+        return None
+    chol_diag = numpy.diagonal(chol)
+    if numpy.min(chol_diag)**2 <= numpy.max(chol_diag)**2 * len(chol_diag) * numpy.finfo(float).eps:
+        return None
+    return chol
+
+
+def gls_glm(e: numpy.array, x: numpy.array, chol: numpy.ndarray):
+    """
+    the equivalent of calculate_glm with weight matrix W = V⁻¹, given the Cholesky factor L of V
+
+    e and x are whitened by solving with L, after which the model is an ordinary (unit weight) glm fit by
+    weighted_glm, so V is never inverted
+    """
+    whitened_e = scipy.linalg.solve_triangular(chol, e, lower=True)
+    whitened_x = scipy.linalg.solve_triangular(chol, x, lower=True)
+    qm, qe, beta, sigma_b, _ = weighted_glm(whitened_e, whitened_x, numpy.ones(len(e)))
+    return qm, qe, beta, sigma_b, whitened_x
+
+
+def pooled_var_gls_glm(qe, n: int, x: numpy.array, chol: numpy.ndarray, sigma_b: numpy.ndarray,
+                       whitened_x: numpy.ndarray) -> float:
+    """
+    the equivalent of pooled_var_glm with weight matrix W = V⁻¹, given the Cholesky factor L of V and the whitened
+    design matrix L⁻¹X from gls_glm
+
+    tr(W) is the sum of squares of L⁻¹, and tr(WX·Σb·XᵀW) = tr(Σb·(WX)ᵀ·WX) with WX = L⁻ᵀ·L⁻¹X found by a
+    triangular solve
+    """
+    np = numpy.shape(x)[1] - 1
+    numerator = qe - (n - np - 1)
+    wx = scipy.linalg.solve_triangular(chol, whitened_x, lower=True, trans="T")
+    hat_trace = numpy.sum(numpy.matmul(wx, sigma_b) * wx)
+    trace_w = numpy.sum(numpy.square(scipy.linalg.solve_triangular(chol, numpy.identity(n), lower=True,
+                                                                   overwrite_b=True)))
+    pooled = numerator / (trace_w - hat_trace)
+    return max(pooled, 0)
+
+
+def gls_model_projection(x: numpy.array, wx: numpy.array) -> numpy.array:
+    """
+    the equivalent of glm_model_projection for a weight matrix W that need not be diagonal, given the product W·X
+
+    with b = (WX)ᵀe and G = XᵀWX, qm = qt - qe = bᵀG⁻¹b - b₀²/G₀₀ because the first column of X is the intercept.
+    this quadratic form has rank p - 1, so it factors as FFᵀ and P = WX·F
+    """
+    xwx = numpy.matmul(numpy.transpose(x), wx)
+    model_form = numpy.linalg.inv(xwx)
+    model_form[0, 0] -= 1 / xwx[0, 0]
+    eigenvalues, eigenvectors = numpy.linalg.eigh(model_form)
+    # the smallest eigenvalue belongs to the intercept and is zero
+    factor = eigenvectors[:, 1:] * numpy.sqrt(numpy.maximum(eigenvalues[1:], 0))
+    return numpy.matmul(wx, factor)
+
+
+def phylogenetic_arrangement_qe(e_data, x_data, v_data, p_factor, orders: numpy.ndarray) -> numpy.ndarray:
+    """
+    calculate the residual heterogeneity (qe) of the fixed effects phylogenetic glm for each of a set of
+    arrangements of the studies among the tips of the phylogeny, given either the Cholesky factor of the
+    correlation matrix P of the original arrangement or its study tree (from study_tree)
+
+    each row of orders gives the study placed at each row of P, so the rows of the effects, predictors, and
+    standard errors are rearranged together against the fixed P (equivalent to shuffling the rows and columns of P
+    against the studies). all of the arrangements are whitened by a single triangular solve (or multiplied by P⁻¹
+    in a single pass over the study tree) and qe is found for each from the cross-products of its effects and
+    predictors
+    """
+    k, n = numpy.shape(orders)
+    np = numpy.shape(x_data)[1]
+    scaled = numpy.empty((n, k, np + 1))
+    sqrt_v = numpy.sqrt(v_data)
+    scaled[:, :, 0] = numpy.transpose((e_data / sqrt_v)[orders])
+    scaled[:, :, 1:] = numpy.transpose((x_data / sqrt_v[:, numpy.newaxis])[orders], (1, 0, 2))
+    if isinstance(p_factor, study_tree_tuple):
+        precision_scaled = study_tree_precision_product(p_factor, scaled.reshape(n, k*(np + 1)))
+        cross = numpy.einsum("nki,nkj->kij", scaled, precision_scaled.reshape(n, k, np + 1))
+    else:
+        whitened = scipy.linalg.solve_triangular(p_factor, scaled.reshape(n, k*(np + 1)), lower=True,
+                                                 overwrite_b=True).reshape(n, k, np + 1)
+        cross = numpy.einsum("nki,nkj->kij", whitened, whitened)
+    ewe = cross[:, 0, 0]
+    xwe = cross[:, 1:, 0]
+    beta = numpy.linalg.solve(cross[:, 1:, 1:], xwe[:, :, numpy.newaxis])[:, :, 0]
+    return ewe - numpy.sum(xwe * beta, axis=1)
+
+
+def phylogeny_randomization_qe(rng: numpy.random.Generator, nreps: int, e_data, x_data, v_data,
+                               p_factor) -> numpy.ndarray:
+    """
+    calculate the residual heterogeneity of the fixed effects phylogenetic glm for nreps random arrangements of the
+    studies among the tips of the phylogeny
+
+    the correlation matrix is factored only once (or its study tree built once), by the caller, and the
+    arrangements are evaluated in chunks by phylogenetic_arrangement_qe
+    """
+    n, np = numpy.shape(x_data)
+    chunk_size = max(1, RESAMPLING_CHUNK_SIZE // (n * (np + 1)))
+    rand_qe = numpy.empty(nreps)
+    for start in range(0, nreps, chunk_size):
+        end = min(start + chunk_size, nreps)
+        orders = rng.permuted(numpy.tile(numpy.arange(n), (end - start, 1)), axis=1)
+        rand_qe[start:end] = phylogenetic_arrangement_qe(e_data, x_data, v_data, p_factor, orders)
+    return rand_qe
+
+
+def phylogenetic_glm(e: numpy.array, x: numpy.array, v: numpy.array, p_matrix: numpy.ndarray,
+                     random_effects: bool):
+    """
+    fit the glm with the covariance matrix built from the variances and phylogenetic correlations, refitting with
+    the pooled variance added to the variances for a random effects model
+
+    returns qm, qe, beta, sigma_b, the pooled variance, and the product W·X of the final fit, or None if a
+    covariance matrix is singular
+    """
+    chol = cholesky_factor(phylogenetic_covariance(p_matrix, v))
+    if chol is None:
+        return None
+    qm, qe, beta, sigma_b, whitened_x = gls_glm(e, x, chol)
+    pooled_var = pooled_var_gls_glm(qe, len(e), x, chol, sigma_b, whitened_x)
+    if random_effects:
+        chol = cholesky_factor(phylogenetic_covariance(p_matrix, v + pooled_var))
+        if chol is None:
+            return None
+        qm, qe, beta, sigma_b, whitened_x = gls_glm(e, x, chol)
+    wx = scipy.linalg.solve_triangular(chol, whitened_x, lower=True, trans="T")
+    return qm, qe, beta, sigma_b, pooled_var, wx
+
+
+def study_tree(tip_names, root) -> Optional[study_tree_tuple]:
+    """
+    the tree underlying the phylogenetic correlations among a list of tip names (which may repeat), used to work
+    with the correlation matrix P in linear time rather than forming it
+
+    P is the covariance of Brownian motion (with unit variance at the tips) from the common ancestor of the tips,
+    with branch lengths relative to the greatest distance from that ancestor to any tip. only the internal nodes
+    above the tips are kept, numbered in pre-order with the common ancestor as 0. each study is a separate leaf
+    below the parent of its tip, with the variance which brings its total to one, which matches the correlation
+    given to studies which share a tip by phylogenetic_correlation
+
+    returns None if P is singular (a study with no variance of its own), or if the common ancestor is itself one of
+    the tips, as when all of the studies share a single tip, which leaves no tree above the studies
+    """
+    tree = root.tree
+    tip_nodes, mrca = phylogenetic_tips(tip_names, root)
+    if mrca in tip_nodes:
+        return None
+    max_depth = tree.max_node_tip_lengths(mrca)[mrca]
+    included = {mrca}
+    for tip in tip_nodes:
+        node = tree.parent[tip]
+        while node not in included:
+            included.add(node)
+            node = tree.parent[node]
+    nodes = [i for i in tree.preorder(mrca) if i in included]
+    index = {node: i for i, node in enumerate(nodes)}
+    node_parent = [-1] + [index[tree.parent[node]] for node in nodes[1:]]
+    node_variance = [0] + [tree.branch_lengths[node] / max_depth for node in nodes[1:]]
+    height = [0.0]
+    for i in range(1, len(nodes)):
+        height.append(height[node_parent[i]] + node_variance[i])
+    study_parent = numpy.array([index[tree.parent[tip]] for tip in tip_nodes])
+    study_variance = 1 - numpy.array(height)[study_parent]
+    if numpy.min(study_variance) <= len(tip_names) * numpy.finfo(float).eps:
+        return None
+    return study_tree_tuple(node_parent, node_variance, study_parent, study_variance)
+
+
+def study_tree_precisions(structure: study_tree_tuple) -> list:
+    """
+    the precision of the information about each internal node of the study tree from the studies below it,
+    accumulated from the leaves toward the root (Felsenstein's pruning)
+    """
+    node_parent, node_variance = structure.node_parent, structure.node_variance
+    precision = list(numpy.bincount(structure.study_parent, weights=1/structure.study_variance,
+                                    minlength=len(node_parent)))
+    for i in range(len(node_parent) - 1, 0, -1):
+        precision[node_parent[i]] += 1 / (1/precision[i] + node_variance[i])
+    return precision
+
+
+def study_tree_precision_product(structure: study_tree_tuple, z: numpy.ndarray) -> numpy.ndarray:
+    """
+    calculate P⁻¹z for each column of z, in time proportional to the number of studies
+
+    treating the columns of z as values observed at the studies, the pruning pass accumulates the information
+    about each internal node from below and a second pass from the root finds the expected value of each internal
+    node given all of the studies. (P⁻¹z)ᵢ is then the difference between study i and the expected value of its
+    parent, divided by the variance of the study's own branch
+    """
+    node_parent, node_variance = structure.node_parent, structure.node_variance
+    study_parent, study_variance = structure.study_parent, structure.study_variance
+    precision = study_tree_precisions(structure)
+    weighted = numpy.zeros((len(node_parent), numpy.shape(z)[1]))
+    numpy.add.at(weighted, study_parent, z / study_variance[:, numpy.newaxis])
+    for i in range(len(node_parent) - 1, 0, -1):
+        weighted[node_parent[i]] += weighted[i] / (1 + precision[i]*node_variance[i])
+    expected = numpy.zeros(numpy.shape(weighted))  # the common ancestor is fixed at zero
+    for i in range(1, len(node_parent)):
+        if node_variance[i] == 0:
+            expected[i] = expected[node_parent[i]]
+        else:
+            expected[i] = ((weighted[i] + expected[node_parent[i]] / node_variance[i]) /
+                           (precision[i] + 1 / node_variance[i]))
+    return (z - expected[study_parent]) / study_variance[:, numpy.newaxis]
+
+
+def study_tree_precision_diagonal(structure: study_tree_tuple) -> numpy.ndarray:
+    """
+    the diagonal of P⁻¹, from the variance of the parent of each study given all of the other studies, in time
+    proportional to the number of studies
+    """
+    node_parent, node_variance = structure.node_parent, structure.node_variance
+    precision = study_tree_precisions(structure)
+    variance = [0.0 for _ in node_parent]
+    for i in range(1, len(node_parent)):
+        if node_variance[i] == 0:
+            variance[i] = variance[node_parent[i]]
+        else:
+            total_precision = precision[i] + 1 / node_variance[i]
+            variance[i] = 1/total_precision + variance[node_parent[i]] / (node_variance[i] * total_precision)**2
+    study_variance = structure.study_variance
+    return 1/study_variance - numpy.array(variance)[structure.study_parent] / numpy.square(study_variance)
+
+
+def tree_gls_glm(e: numpy.array, x: numpy.array, v: numpy.array, structure: study_tree_tuple):
+    """
+    the equivalent of gls_glm for the covariance matrix built from the variances v and the correlations of a study
+    tree, without forming any n × n matrix
+
+    V = D·P·D with D the diagonal matrix of standard errors, so with z = D⁻¹[e X] the sums of squares and
+    cross-products XᵀWX, XᵀWe, and eᵀWe all come from zᵀ·P⁻¹z. along with qm, qe, beta, and sigma_b, the product
+    W·X is returned for pooled_var_tree_gls_glm and gls_model_projection
+    """
+    sqrt_v = numpy.sqrt(v)
+    z = numpy.column_stack((e, x)) / sqrt_v[:, numpy.newaxis]
+    precision_z = study_tree_precision_product(structure, z)
+    cross = numpy.matmul(numpy.transpose(z), precision_z)
+    ewe = cross[0, 0]
+    xwe = cross[1:, 0]
+    sigma_b = numpy.linalg.inv(cross[1:, 1:])
+    beta = numpy.matmul(sigma_b, xwe)
+    red_beta = beta[1:]
+    qm = numpy.matmul(red_beta, numpy.linalg.solve(sigma_b[1:, 1:], red_beta))
+    qe = ewe - numpy.matmul(xwe, beta)
+    wx = precision_z[:, 1:] / sqrt_v[:, numpy.newaxis]
+    return qm, qe, beta, sigma_b, wx
+
+
+def pooled_var_tree_gls_glm(qe, n: int, x: numpy.array, v: numpy.array, structure: study_tree_tuple,
+                            sigma_b: numpy.ndarray, wx: numpy.ndarray) -> float:
+    """
+    the equivalent of pooled_var_glm for the covariance matrix of tree_gls_glm, with tr(W) = Σ (P⁻¹)ᵢᵢ / vᵢ
+    """
+    np = numpy.shape(x)[1] - 1
+    numerator = qe - (n - np - 1)
+    trace_w = numpy.sum(study_tree_precision_diagonal(structure) / v)
+    hat_trace = numpy.sum(numpy.matmul(wx, sigma_b) * wx)
+    pooled = numerator / (trace_w - hat_trace)
+    return max(pooled, 0)
+
+
+def tree_phylogenetic_glm(e: numpy.array, x: numpy.array, v: numpy.array, structure: study_tree_tuple,
+                          random_effects: bool):
+    """
+    the equivalent of phylogenetic_glm using the study tree, in time and memory proportional to the number of
+    studies
+    """
+    qm, qe, beta, sigma_b, wx = tree_gls_glm(e, x, v, structure)
+    pooled_var = pooled_var_tree_gls_glm(qe, len(e), x, v, structure, sigma_b, wx)
+    if random_effects:
+        qm, qe, beta, sigma_b, wx = tree_gls_glm(e, x, v + pooled_var, structure)
+    return qm, qe, beta, sigma_b, pooled_var, wx
+
+
+def fit_sample_tree(tree, tip_names, e_data, x_data, v_data, random_effects: bool, tree_gls: bool):
+    """
+    fit the phylogenetic glm for one of a sample of trees, returning qm, qe, beta, and the pooled variance, or None
+    if the tree lacks any of the tips or the model cannot be fit to it
+    """
+    tree_tips = set(tree.tip_names())
+    if any(name not in tree_tips for name in tip_names):
+        return None
+    try:
+        tree = pruned_phylogeny(tip_names, tree, use_cache=False)
+        if tree_gls:
+            structure = study_tree(tip_names, tree)
+            if structure is None:
+                return None
+            fit = tree_phylogenetic_glm(e_data, x_data, v_data, structure, random_effects)
+        else:
+            p_matrix = phylogenetic_correlation(tip_names, tree, use_cache=False)
+            fit = phylogenetic_glm(e_data, x_data, v_data, p_matrix, random_effects)
+    except numpy.linalg.LinAlgError:
+        return None
+    if fit is None:
+        return None
+    qm, qe, beta, _, pooled_var, _ = fit
+    return qm, qe, beta, pooled_var
@@ -13,7 +13,8 @@ from PyQt6.QtGui import QIcon, QIntValidator
 from MetaWinData import MetaWinData
 import MetaWinConstants
 import MetaWinPubBiasFunctions
-from MetaWinWidgets import add_ok_cancel_help_button_layout, add_cancel_help_button_layout, add_effect_choice_to_dialog
+from MetaWinWidgets import add_ok_cancel_help_button_layout, add_cancel_help_button_layout, add_effect_choice_to_dialog, \
+    add_seed_choice_to_dialog, seed_from_dialog
 from MetaWinUtils import get_citation, create_reference_list
 from MetaWinLanguage import get_text
 
@@ -34,6 +35,7 @@ class PubBiasOptions:
         self.random_effects = False
         self.log_transformed = False
         self.randomize_model = None
+        self.random_seed = None
         self.create_graph = False
         self.k_estimator = "L"
         self.cor_test = "tau"
@@ -107,6 +109,8 @@ class PubBiasOptions:
             if self.pub_bias_test == RANKCOR:
                 output_blocks.append(["→ {}: {} {}".format(get_text("Randomization to test correlation"),
                                                            self.randomize_model, get_text("iterations"))])
+                if self.random_seed is not None:
+                    output_blocks.append(["→ {}: {}".format(get_text("Random Number Seed"), self.random_seed)])
 
         return output_blocks, citations
 
@@ -272,6 +276,8 @@ class PubBiasRankCorrelationDialog(QDialog):
         self.n_button = None
         self.v_button = None
         self.randomize_n_box = None
+        self.seed_label = None
+        self.seed_box = None
         self.init_ui(data, last_effect, last_var)
 
     def init_ui(self, data: MetaWinData, last_effect, last_var):
@@ -320,6 +326,7 @@ class PubBiasRankCorrelationDialog(QDialog):
         self.randomize_n_box.setText("999")
         self.randomize_n_box.setValidator(QIntValidator(99, 999999))
         test_box_layout.addWidget(self.randomize_n_box)
+        add_seed_choice_to_dialog(self, test_box_layout)
 
         test_box.setLayout(test_box_layout)
         self.kendall_button.setChecked(True)
@@ -353,6 +360,7 @@ class PubBiasRankCorrelationDialog(QDialog):
         options.effect_data = self.columns[self.effect_size_box.currentIndex()]
         options.effect_vars = self.columns[self.variance_box.currentIndex()]
         options.randomize_model = int(self.randomize_n_box.text())
+        options.random_seed = seed_from_dialog(self)
         if self.spearman_button.isChecked():
             options.cor_test = "rho"
         else:
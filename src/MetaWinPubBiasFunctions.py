@@ -9,14 +9,15 @@ import math
 import numpy
 import scipy.stats
 
-import MetaWinConstants
 from MetaWinConstants import mean_data_tuple
 from MetaWinUtils import inline_float, calculate_regression, prob_t_score, interval_to_str, create_output_table
 import MetaWinCharts
 import MetaWinWidgets
 from MetaWinLanguage import get_text
+from MetaWinResampling import run_replicates, seed_sequence
+from MetaWinResamplingTasks import correlation, kendalls_tau, rank_correlation_randomization
 from MetaWinAnalysisFunctions import output_filtered_bad, mean_effect_var_and_q, pooled_var_no_structure, \
-    median_effect, mean_effects_table
+    median_effect, mean_effects_table, extract_analysis_data
 
 
 # ---------- rank correlation analysis ----------
@@ -24,51 +25,6 @@ def get_ranks(x):
     return scipy.stats.rankdata(x, "average")
 
 
-def correlation(x, y):
-    n = len(x)
-    x_mean = numpy.sum(x)/n
-    y_mean = numpy.sum(y)/n
-    sum_xy = numpy.sum((x - x_mean)*(y - y_mean))
-    sum_x2 = numpy.sum(numpy.square(x - x_mean))
-    sum_y2 = numpy.sum(numpy.square(y - y_mean))
-    return sum_xy / math.sqrt(sum_x2 * sum_y2)
-
-
-def kendalls_tau(e_ranks, x_ranks):
-    n = len(e_ranks)
-    sort_data = numpy.zeros(shape=(n, 2))
-    # if there are no ties in e_ranks, sort by it, otherwise, sort by x_ranks
-    if len(numpy.unique(e_ranks)) < n:
-        sort_data[:, 0] = x_ranks
-        sort_data[:, 1] = e_ranks
-    else:
-        sort_data[:, 0] = e_ranks
-        sort_data[:, 1] = x_ranks
-    sort_data = sort_data[sort_data[:, 0].argsort()]  # sort into ascending order by first column
-    c = 0
-    for i in range(n):
-        for j in range(i + 1, n):
-            if sort_data[j, 1] > sort_data[i, 1]:
-                c += 1
-            elif sort_data[j, 1] == sort_data[i, 1]:
-                c += 0.5
-    sum_n = 4 * c - n * (n - 1)
-    # correction terms for ties
-    unique, cnts = numpy.unique(e_ranks, return_counts=True)
-    t1 = 0
-    for c in cnts:
-        if c > 1:
-            t1 += c * (c - 1)
-    unique, cnts = numpy.unique(x_ranks, return_counts=True)
-    t2 = 0
-    for c in cnts:
-        if c > 1:
-            t2 += c * (c - 1)
-
-    tau = sum_n / math.sqrt((n * (n - 1) - t1) * (n * (n - 1) - t2))
-    return tau
-
-
 def rank_correlation_analysis(data, options, decimal_places: int = 4, sender=None):
     # filter and prepare data for analysis
     effect_sizes = options.effect_data
@@ -79,39 +35,11 @@ def rank_correlation_analysis(data, options, decimal_places: int = 4, sender=Non
     else:
         sample_sizes = None
         do_n = False
-    e_data = []
-    w_data = []
-    v_data = []
-    n_data = []
-    bad_data = []
-    study_names = []
-    filtered = []
-    for r, row in enumerate(data.rows):
-        if row.not_filtered():
-            e = data.check_value(r, effect_sizes.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            v = data.check_value(r, variances.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            if do_n:
-                ns = data.check_value(r, sample_sizes.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            else:
-                ns = 1
-            if (e is not None) and (v is not None) and (v > 0) and (ns is not None) and (ns > 0):
-                e_data.append(e)
-                w_data.append(1/v)
-                v_data.append(v)
-                if do_n:
-                    n_data.append(ns)
-                study_names.append(row.label)
-            else:
-                bad_data.append(row.label)
-        else:
-            filtered.append(row.label)
-    e_data = numpy.array(e_data)
-    w_data = numpy.array(w_data)
-    v_data = numpy.array(v_data)
-    if do_n:
-        n_data = numpy.array(n_data)
+    extracted = extract_analysis_data(data, effect_sizes, variances, sample_sizes=sample_sizes)
+    e_data, w_data, v_data, n_data = extracted.e, extracted.w, extracted.v, extracted.sample_sizes
+    study_names = extracted.study_names
 
-    output_blocks = output_filtered_bad(filtered, bad_data)
+    output_blocks = output_filtered_bad(extracted.filtered, extracted.bad_data)
 
     n = len(e_data)
     citations = []
@@ -156,18 +84,9 @@ def rank_correlation_analysis(data, options, decimal_places: int = 4, sender=Non
 
         # decimal places to use for randomization-based p-value
         rand_p_dec = max(decimal_places, math.ceil(math.log10(nreps+1)))
-        cnt_r = 1
-        rng = numpy.random.default_rng()
-        for rep in range(nreps):
-            rand_e_ranks = rng.permutation(e_ranks)
-            if options.cor_test == "tau":
-                rand_r = kendalls_tau(rand_e_ranks, x_ranks)
-            else:
-                rand_r = correlation(e_ranks, x_ranks)
-            if abs(rand_r) >= abs(r):
-                cnt_r += 1
-            if progress_bar is not None:
-                progress_bar.setValue(progress_bar.value() + 1)
+        rand_r = run_replicates(rank_correlation_randomization, nreps, (e_ranks, x_ranks, options.cor_test),
+                                seed_sequence(options.random_seed), progress_bar)
+        cnt_r = 1 + numpy.count_nonzero(numpy.abs(rand_r) >= abs(r))
 
         p_random = cnt_r / (nreps + 1)
         p_random_str = format(p_random, inline_float(rand_p_dec))
@@ -194,30 +113,11 @@ def trim_and_fill_analysis(data, options, decimal_places: int = 4, alpha: float
     # filter and prepare data for analysis
     effect_sizes = options.effect_data
     variances = options.effect_vars
-    e_data = []
-    w_data = []
-    v_data = []
-    bad_data = []
-    study_names = []
-    filtered = []
-    for r, row in enumerate(data.rows):
-        if row.not_filtered():
-            e = data.check_value(r, effect_sizes.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            v = data.check_value(r, variances.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            if (e is not None) and (v is not None) and (v > 0):
-                e_data.append(e)
-                w_data.append(1/v)
-                v_data.append(v)
-                study_names.append(row.label)
-            else:
-                bad_data.append(row.label)
-        else:
-            filtered.append(row.label)
-    e_data = numpy.array(e_data)
-    w_data = numpy.array(w_data)
-    v_data = numpy.array(v_data)
+    extracted = extract_analysis_data(data, effect_sizes, variances)
+    e_data, w_data, v_data = extracted.e, extracted.w, extracted.v
+    study_names = extracted.study_names
 
-    output_blocks = output_filtered_bad(filtered, bad_data)
+    output_blocks = output_filtered_bad(extracted.filtered, extracted.bad_data)
 
     chart_data = None
     n = len(e_data)
@@ -352,43 +252,10 @@ def funnel_plot_setup(data, options):
     # filter and prepare data for analysis
     effect_sizes = options.effect_data
     variances = options.effect_vars
-    if options.sample_size is not None:
-        sample_sizes = options.sample_size
-        do_n = True
-    else:
-        sample_sizes = None
-        do_n = False
-
-    e_data = []
-    w_data = []
-    v_data = []
-    n_data = []
-    bad_data = []
-    study_names = []
-    filtered = []
-
-    for r, row in enumerate(data.rows):
-        if row.not_filtered():
-            e = data.check_value(r, effect_sizes.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            v = data.check_value(r, variances.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            if do_n:
-                ns = data.check_value(r, sample_sizes.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            else:
-                ns = 1
-            if (e is not None) and (v is not None) and (v > 0) and (ns is not None) and (ns > 0):
-                e_data.append(e)
-                w_data.append(1/v)
-                v_data.append(v)
-                if do_n:
-                    n_data.append(ns)
-                study_names.append(row.label)
-            else:
-                bad_data.append(row.label)
-        else:
-            filtered.append(row.label)
-    e_data = numpy.array(e_data)
-    w_data = numpy.array(w_data)
-    v_data = numpy.array(v_data)
+    sample_sizes = options.sample_size
+    extracted = extract_analysis_data(data, effect_sizes, variances, sample_sizes=sample_sizes)
+    e_data, w_data, v_data, n_data = extracted.e, extracted.w, extracted.v, extracted.sample_sizes
+    study_names = extracted.study_names
 
     if options.funnel_y == "variance":
         y_data = v_data
@@ -401,7 +268,7 @@ def funnel_plot_setup(data, options):
     else:
         y_data = numpy.array(n_data)
 
-    output_blocks = output_filtered_bad(filtered, bad_data)
+    output_blocks = output_filtered_bad(extracted.filtered, extracted.bad_data)
 
     n = len(e_data)
     citations = []
@@ -428,30 +295,11 @@ def egger_regression(data, options, decimal_places: int = 4, alpha: float = 0.05
     # filter and prepare data for analysis
     effect_sizes = options.effect_data
     variances = options.effect_vars
-    e_data = []
-    w_data = []
-    v_data = []
-    bad_data = []
-    study_names = []
-    filtered = []
-    for r, row in enumerate(data.rows):
-        if row.not_filtered():
-            e = data.check_value(r, effect_sizes.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            v = data.check_value(r, variances.position(), value_type=MetaWinConstants.VALUE_NUMBER)
-            if (e is not None) and (v is not None) and (v > 0):
-                e_data.append(e)
-                w_data.append(1/v)
-                v_data.append(v)
-                study_names.append(row.label)
-            else:
-                bad_data.append(row.label)
-        else:
-            filtered.append(row.label)
-    e_data = numpy.array(e_data)
-    w_data = numpy.array(w_data)
-    v_data = numpy.array(v_data)
+    extracted = extract_analysis_data(data, effect_sizes, variances)
+    e_data, w_data, v_data = extracted.e, extracted.w, extracted.v
+    study_names = extracted.study_names
 
-    output_blocks = output_filtered_bad(filtered, bad_data)
+    output_blocks = output_filtered_bad(extracted.filtered, extracted.bad_data)
 
     chart_data = None
     n = len(e_data)
@@ -0,0 +1,227 @@
+"""
+Resampling module
+
+This module runs the replicates of bootstrap and randomization tests, spreading them across worker processes when
+there is enough work to repay starting them. Replicates are divided into blocks of a fixed size, each of which draws
+from its own random number stream spawned from a single master seed, so the results for a given seed do not depend
+on the number of workers used. The same workers are also used to repeat an analysis across a stream of inputs, such
+as a sample of trees.
+
+The workers are started once and kept for later analyses. The tasks they run are kept in modules which do not
+import the interface (MetaWinResamplingTasks and MetaWinPhylogenetics), so that each worker starts quickly
+"""
+
+import atexit
+import collections
+import concurrent.futures
+import multiprocessing
+import os
+from typing import Optional, Union
+
+import numpy
+
+
+# number of worker processes used for resampling; replaced by the value in the configuration file
+workers = os.cpu_count() or 1
+
+# number of replicates in each independently seeded block
+REPLICATE_BLOCK_SIZE = 1000
+
+# least total work (the number of replicates times the work of each, roughly the number of values it draws) for
+# which the replicates are spread across the workers; below this starting the workers takes longer than simply
+# running the replicates
+PARALLEL_MIN_WORK = 3*10**8
+
+# the pool of worker processes, kept between analyses, along with its number of workers and the data shared with them
+pool = None
+pool_workers = 0
+pool_shared = None
+
+# within a worker process, the data shared with all of the tasks when the worker was started
+shared_data = None
+
+
+def seed_sequence(seed: Union[None, int, numpy.random.SeedSequence]) -> numpy.random.SeedSequence:
+    """
+    convert a user supplied seed into a seed sequence; if seed is None, fresh entropy is drawn from the OS
+    """
+    if isinstance(seed, numpy.random.SeedSequence):
+        return seed
+    return numpy.random.SeedSequence(seed)
+
+
+def block_sizes(nreps: int) -> list:
+    """
+    the number of replicates in each block
+    """
+    return [min(REPLICATE_BLOCK_SIZE, nreps - start) for start in range(0, nreps, REPLICATE_BLOCK_SIZE)]
+
+
+def start_worker(shared) -> None:
+    """
+    set up a worker process to run any resampling within a task serially, rather than starting workers of its own,
+    and keep the data shared with its tasks
+    """
+    global workers, shared_data
+    workers = 1
+    shared_data = shared
+
+
+def worker_pool(n_workers: int, shared=None) -> concurrent.futures.ProcessPoolExecutor:
+    """
+    return the pool of n_workers worker processes, starting a new one only if there is no pool of that size already
+    running or if its workers lack the data to be shared with them
+    """
+    global pool, pool_workers, pool_shared
+    if (pool is None) or (pool_workers != n_workers) or ((shared is not None) and (pool_shared is not shared)):
+        shutdown_pool()
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=n_workers,
+                                                      mp_context=multiprocessing.get_context("spawn"),
+                                                      initializer=start_worker, initargs=(shared,))
+        pool_workers = n_workers
+        pool_shared = shared
+    return pool
+
+
+def shutdown_pool() -> None:
+    global pool, pool_shared
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+        pool = None
+        pool_shared = None
+
+
+atexit.register(shutdown_pool)
+
+
+def data_size(args: tuple) -> int:
+    """
+    the size of the largest array among the arguments of a task, as an estimate of the work of each replicate
+    """
+    return max([numpy.size(arg) for arg in args if isinstance(arg, numpy.ndarray)], default=1)
+
+
+def run_block(task, seed: numpy.random.SeedSequence, n: int, args: tuple) -> numpy.ndarray:
+    return numpy.asarray(task(numpy.random.default_rng(seed), n, *args))
+
+
+def run_replicates(task, nreps: int, args: tuple = (), seed: Union[None, int, numpy.random.SeedSequence] = None,
+                   progress_bar=None, n_workers: Optional[int] = None, stop=None,
+                   work: Optional[int] = None) -> numpy.ndarray:
+    """
+    run nreps replicates of a resampling task and return the statistics calculated by the replicates, in order
+
+    task is called as task(rng, n, *args) and must return an array with the statistic (or row of statistics) from
+    each of n replicates drawn using generator rng. in order to be run in a worker process task must be a
+    module-level function in a module which does not import the interface, and args must be picklable
+
+    the replicates are only spread across the workers if nreps times work, the work of each replicate, is at least
+    PARALLEL_MIN_WORK; by default the work of a replicate is taken to be the size of the largest array in args
+
+    the progress bar, if any, is advanced as each block of replicates is completed
+
+    stop, if given, is called as stop(results, nreps) each time a further leading block of replicates is finished,
+    with the statistics from all of the leading blocks finished so far. if it returns True the remaining blocks are
+    abandoned and only those statistics are returned. because blocks are always considered in order, where the
+    replicates stop depends only on the seed and not on the number of workers
+    """
+    if n_workers is None:
+        n_workers = workers
+    if work is None:
+        work = data_size(args)
+    sizes = block_sizes(nreps)
+    streams = seed_sequence(seed).spawn(len(sizes))
+    results = [None for _ in sizes]
+    finished = 0
+
+    def stop_early() -> bool:
+        # extend the run of leading finished blocks, checking whether to stop after each one
+        nonlocal finished
+        while (finished < len(sizes)) and (results[finished] is not None):
+            finished += 1
+            if (stop is not None) and (finished < len(sizes)) and stop(numpy.concatenate(results[:finished]), nreps):
+                return True
+        return False
+
+    if (n_workers > 1) and (len(sizes) > 1) and (nreps*work >= PARALLEL_MIN_WORK):
+        executor = worker_pool(n_workers)
+        futures = {executor.submit(run_block, task, streams[i], n, args): i for i, n in enumerate(sizes)}
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                i = futures[future]
+                results[i] = future.result()
+                if progress_bar is not None:
+                    progress_bar.setValue(progress_bar.value() + sizes[i])
+                if stop_early():
+                    break
+        finally:
+            # blocks not yet started are dropped, leaving the workers free for the next call
+            for future in futures:
+                future.cancel()
+    else:
+        for i, n in enumerate(sizes):
+            results[i] = run_block(task, streams[i], n, args)
+            if progress_bar is not None:
+                progress_bar.setValue(progress_bar.value() + n)
+            if stop_early():
+                break
+    if finished == 0:
+        return numpy.zeros(0)
+    return numpy.concatenate(results[:finished])
+
+
+def run_shared_task(task, item, args: tuple):
+    return task(item, shared_data, *args)
+
+
+def run_tasks(task, items, args: tuple = (), progress_bar=None, n_workers: Optional[int] = None,
+              work: Optional[int] = None, shared=None) -> list:
+    """
+    call task(item, *args) for each of a stream of items and return the results, in order
+
+    the items are taken from the stream only as workers become free, with at most two waiting for each worker, so a
+    long stream (such as the trees read from a file) is never held in memory all at once. as with run_replicates,
+    task must be a module-level function in a module which does not import the interface, and the items and args
+    must be picklable to be run in worker processes
+
+    work is the total work of all of the items, which are only spread across the workers if it is at least
+    PARALLEL_MIN_WORK; if None, each item is assumed to be worth sending to a worker on its own
+
+    shared, if given, is data needed by every item, which is sent to each worker only once, when it is started,
+    rather than with every item; task is then called as task(item, shared, *args)
+
+    the progress bar, if any, is advanced as each item is completed. a task run in a worker process does any
+    resampling of its own serially, as the workers are already busy with the other items
+    """
+    if n_workers is None:
+        n_workers = workers
+    results = []
+
+    def finished(result) -> None:
+        results.append(result)
+        if progress_bar is not None:
+            progress_bar.setValue(progress_bar.value() + 1)
+
+    if (n_workers > 1) and ((work is None) or (work >= PARALLEL_MIN_WORK)):
+        executor = worker_pool(n_workers, shared)
+        pending = collections.deque()
+        try:
+            for item in items:
+                if shared is None:
+                    pending.append(executor.submit(task, item, *args))
+                else:
+                    pending.append(executor.submit(run_shared_task, task, item, args))
+                if len(pending) >= 2*n_workers:
+                    finished(pending.popleft().result())
+            while pending:
+                finished(pending.popleft().result())
+        finally:
+            for future in pending:
+                future.cancel()
+    else:
+        for item in items:
+            if shared is None:
+                finished(task(item, *args))
+            else:
+                finished(task(item, shared, *args))
+    return results
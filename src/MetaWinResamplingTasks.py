@@ -0,0 +1,328 @@
+"""
+Resampling tasks module
+
+This module contains the replicates of the bootstrap and randomization tests run by the resampling workers. It
+depends only on numpy, so that a worker process can start without importing the interface or plotting modules
+"""
+
+import math
+from typing import Tuple
+from collections import namedtuple
+
+import numpy
+
+from MetaWinResampling import run_replicates
+
+
+# maximum number of resampled values drawn at once by the bootstrap and randomization tests
+RESAMPLING_CHUNK_SIZE = 2**20
+
+
+# ---------- bootstrap ----------
+def bootstrap_replicate_means(rng: numpy.random.Generator, bootstrap_n: int, boot_data, pooled_var,
+                              random_effects: bool = False) -> numpy.ndarray:
+    """
+    calculate the weighted mean effect of each of bootstrap_n resamples (with replacement) of boot_data
+
+    the resamples are drawn as a matrix of row indices, one row per replicate, in chunks of at most
+    RESAMPLING_CHUNK_SIZE values, and the means of an entire chunk are calculated at once. the indices drawn are
+    identical to those of drawing each replicate separately with rng.choice(boot_data, len(boot_data))
+    """
+    n = len(boot_data)
+    e = boot_data[:, 0]
+    v = boot_data[:, 1]
+    """
+    for random effects models I'm keeping the process from MW2 where the pooled variance is only
+    calculated once from all of the effect size data, rather than recalculated for each bootstrap
+    replicate
+
+    should consider whether this has to change or should be an either/or option
+    """
+    if random_effects:
+        w = numpy.reciprocal(v + pooled_var)
+    else:
+        w = numpy.reciprocal(v)
+    ew = e * w
+    chunk_n = max(1, RESAMPLING_CHUNK_SIZE // n)
+    means = numpy.empty(bootstrap_n)
+    for start in range(0, bootstrap_n, chunk_n):
+        end = min(start + chunk_n, bootstrap_n)
+        index = rng.integers(0, n, size=(end - start, n))
+        means[start:end] = numpy.sum(ew[index], axis=1) / numpy.sum(w[index], axis=1)
+    return means
+
+
+# ---------- randomization ----------
+def permuted_effects(rng: numpy.random.Generator, nreps: int, e_data):
+    """
+    generate random permutations of the effect sizes for nreps replicates as a series of matrices, each with one
+    replicate per row and at most RESAMPLING_CHUNK_SIZE values
+
+    yields the range of replicates covered by each matrix along with the matrix itself. the permutations are
+    identical to those of calling rng.permutation(e_data) separately for each replicate
+    """
+    chunk_n = max(1, RESAMPLING_CHUNK_SIZE // max(1, len(e_data)))
+    for start in range(0, nreps, chunk_n):
+        end = min(start + chunk_n, nreps)
+        yield start, end, rng.permuted(numpy.tile(e_data, (end - start, 1)), axis=1)
+
+
+def grouped_randomization_qm(rng: numpy.random.Generator, nreps: int, e_data, ws_data, group_codes,
+                             qt) -> numpy.ndarray:
+    """
+    calculate the model heterogeneity of nreps random permutations of the effect sizes among the groups
+
+    group_codes holds the integer index (0 to number of groups - 1) of the group of each study. the within-group
+    sums for every replicate in a chunk are found at once with a single bincount, offsetting the codes of each
+    replicate so that every replicate/group pair has its own bin
+    """
+    g_cnt = int(numpy.max(group_codes)) + 1
+    group_sum_w = numpy.bincount(group_codes, weights=ws_data, minlength=g_cnt)
+    rand_qm = numpy.empty(nreps)
+    for start, end, rand_e_data in permuted_effects(rng, nreps, e_data):
+        chunk_n = end - start
+        bins = (numpy.arange(chunk_n)[:, numpy.newaxis]*g_cnt + group_codes).ravel()
+        group_sum_ew = numpy.bincount(bins, weights=(rand_e_data*ws_data).ravel(), minlength=chunk_n*g_cnt)
+        group_means = group_sum_ew.reshape(chunk_n, g_cnt) / group_sum_w
+        qe = numpy.sum(ws_data*numpy.square(rand_e_data - group_means[:, group_codes]), axis=1)
+        rand_qm[start:end] = qt - qe
+    return rand_qm
+
+
+def regression_randomization_qm(rng: numpy.random.Generator, nreps: int, e_data, ws_data, x_data, sum_ws, sum_wx,
+                                sum_wx2) -> numpy.ndarray:
+    """
+    calculate the model heterogeneity of nreps random permutations of the effect sizes relative to the
+    independent variable
+
+    the sums which do not depend on the order of the effect sizes (sum_ws, sum_wx, and sum_wx2) are calculated only
+    once, by the caller. the two which do (the sums of w·e and w·x·e) are found for a whole chunk of permutations at
+    once as a single matrix product
+    """
+    ss_x = sum_wx2 - sum_wx**2 / sum_ws
+    wx_w = numpy.column_stack((ws_data * x_data, ws_data))
+    rand_qm = numpy.empty(nreps)
+    for start, end, rand_e_data in permuted_effects(rng, nreps, e_data):
+        sums = rand_e_data @ wx_w
+        rand_qm[start:end] = numpy.square(sums[:, 0] - sum_wx * sums[:, 1] / sum_ws) / ss_x
+    return rand_qm
+
+
+# ---------- generalized linear model ----------
+def weighted_glm(e: numpy.array, x: numpy.array, w: numpy.array):
+    """
+    the equivalent of calculate_glm when the weights are independent and w is a vector
+
+    rather than forming the n × n weight matrix, the rows of x and e are scaled by the square root of their weights
+    and the model is solved from a QR decomposition of the scaled design matrix, so memory is O(np) and time is
+    O(np²). along with qm, qe, beta, and sigma_b, the trace of the weighted hat matrix, W·X·(X'WX)⁻¹·X'·W, is
+    returned for pooled_var_weighted_glm; it is the sum of the weights times the leverages (the squared row norms
+    of Q)
+    """
+    sqrt_w = numpy.sqrt(w)
+    q, r = numpy.linalg.qr(x * sqrt_w[:, numpy.newaxis])
+    r_diag = numpy.abs(numpy.diagonal(r))
+    if numpy.min(r_diag) <= numpy.max(r_diag) * len(e) * numpy.finfo(float).eps:
+        raise numpy.linalg.LinAlgError("Singular matrix")
+    r_inv = numpy.linalg.inv(r)
+    sigma_b = numpy.matmul(r_inv, numpy.transpose(r_inv))  # (X'WX)⁻¹
+    beta = numpy.matmul(r_inv, numpy.matmul(numpy.transpose(q), sqrt_w * e))
+    red_beta = beta[1:]
+    qm = numpy.matmul(red_beta, numpy.linalg.solve(sigma_b[1:, 1:], red_beta))
+    scaled_error = sqrt_w * (e - numpy.matmul(x, beta))
+    qe = numpy.sum(numpy.square(scaled_error))
+    hat_trace = numpy.sum(w * numpy.sum(numpy.square(q), axis=1))
+    return qm, qe, beta, sigma_b, hat_trace
+
+
+def glm_model_projection(x: numpy.array, w: numpy.array) -> numpy.array:
+    """
+    factor the weighted design matrix once into the n × (p-1) matrix P for which the model heterogeneity (qm) of
+    any vector of effects e fit with design matrix x and independent weights w is ‖Pᵀe‖²
+
+    with QR = W^½·X, Qᵀ·W^½·e = L⁻¹·XᵀW·e, where L = Rᵀ is the Cholesky factor of XᵀWX. the coefficients beyond
+    the first (the intercept) are tested by all but the first element of this vector, so P = W^½·Q without its
+    first column
+    """
+    sqrt_w = numpy.sqrt(w)
+    q, _ = numpy.linalg.qr(x * sqrt_w[:, numpy.newaxis])
+    return sqrt_w[:, numpy.newaxis] * q[:, 1:]
+
+
+def glm_randomization_qm(rng: numpy.random.Generator, nreps: int, e_data, projection) -> numpy.ndarray:
+    """
+    calculate the model heterogeneity of nreps random permutations of the effect sizes relative to the
+    design matrix
+
+    projection is the matrix from glm_model_projection, so the design matrix is factored only once and qm for a
+    whole chunk of permutations is found with a single matrix product
+    """
+    rand_qm = numpy.empty(nreps)
+    for start, end, rand_e_data in permuted_effects(rng, nreps, e_data):
+        rand_qm[start:end] = numpy.sum(numpy.square(numpy.matmul(rand_e_data, projection)), axis=1)
+    return rand_qm
+
+
+# ---------- nested ----------
+nested_hierarchy_tuple = namedtuple("nested_hierarchy_tuple", ["names", "codes", "parents", "sizes"])
+
+
+def nested_replicate_heterogeneity(rand_e_data: numpy.ndarray, w_data, hierarchy: nested_hierarchy_tuple,
+                                   mean_e) -> Tuple[numpy.ndarray, numpy.ndarray]:
+    """
+    partition the heterogeneity of a nested hierarchy for each row of a matrix of effect sizes, returning a matrix
+    with Qm of every level for each row and a vector with Qe for each row
+
+    the weighted sums of every row and group at a level come from a single bincount, offsetting the group codes of
+    each row so that every row/group pair has its own bin
+    """
+    rep_cnt = numpy.shape(rand_e_data)[0]
+    n_levels = len(hierarchy.codes)
+    qm = numpy.empty((rep_cnt, n_levels))
+    parent_means = numpy.full((rep_cnt, 1), mean_e)
+    ew_data = (rand_e_data*w_data).ravel()
+    for k in range(n_levels):
+        codes = hierarchy.codes[k]
+        group_cnt = len(hierarchy.names[k])
+        group_sum_w = numpy.bincount(codes, weights=w_data, minlength=group_cnt)
+        bins = (numpy.arange(rep_cnt)[:, numpy.newaxis]*group_cnt + codes).ravel()
+        group_sum_ew = numpy.bincount(bins, weights=ew_data, minlength=rep_cnt*group_cnt)
+        group_means = group_sum_ew.reshape(rep_cnt, group_cnt) / group_sum_w
+        qm[:, k] = numpy.sum(group_sum_w*numpy.square(group_means - parent_means[:, hierarchy.parents[k]]), axis=1)
+        parent_means = group_means
+    qe = numpy.sum(w_data*numpy.square(rand_e_data - parent_means[:, hierarchy.codes[-1]]), axis=1)
+    return qm, qe
+
+
+def restricted_permuted_effects(rng: numpy.random.Generator, nreps: int, e_data, group_codes):
+    """
+    generate random permutations of the effect sizes in which effects are only exchanged among studies within the
+    same group, in blocks of replicates as with permuted_effects
+
+    each replicate draws a random key for every study; sorting the studies by group and then key lists each group's
+    studies in a random order, which are then placed into the positions of that group's studies
+    """
+    chunk_n = max(1, RESAMPLING_CHUNK_SIZE // max(1, len(e_data)))
+    group_rows = numpy.argsort(group_codes, kind="stable")
+    for start in range(0, nreps, chunk_n):
+        end = min(start + chunk_n, nreps)
+        shuffled_rows = numpy.argsort(group_codes + rng.random((end - start, len(e_data))), axis=1)
+        rand_e_data = numpy.empty((end - start, len(e_data)))
+        rand_e_data[:, group_rows] = e_data[shuffled_rows]
+        yield start, end, rand_e_data
+
+
+def nested_randomization_qm(rng: numpy.random.Generator, nreps: int, e_data, w_data,
+                            hierarchy: nested_hierarchy_tuple, mean_e, restricted: bool = False) -> numpy.ndarray:
+    """
+    calculate the model heterogeneity of each level of the nested hierarchy for nreps random permutations
+    of the effect sizes, evaluated for a block of permutations at a time
+
+    if restricted, the null distribution of Qm for each level below the top is found by permuting the effects only
+    among the studies within the same group of the level above, leaving the higher-level structure intact;
+    otherwise the effects are permuted freely and the same permutations are used for every level
+    """
+    n_levels = len(hierarchy.codes)
+    rand_qm = numpy.zeros((nreps, n_levels))
+    if restricted:
+        for k in range(n_levels):
+            if k == 0:
+                permutations = permuted_effects(rng, nreps, e_data)
+            else:
+                permutations = restricted_permuted_effects(rng, nreps, e_data, hierarchy.codes[k-1])
+            for start, end, rand_e_data in permutations:
+                rand_qm[start:end, k] = nested_replicate_heterogeneity(rand_e_data, w_data, hierarchy, mean_e)[0][:, k]
+    else:
+        for start, end, rand_e_data in permuted_effects(rng, nreps, e_data):
+            rand_qm[start:end] = nested_replicate_heterogeneity(rand_e_data, w_data, hierarchy, mean_e)[0]
+    return rand_qm
+
+
+# ---------- jackknife ----------
+def leave_k_out_subsets(rng: numpy.random.Generator, nreps: int, n: int, k: int) -> numpy.ndarray:
+    """
+    draw nreps random subsets of k of n studies to leave out, as the rows of a matrix of sorted study indices
+
+    each subset is made of the k studies with the smallest of a set of uniform random keys, so every subset of k
+    studies is equally likely. the keys are drawn in chunks of at most RESAMPLING_CHUNK_SIZE values
+    """
+    subsets = numpy.empty((nreps, k), dtype=int)
+    chunk_n = max(1, RESAMPLING_CHUNK_SIZE // n)
+    for start in range(0, nreps, chunk_n):
+        end = min(start + chunk_n, nreps)
+        keys = rng.random((end - start, n))
+        subsets[start:end] = numpy.sort(numpy.argpartition(keys, k - 1, axis=1)[:, :k], axis=1)
+    return subsets
+
+
+def deletion_bootstrap_means(deletion: tuple, boot_data, bootstrap_n: int, random_effects: bool) -> numpy.ndarray:
+    """
+    bootstrap the mean effect of the studies remaining after a deletion, returning the means of the replicates
+
+    the deletion is given as a tuple of the rows it leaves out, the pooled variance of the remaining studies, and
+    the seed of its replicates; boot_data holds every study and is shared by all of the deletions
+    """
+    rows, pooled_var, seed = deletion
+    kept_data = numpy.delete(boot_data, rows, axis=0)
+    return run_replicates(bootstrap_replicate_means, bootstrap_n, (kept_data, pooled_var, random_effects), seed)
+
+
+# ---------- rank correlation ----------
+def correlation(x, y):
+    n = len(x)
+    x_mean = numpy.sum(x)/n
+    y_mean = numpy.sum(y)/n
+    sum_xy = numpy.sum((x - x_mean)*(y - y_mean))
+    sum_x2 = numpy.sum(numpy.square(x - x_mean))
+    sum_y2 = numpy.sum(numpy.square(y - y_mean))
+    return sum_xy / math.sqrt(sum_x2 * sum_y2)
+
+
+def kendalls_tau(e_ranks, x_ranks):
+    n = len(e_ranks)
+    sort_data = numpy.zeros(shape=(n, 2))
+    # if there are no ties in e_ranks, sort by it, otherwise, sort by x_ranks
+    if len(numpy.unique(e_ranks)) < n:
+        sort_data[:, 0] = x_ranks
+        sort_data[:, 1] = e_ranks
+    else:
+        sort_data[:, 0] = e_ranks
+        sort_data[:, 1] = x_ranks
+    sort_data = sort_data[sort_data[:, 0].argsort()]  # sort into ascending order by first column
+    c = 0
+    for i in range(n):
+        for j in range(i + 1, n):
+            if sort_data[j, 1] > sort_data[i, 1]:
+                c += 1
+            elif sort_data[j, 1] == sort_data[i, 1]:
+                c += 0.5
+    sum_n = 4 * c - n * (n - 1)
+    # correction terms for ties
+    unique, cnts = numpy.unique(e_ranks, return_counts=True)
+    t1 = 0
+    for c in cnts:
+        if c > 1:
+            t1 += c * (c - 1)
+    unique, cnts = numpy.unique(x_ranks, return_counts=True)
+    t2 = 0
+    for c in cnts:
+        if c > 1:
+            t2 += c * (c - 1)
+
+    tau = sum_n / math.sqrt((n * (n - 1) - t1) * (n * (n - 1) - t2))
+    return tau
+
+
+def rank_correlation_randomization(rng: numpy.random.Generator, nreps: int, e_ranks, x_ranks,
+                                   cor_test: str = "tau") -> numpy.ndarray:
+    """
+    calculate the rank correlation of nreps random permutations of the effect size ranks
+    """
+    rand_r = numpy.empty(nreps)
+    for rep in range(nreps):
+        rand_e_ranks = rng.permutation(e_ranks)
+        if cor_test == "tau":
+            rand_r[rep] = kendalls_tau(rand_e_ranks, x_ranks)
+        else:
+            rand_r[rep] = correlation(rand_e_ranks, x_ranks)
+    return rand_r
@@ -1,85 +1,519 @@
 """
-Module containing the class associated with storing and manipulating phylogenetic trees
+Module containing the classes associated with storing and manipulating phylogenetic trees
 """
 
+import io
+import re
+from typing import Iterator, Optional, Tuple
+
+import numpy
+
+
+class Tree:
+    """
+    A class which stores all of the nodes of a phylogenetic tree as a set of parallel lists, indexed by node number
+
+    Each node records its ancestor, its first descendant and next sibling, its name, and the length of the branch
+    to its ancestor (-1 represents the absence of an ancestor, descendant, or sibling). All traversals are
+    iterative, so trees of any shape can be handled without reaching the recursion limit. Derived values, such as
+    the pre-order of the nodes, their depths, and the index of node names, are calculated when first needed and
+    kept until the tree is modified.
+    """
+
+    def __init__(self):
+        self.parent = []
+        self.first_child = []
+        self.last_child = []
+        self.next_sibling = []
+        self.names = []
+        self.branch_lengths = []
+        self.__cache = {}
+
+    def __len__(self):
+        return len(self.parent)
+
+    def modified(self) -> None:
+        """
+        clear the derived values whenever the tree is changed
+        """
+        self.__cache = {}
+
+    def cached(self, key: str, calculate):
+        if key not in self.__cache:
+            self.__cache[key] = calculate()
+        return self.__cache[key]
+
+    def add_node(self, parent: int = -1, name: str = "", branch_length=1) -> int:
+        """
+        add a new node as the last descendant of parent (or unattached if parent is -1) and return its index
+        """
+        i = len(self.parent)
+        self.parent.append(-1)
+        self.first_child.append(-1)
+        self.last_child.append(-1)
+        self.next_sibling.append(-1)
+        self.names.append(name)
+        self.branch_lengths.append(branch_length)
+        if parent >= 0:
+            self.attach(i, parent)
+        self.modified()
+        return i
+
+    def attach(self, i: int, parent: int) -> None:
+        """
+        make node i the last descendant of parent, detaching it from any current ancestor
+        """
+        self.detach(i)
+        self.parent[i] = parent
+        if self.first_child[parent] < 0:
+            self.first_child[parent] = i
+        else:
+            self.next_sibling[self.last_child[parent]] = i
+        self.last_child[parent] = i
+        self.modified()
+
+    def detach(self, i: int) -> None:
+        """
+        remove node i (and its descendants) from the descendants of its ancestor
+        """
+        parent = self.parent[i]
+        if parent < 0:
+            return
+        previous = -1
+        current = self.first_child[parent]
+        while current != i:
+            previous = current
+            current = self.next_sibling[current]
+        if previous < 0:
+            self.first_child[parent] = self.next_sibling[i]
+        else:
+            self.next_sibling[previous] = self.next_sibling[i]
+        if self.last_child[parent] == i:
+            self.last_child[parent] = previous
+        self.parent[i] = -1
+        self.next_sibling[i] = -1
+        self.modified()
+
+    def graft(self, other, i: int) -> int:
+        """
+        copy node i of another tree, along with all of its descendants, into this tree as an unattached subtree and
+        return the index of its copy
+        """
+        new_index = {}
+        for j in other.preorder(i):
+            parent = new_index[other.parent[j]] if j != i else -1
+            new_index[j] = self.add_node(parent, other.names[j], other.branch_lengths[j])
+        return new_index[i]
+
+    def induced_subtree(self, nodes, i: int = 0):
+        """
+        create a new tree containing only the listed nodes below node i and the ancestors connecting them to node
+        i, which becomes the root (node 0) of the new tree. ancestors left with a single descendant are removed and
+        their branch lengths added to that of the descendant, so the distances among the remaining nodes are
+        unchanged. the listed nodes themselves are always kept, and descendants stay in their original order
+
+        only the nodes on the paths from the listed nodes up to node i are visited, so the work does not depend on
+        the size of the rest of the tree
+        """
+        kept = {i}
+        for j in nodes:
+            while j not in kept:
+                if j < 0:
+                    raise ValueError("node {} is not below node {}".format(j, i))
+                kept.add(j)
+                j = self.parent[j]
+        n_children = dict.fromkeys(kept, 0)
+        for j in kept:
+            if j != i:
+                n_children[self.parent[j]] += 1
+        listed = set(nodes)
+        position = self.order()[1]
+        subtree = Tree()
+        new_index = {i: subtree.add_node(-1, self.names[i], self.branch_lengths[i])}
+        extra_length = {i: 0}
+        for j in sorted(kept, key=lambda k: position[k]):  # ancestors before descendants, in order
+            if j == i:
+                continue
+            parent = self.parent[j]
+            length = self.branch_lengths[j] + extra_length[parent]
+            if (n_children[j] == 1) and (j not in listed):
+                new_index[j] = new_index[parent]
+                extra_length[j] = length
+            else:
+                new_index[j] = subtree.add_node(new_index[parent], self.names[j], length)
+                extra_length[j] = 0
+        return subtree
+
+    def children(self, i: int) -> list:
+        """
+        return the indices of the immediate descendants of node i, in order
+        """
+        result = []
+        current = self.first_child[i]
+        while current >= 0:
+            result.append(current)
+            current = self.next_sibling[current]
+        return result
+
+    def is_tip(self, i: int) -> bool:
+        return self.first_child[i] < 0
+
+    def root(self, i: int = 0) -> int:
+        """
+        return the index of the root of the tree containing node i
+        """
+        while self.parent[i] >= 0:
+            i = self.parent[i]
+        return i
+
+    def preorder(self, i: int = 0) -> list:
+        """
+        return the indices of node i and all of its descendants in pre-order (each node before its descendants,
+        and descendants in order)
+        """
+        result = []
+        stack = [i]
+        while stack:
+            j = stack.pop()
+            result.append(j)
+            stack.extend(reversed(self.children(j)))
+        return result
+
+    def postorder(self, i: int = 0) -> list:
+        """
+        return the indices of node i and all of its descendants in post-order (each node after its descendants,
+        and descendants in order)
+        """
+        result = []
+        stack = [i]
+        while stack:
+            j = stack.pop()
+            result.append(j)
+            stack.extend(self.children(j))
+        result.reverse()
+        return result
+
+    def __full_preorder(self) -> list:
+        order = []
+        for i in range(len(self)):
+            if self.parent[i] < 0:
+                order.extend(self.preorder(i))
+        return order
+
+    def __calc_order(self) -> tuple:
+        """
+        the position of every node in a pre-order traversal of the entire tree and the number of nodes in the
+        subtree below each node (including itself); a node is below another if its position falls within the
+        subtree of the other
+        """
+        position = [0 for _ in range(len(self))]
+        size = [1 for _ in range(len(self))]
+        order = self.__full_preorder()
+        for p, i in enumerate(order):
+            position[i] = p
+        for i in reversed(order):
+            if self.parent[i] >= 0:
+                size[self.parent[i]] += size[i]
+        return order, position, size
+
+    def order(self) -> tuple:
+        return self.cached("order", self.__calc_order)
+
+    def __calc_levels(self) -> list:
+        levels = [0 for _ in range(len(self))]
+        for i in self.order()[0]:
+            if self.parent[i] >= 0:
+                levels[i] = levels[self.parent[i]] + 1
+        return levels
+
+    def levels(self) -> list:
+        """
+        the number of branches between each node and the root
+        """
+        return self.cached("levels", self.__calc_levels)
+
+    def __calc_depths(self) -> numpy.ndarray:
+        depths = numpy.zeros(len(self))
+        for i in self.order()[0]:
+            if self.parent[i] >= 0:
+                depths[i] = depths[self.parent[i]] + self.branch_lengths[i]
+        return depths
+
+    def depths(self) -> numpy.ndarray:
+        """
+        the sum of the branch lengths between each node and the root
+        """
+        return self.cached("depths", self.__calc_depths)
+
+    def __calc_lca_index(self) -> tuple:
+        """
+        an Euler tour of the tree (every node listed on entry and again after each of its descendants) with the
+        position of each node's first appearance, and a sparse table whose row k holds the position of the
+        shallowest node in each stretch of 2^k entries of the tour. separate trees are divided by an entry of -1
+        """
+        levels = self.levels()
+        tour = []
+        for root in [i for i in self.order()[0] if self.parent[i] < 0]:
+            if tour:
+                tour.append(-1)
+            tour.append(root)
+            stack = [(root, iter(self.children(root)))]
+            while stack:
+                child = next(stack[-1][1], None)
+                if child is None:
+                    stack.pop()
+                    if stack:
+                        tour.append(stack[-1][0])
+                else:
+                    tour.append(child)
+                    stack.append((child, iter(self.children(child))))
+        tour = numpy.array(tour)
+        tour_levels = numpy.where(tour < 0, -1, numpy.array(levels + [-1])[tour])
+        first = numpy.empty(len(self), dtype=int)
+        tour_nodes, first_pos = numpy.unique(tour, return_index=True)
+        first[tour_nodes[tour_nodes >= 0]] = first_pos[tour_nodes >= 0]
+        m = len(tour)
+        table = numpy.zeros((max(1, m.bit_length()), m), dtype=int)
+        table[0] = numpy.arange(m)
+        for k in range(1, len(table)):
+            span = 2**k
+            left = table[k-1, :m - span + 1]
+            right = table[k-1, span//2:m - span//2 + 1]
+            table[k, :m - span + 1] = numpy.where(tour_levels[left] <= tour_levels[right], left, right)
+        return tour, tour_levels, first, table
+
+    def common_ancestors(self, a, b) -> numpy.ndarray:
+        """
+        the most recent common ancestor of each pair of nodes (a[k], b[k]) from arrays of node indices, found in
+        constant time per pair as the shallowest node between their first appearances in an Euler tour of the tree
+
+        where one node of a pair is an ancestor of the other, it is their common ancestor; a node is its own
+        common ancestor. pairs in separate trees have no common ancestor and return -1
+        """
+        tour, tour_levels, first, table = self.cached("lca index", self.__calc_lca_index)
+        pos_a = first[numpy.asarray(a, dtype=int)]
+        pos_b = first[numpy.asarray(b, dtype=int)]
+        start = numpy.minimum(pos_a, pos_b)
+        end = numpy.maximum(pos_a, pos_b) + 1
+        k = numpy.floor(numpy.log2(end - start)).astype(int)
+        left = table[k, start]
+        right = table[k, end - 2**k]
+        return tour[numpy.where(tour_levels[left] <= tour_levels[right], left, right)]
+
+    def shared_path_lengths(self, a, b, ancestor: Optional[int] = None) -> numpy.ndarray:
+        """
+        the length of the path from an ancestor (by default, the root) to the common ancestor of each pair of
+        nodes (a[k], b[k]), the branch length the pair shares below that ancestor
+        """
+        depths = self.depths()
+        lca = self.common_ancestors(a, b)
+        if ancestor is None:
+            return depths[lca]
+        return depths[lca] - depths[ancestor]
+
+    def tip_distances(self, a, b) -> numpy.ndarray:
+        """
+        the patristic distance (the sum of the branch lengths on the path) between each pair of nodes
+        (a[k], b[k]); pairs in separate trees return nan
+        """
+        depths = self.depths()
+        a = numpy.asarray(a, dtype=int)
+        b = numpy.asarray(b, dtype=int)
+        lca = self.common_ancestors(a, b)
+        return numpy.where(lca < 0, numpy.nan, depths[a] + depths[b] - 2*depths[lca])
+
+    def __calc_name_index(self) -> dict:
+        name_index = {}
+        for i in self.order()[0]:
+            name_index.setdefault(self.names[i], []).append(i)
+        return name_index
+
+    def name_index(self) -> dict:
+        """
+        a dictionary of the nodes with each name, in pre-order
+        """
+        return self.cached("name index", self.__calc_name_index)
+
+    def is_descendant(self, i: int, query: int) -> bool:
+        """
+        is node query below node i in the tree
+        """
+        _, position, size = self.order()
+        return position[i] < position[query] < position[i] + size[i]
+
+    def find_by_name(self, i: int, query: str) -> int:
+        """
+        return the first node in pre-order with the queried name among node i and its descendants, or -1 if
+        there is none
+        """
+        _, position, size = self.order()
+        for j in self.name_index().get(query, []):
+            if position[i] <= position[j] < position[i] + size[i]:
+                return j
+        return -1
+
+    def common_ancestor(self, i: int, query: int) -> int:
+        """
+        return the index of the common ancestor of two nodes, including the case where one is the ancestor of the
+        other. as the ancestor of a node is the first node it descends from, the common ancestor of a node with
+        itself is its ancestor
+        """
+        if i == query:
+            return self.parent[i]
+        return int(self.common_ancestors([i], [query])[0])
+
+    def distance_to_ancestor(self, i: int, query: int):
+        """
+        the sum of the branch lengths from node i up to the queried ancestor
+        """
+        distance = 0
+        current = i
+        while current != query:
+            if current < 0:
+                raise ValueError("node {} is not an ancestor of node {}".format(query, i))
+            distance += self.branch_lengths[current]
+            current = self.parent[current]
+        return distance
+
+    def max_node_tip_lengths(self, i: int = 0) -> dict:
+        """
+        the longest distance from the ancestor of each node in the subtree of node i to its most distant tip
+        """
+        longest = {}
+        for j in self.postorder(i):
+            longest[j] = max((longest[k] for k in self.children(j)), default=0) + self.branch_lengths[j]
+        return longest
+
+    def tip_counts(self, i: int = 0) -> dict:
+        """
+        the number of tips in the subtree of each node in the subtree of node i
+        """
+        counts = {}
+        for j in self.postorder(i):
+            if self.is_tip(j):
+                counts[j] = 1
+            else:
+                counts[j] = sum(counts[k] for k in self.children(j))
+        return counts
+
+    def tips(self, i: int = 0) -> list:
+        """
+        the tips below node i, in order
+        """
+        return [j for j in self.preorder(i) if self.is_tip(j)]
+
+    def newick(self, i: int = 0, bl_format: str = "0.4f") -> str:
+        """
+        the subtree of node i in Newick format (without the closing semicolon). if bl_format is not an empty string
+        branch lengths are included in the format specified by bl_format
+        """
+        strings = {}
+        for j in self.postorder(i):
+            if self.is_tip(j):
+                outstr = self.names[j]
+            else:
+                outstr = "(" + ",".join(strings.pop(k) for k in self.children(j)) + ")"
+            if bl_format != "":
+                outstr += ":" + format(self.branch_lengths[j], bl_format)
+            strings[j] = outstr
+        return strings[i]
+
+    def node(self, i: int = 0):
+        return Node(self, i)
+
 
 class Node:
     """
     A class which represents a single node of a phylgenetic tree
 
-    The class works by hierarchically by pointing to other nodes, either as ancestor or as a set of descendants.
+    The class is a light-weight view of one node of a Tree, so many views of the same node may exist; they compare
+    equal to each other. A node created without a tree starts a new tree of its own.
     """
 
-    def __init__(self):
-        self.__name = ""
-        self.__branch_length = 1
-        self.__ancestor = None
-        self.__descendants = list()
+    def __init__(self, tree: Optional[Tree] = None, index: Optional[int] = None):
+        if tree is None:
+            tree = Tree()
+        if index is None:
+            index = tree.add_node()
+        self.tree = tree
+        self.index = index
+
+    def __eq__(self, other):
+        return isinstance(other, Node) and (self.tree is other.tree) and (self.index == other.index)
+
+    def __hash__(self):
+        return hash((id(self.tree), self.index))
+
+    def __view(self, i: int):
+        if i < 0:
+            return None
+        return Node(self.tree, i)
 
     @property
     def name(self):
-        return self.__name
+        return self.tree.names[self.index]
 
     @name.setter
     def name(self, value):
-        self.__name = value
+        self.tree.names[self.index] = value
+        self.tree.modified()
 
     @property
     def branch_length(self):
         """
         The branch length represents the distance from the node to its ancestor
         """
-        return self.__branch_length
+        return self.tree.branch_lengths[self.index]
 
     @branch_length.setter
     def branch_length(self, value):
-        self.__branch_length = value
+        self.tree.branch_lengths[self.index] = value
+        self.tree.modified()
 
     @property
     def descendants(self):
-        return self.__descendants
+        return [Node(self.tree, i) for i in self.tree.children(self.index)]
 
     @property
     def ancestor(self):
-        return self.__ancestor
+        return self.__view(self.tree.parent[self.index])
 
     @ancestor.setter
     def ancestor(self, value):
-        self.__ancestor = value
+        if value is None:
+            self.tree.detach(self.index)
+        else:
+            value.add_child(self)
 
     def add_child(self, new_child):
         """
         add a new descendant to the node. the function automatically assigns this node as the ancestor of the child
+
+        a child from a different tree is copied into this tree, along with its descendants, and the child is
+        updated to view the copy
         """
-        self.descendants.append(new_child)
-        new_child.ancestor = self
+        if new_child.tree is not self.tree:
+            new_child.index = self.tree.graft(new_child.tree, new_child.index)
+            new_child.tree = self.tree
+        self.tree.attach(new_child.index, self.index)
 
     def n_descendants(self) -> int:
         """
         return the immediate number of descendants of the node
         """
-        return len(self.descendants)
+        return len(self.tree.children(self.index))
 
     def root(self):
         """
         find and return the node representing the root of the tree
         """
-        if self.ancestor is None:
-            return self
-        else:
-            return self.ancestor.root()
+        return Node(self.tree, self.tree.root(self.index))
 
     def is_descendant(self, query) -> bool:
         """
         is the query node a descendant of the calling node
         """
-        result = False
-        for d in self.descendants:
-            if d == query:
-                result = True
-            elif d.is_descendant(query):
-                result = True
-        return result
+        return (query.tree is self.tree) and self.tree.is_descendant(self.index, query.index)
 
     def is_sibling(self, query) -> bool:
         """
@@ -91,114 +525,61 @@ class Node:
         """
         number of tips descended from this node, including itself
         """
-        if self.n_descendants() == 0:
-            return 1
-        else:
-            count = 0
-            for d in self.descendants:
-                count += d.n_tips()
-            return count
+        return len(self.tree.tips(self.index))
 
     def distance_to_ancestor(self, query) -> float:
         """
         returns the sum of branch lengths between this node and the queried ancestor
-
-        Note that if the query is not an ancestor this will get stuck in a loop.
         """
-        distance = 0
-        current_node = self
-        while current_node != query:
-            distance += current_node.branch_length
-            current_node = current_node.ancestor
-        return distance
+        return self.tree.distance_to_ancestor(self.index, query.index)
 
     def common_ancestor(self, query):
         """
         returns the node representing the common ancestor between this node and the query, including the case
         where one is the ancestor of the other
         """
-        if query.is_descendant(self):
-            return query
-        else:
-            common_anc = self
-            while not common_anc.is_descendant(query):
-                common_anc = common_anc.ancestor
-            return common_anc
+        return self.__view(self.tree.common_ancestor(self.index, query.index))
 
     def distance_on_tree(self, query) -> float:
         """
         returns the sum of branch lengths separating this node from the query node on the tree
         """
-        if self.is_descendant(query):
-            return query.distance_to_ancestor(self)
-        elif query.is_descendant(self):
-            return self.distance_to_ancestor(query)
-        else:
-            common_anc = self.common_ancestor(query)
-            return (self.distance_to_ancestor(common_anc) +
-                    query.distance_to_ancestor(common_anc))
+        return float(self.tree.tip_distances([self.index], [query.index])[0])
 
     def max_node_tip_length(self) -> float:
         """
         find the longest distance between a node and its most distance descendant
         """
-        long = 0
-        for d in self.descendants:
-            long = max(long, d.max_node_tip_length())
-        return long + self.branch_length
+        return self.tree.max_node_tip_lengths(self.index)[self.index]
 
     def max_node_name(self) -> int:
         """
         find the longest name associated with a node and its descendants
         """
-        long = len(self.name)
-        for d in self.descendants:
-            long = max(long, d.max_node_name())
-        return long
+        return max(len(self.tree.names[i]) for i in self.tree.preorder(self.index))
 
     def tip_names(self) -> list:
         """
         return a list of all tip names associated with a node
         """
-        names = []
-        if self.n_descendants() == 0:
-            names.append(self.name)
-        else:
-            for d in self.descendants:
-                names.extend(d.tip_names())
-        return names
+        return [self.tree.names[i] for i in self.tree.tips(self.index)]
 
     def tip_nodes(self) -> list:
         """
         return a list of all tip nodes associated with a node
         """
-        tips = []
-        if self.n_descendants() == 0:
-            tips.append(self)
-        else:
-            for d in self.descendants:
-                tips.extend(d.tip_nodes())
-        return tips
+        return [Node(self.tree, i) for i in self.tree.tips(self.index)]
 
     def newick_recursion(self, bl_format: str = "0.4f") -> str:
         """
          This function will output the tree in the Newick format. If bl_format is not an empty string
          it will include branch lengths in the format specified by the bl_format string.
         """
-        if self.n_descendants() == 0:
-            outstr = self.name
-        else:
-            outlist = []
-            for d in self.descendants:
-                outlist.append(d.newick_recursion(bl_format))
-            outstr = "(" + ",".join(outlist) + ")"
-        if bl_format != "":
-            outstr += ":" + format(self.branch_length, bl_format)
-        return outstr
+        return self.tree.newick(self.index, bl_format)
 
     def output_newick(self, bl_format: str = "0.4f") -> str:
         """
-        calls the recursive function to produce the Newick form of the tree and adds the semicolon to the end
+        calls the function to produce the Newick form of the tree and adds the semicolon to the end
         """
         return self.newick_recursion(bl_format) + ";"
 
@@ -206,52 +587,182 @@ class Node:
         """
         find and return the node with the queried name
         """
-        if self.name == query:
-            return self
+        return self.__view(self.tree.find_by_name(self.index, query))
+
+
+# a single Newick token, preceded by optional white space: a comment, a quoted label, one of the punctuation symbols,
+# or an unquoted label (which may contain spaces, but not line breaks)
+NEWICK_TOKEN = re.compile(r"""\s*(?:(\[[^\]]*\])|('(?:[^']|'')*'|"[^"]*")|([(),:;])|"""
+                          r"""([^\s()\[\],:;'"]+(?:[^\S\r\n]+[^\s()\[\],:;'"]+)*))""")
+
+# the amount of text read from a stream at a time
+NEWICK_CHUNK_SIZE = 2**16
+
+
+def newick_tokens(stream, chunk_size: int = NEWICK_CHUNK_SIZE) -> Iterator[Tuple[str, str]]:
+    """
+    lazily split the text read from a stream into Newick tokens, returned as (kind, text) pairs where kind is
+    "symbol" (parentheses, comma, colon, or semicolon), "label", or "quoted" (a label given in quotes, returned with
+    the quotes removed); comments in square brackets are skipped
+
+    the stream is read a chunk at a time, so only the text of the token currently being read is held in memory
+    """
+    buffer = ""
+    pos = 0
+    size = chunk_size
+    eof = False
+    while True:
+        match = NEWICK_TOKEN.match(buffer, pos)
+        # a token at the end of the buffer may continue into the next chunk, as may an unquoted label followed only
+        # by white space, which may separate it from further words of the same label
+        if (match is None) or (not eof and ((match.end() == len(buffer)) or
+                                            ((match.group(4) is not None) and buffer[match.end():].isspace()))):
+            if eof:
+                if buffer[pos:].strip() != "":
+                    raise ValueError("Unterminated quote or comment in tree")
+                return
+            if pos == 0:  # no complete token in the buffer, so read larger chunks to keep reading linear
+                size = max(size, 2*len(buffer))
+            chunk = stream.read(size)
+            eof = chunk == ""
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        pos = match.end()
+        comment, quoted, symbol, label = match.groups()
+        if symbol is not None:
+            yield "symbol", symbol
+        elif label is not None:
+            yield "label", label
+        elif quoted is not None:
+            if quoted[0] == "'":
+                yield "quoted", quoted[1:-1].replace("''", "'")
+            else:
+                yield "quoted", quoted[1:-1]
+
+
+def build_newick_tree(tokens: list) -> Node:
+    """
+    construct a tree from the tokens of a single Newick tree statement and return the node representing the root
+    """
+    tree = Tree()
+    current_node = tree.add_node()
+    expecting_length = False
+    for kind, text in tokens:
+        if expecting_length:
+            if kind != "label":
+                raise ValueError("Missing branch length in tree")
+            tree.branch_lengths[current_node] = float(text)
+            expecting_length = False
+        elif kind != "symbol":
+            tree.names[current_node] = text
+        elif text == "(":
+            current_node = tree.add_node(current_node)
+        elif text == ",":
+            if tree.parent[current_node] < 0:
+                raise ValueError("Comma outside of parentheses in tree")
+            current_node = tree.add_node(tree.parent[current_node])
+        elif text == ")":
+            if tree.parent[current_node] < 0:
+                raise ValueError("Unbalanced parentheses in tree")
+            current_node = tree.parent[current_node]
+        elif text == ":":
+            expecting_length = True
+    if expecting_length:
+        raise ValueError("Missing branch length in tree")
+    if tree.parent[current_node] >= 0:
+        raise ValueError("Unbalanced parentheses in tree")
+    tree.modified()
+    return tree.node(current_node)
+
+
+def nexus_words(tokens: list) -> list:
+    """
+    split the labels within the tokens of a NEXUS command into their individual words
+    """
+    words = []
+    for kind, text in tokens:
+        if kind == "label":
+            words.extend(text.split())
+        elif kind == "quoted":
+            words.append(text)
+    return words
+
+
+def read_trees(stream) -> Iterator[Node]:
+    """
+    lazily read the trees from a text stream and return the node representing the root of each in turn
+
+    the stream may either be in Newick format, containing one or more trees each ending with a semicolon, or in
+    NEXUS format, in which case the trees in its TREES blocks are read and any translation table is applied to the
+    names of the tips. because the trees are built one at a time as the stream is read, files containing large
+    numbers of trees (such as samples from a posterior distribution) can be processed without holding them in memory
+    """
+    nexus = None
+    in_trees_block = False
+    translation = {}
+    statement = []
+    for kind, text in newick_tokens(stream):
+        if nexus is None:
+            nexus = (kind == "label") and (text.split()[0].upper() == "#NEXUS")
+            if nexus:
+                text = text[len("#NEXUS"):].strip()
+                if text == "":
+                    continue
+        if (kind != "symbol") or (text != ";"):
+            statement.append((kind, text))
+        elif not nexus:
+            if statement:
+                yield build_newick_tree(statement)
+            statement = []
         else:
-            for d in self.descendants:
-                x = d.find_tip_by_name(query)
-                if x is not None:
-                    return x
-        return None
+            # the end of a NEXUS command
+            words = nexus_words(statement[:2])
+            command = words[0].upper() if (words and (statement[0][0] == "label")) else ""
+            if command == "BEGIN":
+                in_trees_block = (len(words) > 1) and (words[1].upper() == "TREES")
+                translation = {}
+            elif command in ("END", "ENDBLOCK"):
+                in_trees_block = False
+            elif in_trees_block and (command == "TRANSLATE"):
+                # comma separated pairs of tokens and names, the first preceded by the command itself
+                group = []
+                for token in statement + [("symbol", ",")]:
+                    if token == ("symbol", ","):
+                        pair = nexus_words(group)
+                        if not translation:
+                            pair = pair[1:]
+                        if len(pair) != 2:
+                            raise ValueError("Invalid translation table in NEXUS file")
+                        translation[pair[0]] = pair[1]
+                        group = []
+                    else:
+                        group.append(token)
+            elif in_trees_block and (command in ("TREE", "UTREE")):
+                # the tree itself follows the equal sign after the tree name
+                start = 0
+                while (start < len(statement)) and not ((statement[start][0] == "label") and
+                                                        statement[start][1].endswith("=")):
+                    start += 1
+                if start == len(statement):
+                    raise ValueError("Invalid tree command in NEXUS file")
+                root = build_newick_tree(statement[start+1:])
+                if translation:
+                    names = root.tree.names
+                    for i in root.tree.tips(root.index):
+                        names[i] = translation.get(names[i], names[i])
+                yield root
+            statement = []
+    if statement and not nexus:  # allow a missing semicolon at the end of a Newick file
+        yield build_newick_tree(statement)
 
 
 def read_newick_tree(tree_str) -> Node:
     """
     Translate a string representing a tree in Newick format into the internal tree structure and return the
-    node representing the root.
+    node representing the root. If the string contains more than one tree, only the first is returned.
     """
-    symbols = "(),;"
-    i = 0
-    current_node = Node()
-    while tree_str[i] != ";":
-        if tree_str[i] == "(":
-            new_node = Node()
-            current_node.add_child(new_node)
-            current_node = new_node
-        elif tree_str[i] == ",":
-            current_node = current_node.ancestor
-            new_node = Node()
-            current_node.add_child(new_node)
-            current_node = new_node
-        elif tree_str[i] == ")":
-            if current_node.ancestor is not None:
-                current_node = current_node.ancestor
-        else:  # must be a name and/or a branch length
-            j = i
-            while not tree_str[j] in symbols:
-                j += 1
-            sub_str = tree_str[i:j]
-            if ":" not in sub_str:  # just a name
-                current_node.name = sub_str
-            elif sub_str[0] == ":":  # just a branch length
-                bl = eval(sub_str[1:].strip())
-                current_node.branch_length = bl
-            else:  # a name and branch length combined
-                new_name, new_bl = sub_str.split(":")
-                current_node.name = new_name.strip()
-                current_node.branch_length = eval(new_bl.strip())
-            i = j - 1
-        i += 1
-    root_node = current_node.root()
-    return root_node
+    root = next(read_trees(io.StringIO(tree_str)), None)
+    if root is None:
+        raise ValueError("No tree found")
+    return root
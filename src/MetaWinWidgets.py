@@ -6,7 +6,7 @@ from typing import Optional
 
 from PyQt6.QtWidgets import QPushButton, QVBoxLayout, QHBoxLayout, QListWidget, QAbstractItemView, QListWidgetItem, \
     QLabel, QComboBox, QCheckBox, QGroupBox, QGridLayout, QLineEdit, QColorDialog, QProgressDialog
-from PyQt6.QtGui import QIcon, QColor, QDoubleValidator
+from PyQt6.QtGui import QIcon, QColor, QDoubleValidator, QIntValidator
 from PyQt6 import QtCore
 
 import MetaWinConstants
@@ -186,6 +186,27 @@ def add_effect_choice_to_dialog(sender, data, last_effect: Optional = None, last
     return effect_size_label, variance_label
 
 
+def add_seed_choice_to_dialog(sender, layout) -> None:
+    """
+    Add a label and box to the layout for entering an optional seed for the random number generator used by
+    resampling procedures, so that the results can be reproduced exactly
+    """
+    sender.seed_label = QLabel(get_text("Random Number Seed (optional)"))
+    layout.addWidget(sender.seed_label)
+    sender.seed_box = QLineEdit()
+    sender.seed_box.setValidator(QIntValidator(0, 2147483647))
+    layout.addWidget(sender.seed_box)
+
+
+def seed_from_dialog(sender) -> Optional[int]:
+    """
+    Return the random number seed entered in the dialog, or None if it was left blank
+    """
+    if sender.seed_box.text() == "":
+        return None
+    return int(sender.seed_box.text())
+
+
 def add_figure_edit_panel(sender):
     edit_groupbox = FigureEditPanel()
     edit_groupbox.data = sender
@@ -11,7 +11,11 @@ whether figures are displayed or not across tests is controlled by the global bo
 """
 
 
+import functools
+import gc
+import io
 import math
+import time
 from typing import Tuple
 
 from PyQt6.QtWidgets import QDialog, QVBoxLayout, QFrame, QPushButton, QTextEdit
@@ -32,10 +36,16 @@ from MetaWinEffects import EffectSizeOptions, do_effect_calculations
 from MetaWinData import MetaWinData
 import MetaWinEffectFunctions
 import MetaWinAnalysis
+import MetaWinAnalysisFunctions
+import MetaWinPhylogenetics
 import MetaWinPubBias
+import MetaWinResampling
+import MetaWinResamplingTasks
 import MetaWinTree
+from MetaWinLanguage import get_text
 import MetaWinDraw
 import MetaWinUtils
+import MetaWinConstants
 
 
 TEST_FIGURES = True
@@ -146,7 +156,176 @@ def test_data_import() -> None:
             assert data.value(r, c).value == answer[r][c]
 
 
-def calc_hedges_d() -> Tuple[MetaWinData, list]:
+def test_data_storage() -> None:
+    data = MetaWinData()
+    data.add_col("numbers")
+    data.add_col("text")
+    for r in range(40):  # enough rows to force the column arrays to grow
+        data.add_row()
+        data.add_value(r, 0, r + 0.5)
+        data.add_value(r, 1, str(r))
+    data.replace_value(3, 0, "not a number")
+    data.replace_value(4, 0, 7)
+    data.delete_value(5, 0)
+
+    assert data.value(2, 0).value == 2.5
+    assert data.check_value(3, 0) is None
+    assert data.check_value(3, 0, MetaWinConstants.VALUE_STRING) == "not a number"
+    assert isinstance(data.value(4, 0).value, int)
+    assert data.value(5, 0) is None
+    assert data.check_value(-1, 0) == 39.5
+    # strings which can be read as numbers are valid numbers, but retain their original form
+    assert data.check_value(6, 1) == "6"
+
+    values, valid = data.cols[0].numeric_values()
+    assert len(values) == 40
+    assert not valid[3] and not valid[5] and valid[4]
+    assert values[4] == 7
+
+    # views write back into the column storage
+    view = data.value(8, 1)
+    view.value = 8
+    assert data.value(8, 1).value == 8
+    assert len(data.cols[0].values) == 39
+    assert len(data.rows[5].values) == 1
+
+
+def test_data_positions() -> None:
+    data = MetaWinData()
+    for c in range(3):
+        data.add_col()
+    for r in range(5):
+        data.add_row()
+        for c in range(3):
+            data.add_value(r, c, 10*r + c)
+    data.delete_row(1)
+    data.delete_col(0)
+    data.reorder_rows([3, 2, 1, 0])
+    assert [row.label for row in data.rows] == ["Row 5", "Row 4", "Row 3", "Row 1"]
+    assert [col.label for col in data.cols] == ["Column 2", "Column 3"]
+    for r, row in enumerate(data.rows):
+        assert row.position() == r
+    for c, col in enumerate(data.cols):
+        assert col.position() == c
+    assert data.value(0, 0).value == 41
+    assert data.value(3, 1).value == 2
+    data.reorder_cols([1, 0])
+    assert data.cols[0].position() == 0
+    assert data.value(0, 0).value == 42
+
+
+def test_data_filter_mask() -> None:
+    data = MetaWinData()
+    data.add_col()
+    data.add_col()
+    for r, g in enumerate(["a", "b", None, "a", "c"]):
+        data.add_row()
+        if g is not None:
+            data.add_value(r, 0, g)
+        data.add_value(r, 1, r)
+    assert list(data.filter_mask()) == [True, True, True, True, True]
+    data.cols[0].group_filter = ["a"]
+    assert list(data.filter_mask()) == [False, True, True, False, True]
+    data.rows[1].include_row = False
+    assert list(data.filter_mask()) == [False, False, True, False, True]
+    assert [row.not_filtered() for row in data.rows] == [False, False, True, False, True]
+    data.cols[0].group_filter = [f"[{get_text("blanks")}]"]
+    assert list(data.filter_mask()) == [True, False, False, True, True]
+    data.replace_value(2, 0, "c")
+    assert list(data.filter_mask()) == [True, False, True, True, True]
+    data.delete_row(0)
+    assert list(data.filter_mask()) == [False, True, True, True]
+    data.rows[0].include_row = True
+    data.cols[0].group_filter = []
+    assert all(data.filter_mask())
+    assert not data.filter_mask().flags.writeable
+
+
+def test_data_preparation_scaling() -> None:
+    """
+    data preparation should scale linearly with the number of rows; with linear position lookups the
+    200-fold increase in rows took roughly 40,000 times longer
+    """
+    def best_time(func, repeats: int = 5) -> float:
+        # the fastest of several runs, with garbage collection paused, so the small case is not swamped by noise
+        elapsed = []
+        gc.disable()
+        try:
+            for _ in range(repeats):
+                start = time.perf_counter()
+                func()
+                elapsed.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+        return min(elapsed)
+
+    def look_up_positions(data) -> None:
+        # the position of every row, and of every value from its row and column
+        for row in data.rows:
+            row.position()
+        for value in data.cols[0].values:
+            value.position()
+
+    rng = numpy.random.default_rng(1)
+    times = []
+    for n in (1000, 200000):
+        data = MetaWinData()
+        data.add_col("e")
+        data.add_col("v")
+        for r, (e, v) in enumerate(zip(rng.normal(size=n), rng.uniform(0.1, 1, size=n))):
+            data.add_row()
+            data.add_value(r, 0, float(e))
+            data.add_value(r, 1, float(v))
+        extracted = MetaWinAnalysisFunctions.extract_analysis_data(data, data.cols[0], data.cols[1])
+        assert len(extracted.e) == n
+        # the extraction itself is timed, rather than the cached result
+        times.append((best_time(lambda: look_up_positions(data)),
+                      best_time(lambda: MetaWinAnalysisFunctions._extract_analysis_data(data, data.cols[0],
+                                                                                         data.cols[1], (), (), None,
+                                                                                         None, None, None))))
+    for small, large in zip(*times):
+        assert large / small < 400
+
+
+def test_extract_analysis_data() -> None:
+    data, _ = calc_hedges_d()
+    data.rows[0].include_row = False
+    effect_col = data.cols[10]
+    var_col = data.cols[11]
+    group_col = data.cols[1]
+    extracted = MetaWinAnalysisFunctions.extract_analysis_data(data, effect_col, var_col, string_cols=(group_col,))
+    e_data = []
+    v_data = []
+    group_data = []
+    bad_data = []
+    for r, row in enumerate(data.rows[1:], 1):
+        e = data.check_value(r, 10)
+        v = data.check_value(r, 11)
+        g = data.check_value(r, 1, value_type=MetaWinConstants.VALUE_STRING)
+        if (e is not None) and (v is not None) and (v > 0) and (g is not None):
+            e_data.append(e)
+            v_data.append(v)
+            group_data.append(g)
+        else:
+            bad_data.append(row.label)
+    assert numpy.array_equal(extracted.e, e_data)
+    assert numpy.array_equal(extracted.w, numpy.reciprocal(v_data))
+    assert numpy.array_equal(extracted.boot, numpy.column_stack((e_data, v_data)))
+    assert list(extracted.strings[:, 0]) == group_data
+    assert extracted.filtered == (data.rows[0].label,)
+    assert list(extracted.bad_data) == bad_data
+    assert not extracted.e.flags.writeable
+
+    # repeated extraction is served from the cache until the data change
+    assert MetaWinAnalysisFunctions.extract_analysis_data(data, effect_col, var_col,
+                                                          string_cols=(group_col,)) is extracted
+    data.replace_value(1, 11, -1.0)
+    new_extracted = MetaWinAnalysisFunctions.extract_analysis_data(data, effect_col, var_col, string_cols=(group_col,))
+    assert new_extracted is not extracted
+    assert len(new_extracted.e) == len(e_data) - 1
+
+
+def calc_hedges_d()-> Tuple[MetaWinData, list]:
     data, _ = import_test_data("gur_hed.txt")
     options = EffectSizeOptions()
     options.effect_size = MetaWinEffectFunctions.hedges_d_function()
@@ -507,6 +686,185 @@ def test_simple_meta_analysis_bootstrap():
         test_win.exec()
 
 
+def test_bootstrap_means_matches_replicate_loop():
+    """
+    the batched bootstrap must reproduce drawing and averaging each replicate separately
+    """
+    rng = numpy.random.default_rng(7)
+    boot_data = numpy.column_stack((rng.normal(size=57), rng.uniform(0.1, 2, size=57)))
+    obs_mean, *_ = MetaWinAnalysisFunctions.mean_effect_var_and_q(boot_data[:, 0], 1/boot_data[:, 1])
+    for random_effects in (False, True):
+        pooled_var = 0.3
+        replicate_rng = numpy.random.default_rng(11)
+        expected = []
+        for i in range(999):
+            tmp_data = replicate_rng.choice(boot_data, len(boot_data))
+            if random_effects:
+                tmp_w = numpy.reciprocal(tmp_data[:, 1] + pooled_var)
+            else:
+                tmp_w = numpy.reciprocal(tmp_data[:, 1])
+            tmp_mean, *_ = MetaWinAnalysisFunctions.mean_effect_var_and_q(tmp_data[:, 0], tmp_w)
+            expected.append(tmp_mean)
+        means = MetaWinResamplingTasks.bootstrap_replicate_means(numpy.random.default_rng(11), 999, boot_data,
+                                                                 pooled_var, random_effects)
+        assert numpy.array_equal(means, expected)
+        replicates = MetaWinResampling.run_replicates(MetaWinResamplingTasks.bootstrap_replicate_means, 999,
+                                                      (boot_data, pooled_var, random_effects), 11)
+        results = MetaWinAnalysisFunctions.bootstrap_means(999, boot_data, obs_mean, pooled_var, random_effects,
+                                                           seed=11)
+        assert numpy.array_equal(results[4], sorted(list(replicates) + [obs_mean]))
+        assert results[0] == results[4][25]
+        assert results[1] == results[4][974]
+
+
+def test_grouped_randomization_matches_replicate_loop():
+    """
+    the bincount-based grouped randomization must match permuting and summing each replicate separately
+    """
+    rng = numpy.random.default_rng(5)
+    n = 83
+    e_data = rng.normal(size=n)
+    ws_data = rng.uniform(0.5, 10, size=n)
+    group_codes = rng.integers(0, 6, size=n)
+    qt = MetaWinAnalysisFunctions.mean_effect_var_and_q(e_data, ws_data)[2]
+    replicate_rng = numpy.random.default_rng(13)
+    expected = []
+    for rep in range(499):
+        rand_e_data = replicate_rng.permutation(e_data)
+        qe = 0
+        for group in range(6):
+            group_mask = group_codes == group
+            qe += MetaWinAnalysisFunctions.mean_effect_var_and_q(rand_e_data[group_mask], ws_data[group_mask])[2]
+        expected.append(qt - qe)
+    rand_qm = MetaWinResamplingTasks.grouped_randomization_qm(numpy.random.default_rng(13), 499, e_data, ws_data,
+                                                              group_codes, qt)
+    assert numpy.allclose(rand_qm, expected, rtol=1e-10, atol=1e-10)
+
+
+def test_regression_randomization_matches_replicate_loop():
+    """
+    the matrix-product regression randomization must match refitting the regression to each permutation separately
+    """
+    rng = numpy.random.default_rng(17)
+    n = 61
+    e_data = rng.normal(size=n)
+    ws_data = rng.uniform(0.5, 10, size=n)
+    x_data = rng.uniform(0, 20, size=n)
+    _, _, qt, sum_ws, _, sum_wse = MetaWinAnalysisFunctions.mean_effect_var_and_q(e_data, ws_data)
+    *_, sum_wx, sum_wx2 = MetaWinAnalysisFunctions.calculate_regression_ma_values(e_data, ws_data, x_data, sum_ws,
+                                                                                   sum_wse, qt)
+    replicate_rng = numpy.random.default_rng(19)
+    expected = []
+    for rep in range(499):
+        rand_e_data = replicate_rng.permutation(e_data)
+        _, _, rand_qt, _, _, rand_sum_wse = MetaWinAnalysisFunctions.mean_effect_var_and_q(rand_e_data, ws_data)
+        rand_qm, *_ = MetaWinAnalysisFunctions.calculate_regression_ma_values(rand_e_data, ws_data, x_data, sum_ws,
+                                                                              rand_sum_wse, rand_qt)
+        expected.append(rand_qm)
+    rand_qm = MetaWinResamplingTasks.regression_randomization_qm(numpy.random.default_rng(19), 499, e_data,
+                                                                 ws_data, x_data, sum_ws, sum_wx, sum_wx2)
+    assert numpy.allclose(rand_qm, expected, rtol=1e-10, atol=1e-10)
+
+
+def test_resampling_early_stop():
+    """
+    a randomization test whose outcome is settled by its first block of replicates should stop there, with the
+    same replicates whatever the number of workers
+    """
+    rng = numpy.random.default_rng(23)
+    n = 40
+    e_data = rng.normal(size=n)
+    ws_data = rng.uniform(0.5, 10, size=n)
+    x_data = rng.uniform(0, 20, size=n)
+    sum_ws = numpy.sum(ws_data)
+    sum_wx = numpy.sum(ws_data * x_data)
+    sum_wx2 = numpy.sum(ws_data * numpy.square(x_data))
+    args = (e_data, ws_data, x_data, sum_ws, sum_wx, sum_wx2)
+    nreps = 5*MetaWinResampling.REPLICATE_BLOCK_SIZE
+    full = MetaWinResampling.run_replicates(MetaWinResamplingTasks.regression_randomization_qm, nreps, args, 29,
+                                            n_workers=1)
+    # every permutation is at least as extreme as an observed Qm of zero, so the test is clearly non-significant
+    stop = functools.partial(MetaWinAnalysisFunctions.randomization_settled, qm=0, alpha=0.05)
+    # the work is overstated so that the replicates are still spread across two workers
+    for n_workers in (1, 2):
+        stopped = MetaWinResampling.run_replicates(MetaWinResamplingTasks.regression_randomization_qm, nreps, args,
+                                                   29, n_workers=n_workers, stop=stop,
+                                                   work=MetaWinResampling.PARALLEL_MIN_WORK)
+        assert len(stopped) == MetaWinResampling.REPLICATE_BLOCK_SIZE
+        assert numpy.array_equal(stopped, full[:len(stopped)])
+    # an observed Qm larger than any permutation cannot be settled while a whole block of replicates remains
+    stop = functools.partial(MetaWinAnalysisFunctions.randomization_settled, qm=numpy.inf, alpha=0.05)
+    stopped = MetaWinResampling.run_replicates(MetaWinResamplingTasks.regression_randomization_qm, nreps, args, 29,
+                                               n_workers=1, stop=stop)
+    assert numpy.array_equal(stopped, full)
+
+
+def test_weighted_glm_matches_weight_matrix():
+    """
+    the weight-vector GLM must give the same fit and pooled variance as the dense weight matrix version
+    """
+    rng = numpy.random.default_rng(31)
+    n = 73
+    e_data = rng.normal(size=n)
+    w_data = rng.uniform(0.5, 10, size=n)
+    x_data = numpy.column_stack((numpy.ones(n), rng.uniform(0, 20, size=n), rng.integers(0, 2, size=n)))
+    w_matrix = numpy.diag(w_data)
+    qm, qe, beta, sigma_b = MetaWinAnalysisFunctions.calculate_glm(e_data, x_data, w_matrix)
+    pooled_var = MetaWinAnalysisFunctions.pooled_var_glm(qe, n, w_matrix, x_data)
+    w_qm, w_qe, w_beta, w_sigma_b, hat_trace = MetaWinResamplingTasks.weighted_glm(e_data, x_data, w_data)
+    w_pooled_var = MetaWinAnalysisFunctions.pooled_var_weighted_glm(w_qe, n, w_data, x_data, hat_trace)
+    assert math.isclose(qm, w_qm, rel_tol=1e-10)
+    assert math.isclose(qe, w_qe, rel_tol=1e-10)
+    assert numpy.allclose(beta, w_beta, rtol=1e-10)
+    assert numpy.allclose(sigma_b, w_sigma_b, rtol=1e-10)
+    assert math.isclose(pooled_var, w_pooled_var, rel_tol=1e-10)
+
+
+def test_glm_randomization_matches_replicate_loop():
+    """
+    the projected GLM randomization must match refitting the model to each permutation separately
+    """
+    rng = numpy.random.default_rng(37)
+    n = 67
+    e_data = rng.normal(size=n)
+    ws_data = rng.uniform(0.5, 10, size=n)
+    x_data = numpy.column_stack((numpy.ones(n), rng.uniform(0, 20, size=n), rng.integers(0, 2, size=n),
+                                 rng.normal(size=n)))
+    replicate_rng = numpy.random.default_rng(41)
+    expected = []
+    for rep in range(499):
+        rand_qm, *_ = MetaWinResamplingTasks.weighted_glm(replicate_rng.permutation(e_data), x_data, ws_data)
+        expected.append(rand_qm)
+    projection = MetaWinResamplingTasks.glm_model_projection(x_data, ws_data)
+    rand_qm = MetaWinResamplingTasks.glm_randomization_qm(numpy.random.default_rng(41), 499, e_data, projection)
+    assert numpy.allclose(rand_qm, expected, rtol=1e-9, atol=1e-9)
+
+
+def test_resampling_independent_of_workers():
+    """
+    seeded resampling must give the same replicates regardless of the number of worker processes
+    """
+    rng = numpy.random.default_rng(3)
+    boot_data = numpy.column_stack((rng.normal(size=40), rng.uniform(0.1, 2, size=40)))
+    nreps = 2*MetaWinResampling.REPLICATE_BLOCK_SIZE + 499
+    serial = MetaWinResampling.run_replicates(MetaWinResamplingTasks.bootstrap_replicate_means, nreps,
+                                              (boot_data, 0), 2024, n_workers=1)
+    parallel = MetaWinResampling.run_replicates(MetaWinResamplingTasks.bootstrap_replicate_means, nreps,
+                                                (boot_data, 0), 2024, n_workers=2,
+                                                work=MetaWinResampling.PARALLEL_MIN_WORK)
+    assert len(serial) == nreps
+    assert numpy.array_equal(serial, parallel)
+    # too little work to be worth starting workers, so the replicates are run serially
+    MetaWinResampling.shutdown_pool()
+    small = MetaWinResampling.run_replicates(MetaWinResamplingTasks.bootstrap_replicate_means, nreps,
+                                             (boot_data, 0), 2024, n_workers=2)
+    assert MetaWinResampling.pool is None
+    assert numpy.array_equal(serial, small)
+    unseeded = MetaWinResampling.run_replicates(MetaWinResamplingTasks.bootstrap_replicate_means, nreps,
+                                                (boot_data, 0), n_workers=1)
+    assert not numpy.array_equal(serial, unseeded)
+
+
 def test_simple_meta_analysis_scaled_graph():
     data, _ = calc_hedges_d()
     options = MetaWinAnalysis.MetaAnalysisOptions()
@@ -881,6 +1239,39 @@ def test_cumulative_meta_analysis_bootstrap():
         test_win.exec()
 
 
+def test_cumulative_statistics():
+    """
+    the running sums and medians of the cumulative analysis must match analyzing each prefix of the studies
+    separately, for fixed and random effects, including equal weights where the median falls between two effects
+    """
+    rng = numpy.random.default_rng(19)
+    n = 120
+    for v_data in (rng.uniform(0.01, 1, size=n), numpy.full(n, 0.3)):
+        e_data = rng.normal(size=n) + 25
+        w_data = numpy.reciprocal(v_data)
+        for random_effects in (False, True):
+            for norm_ci in (True, False):
+                stats = MetaWinAnalysisFunctions.cumulative_statistics(e_data, w_data, v_data, random_effects, 0.05,
+                                                                       norm_ci)
+                for k, ns in enumerate(range(2, n + 1)):
+                    tmp_e, tmp_w, tmp_v = e_data[:ns], w_data[:ns], v_data[:ns]
+                    mean_e, var_e, qt, sum_w, sum_w2, _ = MetaWinAnalysisFunctions.mean_effect_var_and_q(tmp_e, tmp_w)
+                    pooled_var = MetaWinAnalysisFunctions.pooled_var_no_structure(qt, sum_w, sum_w2, ns - 1)
+                    if random_effects:
+                        mean_e, var_e, qt, *_ = MetaWinAnalysisFunctions.mean_effect_var_and_q(tmp_e, 1/(tmp_v +
+                                                                                                       pooled_var))
+                    if norm_ci:
+                        interval = scipy.stats.norm.interval(0.95, loc=mean_e, scale=math.sqrt(var_e))
+                    else:
+                        interval = scipy.stats.t.interval(0.95, df=ns - 1, loc=mean_e, scale=math.sqrt(var_e))
+                    expected = (mean_e, var_e, qt, pooled_var, MetaWinAnalysisFunctions.median_effect(tmp_e, tmp_w),
+                                numpy.mean(tmp_v)) + tuple(interval)
+                    assert numpy.allclose([value[k] for value in stats], expected, rtol=1e-9, atol=1e-12)
+    e_data = rng.normal(size=n)
+    assert numpy.allclose(MetaWinAnalysisFunctions.running_weighted_medians(e_data, numpy.ones(n)),
+                          [numpy.median(e_data[:k]) for k in range(1, n + 1)])
+
+
 def test_regression_meta_analysis_lep():
     # answers from Chapter 9, Handbook of Meta-Analysis in Ecology and Evolution
     model_q_answer = 9.4576
@@ -1253,6 +1644,94 @@ def test_nested_meta_analysis_lep():
     assert round(global_values.p, 5) == round(total_p_answer, 5)
 
 
+def test_nested_heterogeneity():
+    """
+    the factorized hierarchy must identify groups by their full path, even when names are reused under different
+    higher-level groups, and the partition of the heterogeneity must match calculating each group separately
+    """
+    rng = numpy.random.default_rng(21)
+    n = 240
+    group_data = numpy.column_stack([rng.choice(["A", "B", "C"], size=n), rng.choice(["x", "y"], size=n),
+                                     rng.choice(["1", "2", "3", "4"], size=n)]).astype(object)
+    e_data = rng.normal(size=n)
+    w_data = rng.uniform(0.5, 10, size=n)
+    hierarchy = MetaWinAnalysisFunctions.nested_hierarchy(group_data)
+    paths = [sorted(set(tuple(row[:k+1]) for row in group_data)) for k in range(3)]
+    assert [len(names) for names in hierarchy.names] == [len(p) for p in paths]
+    for k in range(3):
+        for g, path in enumerate(paths[k]):
+            rows = [r for r in range(n) if tuple(group_data[r, :k+1]) == path]
+            assert hierarchy.names[k][g] == path[-1]
+            assert numpy.array_equal(numpy.flatnonzero(hierarchy.codes[k] == g), rows)
+            if k > 0:
+                assert paths[k-1][hierarchy.parents[k][g]] == path[:-1]
+
+    mean_e, _, qt, _, _, _ = MetaWinAnalysisFunctions.mean_effect_var_and_q(e_data, w_data)
+    qm, qe = MetaWinAnalysisFunctions.nested_heterogeneity(e_data, w_data, hierarchy, mean_e)
+    expected_qe = 0
+    for path in paths[-1]:
+        group_mask = numpy.array([tuple(row) == path for row in group_data])
+        expected_qe += MetaWinAnalysisFunctions.mean_effect_var_and_q(e_data[group_mask], w_data[group_mask])[2]
+    assert math.isclose(qe, expected_qe, rel_tol=1e-10)
+    assert math.isclose(numpy.sum(qm) + qe, qt, rel_tol=1e-10)
+
+    top_level = MetaWinAnalysisFunctions.nested_groups(hierarchy)
+    assert [group.name for group in top_level] == ["A", "B", "C"]
+    assert sum(group.nested_count() for group in top_level) == sum(len(p) for p in paths)
+    for group in top_level:
+        for child in group.children:
+            assert child.parent is group
+            assert set(child.includes_rows) <= set(group.includes_rows)
+
+
+def test_nested_randomization():
+    """
+    the block-wise nested randomization must match permuting and partitioning each replicate separately, and
+    restricted permutations must only exchange effects within the groups of the level above
+    """
+    rng = numpy.random.default_rng(8)
+    n = 150
+    group_data = numpy.column_stack([rng.choice(["A", "B", "C"], size=n), rng.choice(["x", "y", "z"], size=n),
+                                     rng.choice(["1", "2"], size=n)]).astype(object)
+    e_data = rng.normal(size=n)
+    w_data = rng.uniform(0.5, 10, size=n)
+    hierarchy = MetaWinAnalysisFunctions.nested_hierarchy(group_data)
+    mean_e = MetaWinAnalysisFunctions.mean_effect_var_and_q(e_data, w_data)[0]
+    replicate_rng = numpy.random.default_rng(3)
+    expected = [MetaWinAnalysisFunctions.nested_heterogeneity(replicate_rng.permutation(e_data), w_data, hierarchy,
+                                                              mean_e)[0] for _ in range(299)]
+    rand_qm = MetaWinResamplingTasks.nested_randomization_qm(numpy.random.default_rng(3), 299, e_data, w_data,
+                                                             hierarchy, mean_e)
+    assert numpy.allclose(rand_qm, expected, rtol=1e-10, atol=1e-10)
+
+    for k in range(3):
+        for _, _, rand_e_data in MetaWinResamplingTasks.restricted_permuted_effects(rng, 50, e_data,
+                                                                                    hierarchy.codes[k]):
+            for g in range(len(hierarchy.names[k])):
+                group_mask = hierarchy.codes[k] == g
+                assert numpy.array_equal(numpy.sort(rand_e_data[:, group_mask], axis=1),
+                                         numpy.tile(numpy.sort(e_data[group_mask]), (50, 1)))
+            assert not numpy.array_equal(rand_e_data[0], e_data)
+    restricted_qm = MetaWinResamplingTasks.nested_randomization_qm(numpy.random.default_rng(3), 299, e_data,
+                                                                   w_data, hierarchy, mean_e, restricted=True)
+    # the top level is permuted freely either way
+    assert numpy.allclose(restricted_qm[:, 0], rand_qm[:, 0], rtol=1e-10)
+
+    data, _ = import_test_data("lepidoptera.txt")
+    options = MetaWinAnalysis.MetaAnalysisOptions()
+    options.structure = MetaWinAnalysis.NESTED_MA
+    options.effect_data = data.cols[4]
+    options.effect_vars = data.cols[5]
+    options.nested_vars = [data.cols[1], data.cols[2]]
+    options.randomize_model = 999
+    options.randomize_restricted = True
+    options.random_seed = 31
+    data.cols[2].group_filter = ["Yponomeutidae", "Lycaenidae", "Hesperiidae"]
+    output, _, analysis_values = MetaWinAnalysis.do_meta_analysis(data, options, 4)
+    print_test_output(output)
+    assert all(m.p_rand != "" for m in analysis_values.model_het_values)
+
+
 def test_tree_import():
     n_answer = 66
     names_answer = ["Megaptera",
@@ -1518,6 +1997,203 @@ def test_tree_functions():
     assert tip3 is None
 
 
+def test_pectinate_tree():
+    """
+    trees far deeper than the recursion limit must be read, traversed, and written without recursion
+    """
+    n = 5000
+    newick_str = "("*(n-1) + "t0:1" + "".join(",t{}:1):1".format(i) for i in range(1, n)) + ";"
+    tree = MetaWinTree.read_newick_tree(newick_str)
+    assert tree.n_tips() == n
+    assert tree.tip_names() == ["t{}".format(i) for i in range(n)]
+    assert tree.max_node_tip_length() == n
+    assert tree.output_newick("0.0f") == newick_str
+    tip = tree.find_tip_by_name("t0")
+    assert tip.distance_to_ancestor(tree) == n - 1
+    assert tip.common_ancestor(tree.find_tip_by_name("t1")) == tip.ancestor
+    assert tree.is_descendant(tip)
+
+
+def test_read_trees():
+    """
+    the streaming parser must read quoted labels, comments, scientific notation, and internal labels, and return
+    each of the trees in multi-tree Newick and NEXUS files in turn, regardless of where the stream is split
+    """
+    with open("mammal_tree.txt", "r") as infile:
+        newick_str = infile.readline()
+    tree = MetaWinTree.read_newick_tree(newick_str)
+    trees = list(MetaWinTree.read_trees(io.StringIO(newick_str + "\n" + newick_str)))
+    assert len(trees) == 2
+    for t in trees:
+        assert t.output_newick() == tree.output_newick()
+
+    newick_str = "(('Homo sapiens'[human]:1.5e-1,'it''s':0.15)Hominini:2E0,\"Gorilla g\":2.15) root;"
+    assert (list(MetaWinTree.newick_tokens(io.StringIO(newick_str), 3)) ==
+            list(MetaWinTree.newick_tokens(io.StringIO(newick_str))))
+    tree = MetaWinTree.read_newick_tree(newick_str)
+    assert tree.tip_names() == ["Homo sapiens", "it's", "Gorilla g"]
+    # an unquoted label of several words must not be split where it crosses from one chunk into the next
+    newick_str = "(Pan:1,Homo sapiens:1);"
+    for chunk_size in range(1, len(newick_str) + 1):
+        tokens = list(MetaWinTree.newick_tokens(io.StringIO(newick_str), chunk_size))
+        assert [text for kind, text in tokens if kind == "label"] == ["Pan", "1", "Homo sapiens", "1"]
+    assert tree.name == "root"
+    assert tree.descendants[0].name == "Hominini"
+    assert tree.output_newick("0.2f") == "((Homo sapiens:0.15,it's:0.15):2.00,Gorilla g:2.15):1.00;"
+
+    nexus_str = """#NEXUS
+    [a comment]
+    BEGIN TAXA; DIMENSIONS NTAX=3; TAXLABELS A B C; END;
+    Begin Trees;
+        Translate 1 'Homo sapiens', 2 Pan, 3 Gorilla;
+        tree STATE_0 = [&R] ((1:0.15,2:0.15):2,3:2.15);
+        TREE 'second tree' = ((1,3),2);
+    End;"""
+    trees = list(MetaWinTree.read_trees(io.StringIO(nexus_str)))
+    assert len(trees) == 2
+    assert trees[0].tip_names() == ["Homo sapiens", "Pan", "Gorilla"]
+    assert trees[1].output_newick("") == "((Homo sapiens,Gorilla),Pan);"
+
+    for bad_str in ["((A,B);", "(A,B));", "(A:,B);", "(A,'B);"]:
+        try:
+            MetaWinTree.read_newick_tree(bad_str)
+            assert False
+        except ValueError:
+            pass
+
+
+def test_tree_common_ancestor_index():
+    """
+    the Euler tour common ancestors and patristic distances must match climbing the tree for every pair of nodes
+    """
+    with open("mammal_tree.txt", "r") as infile:
+        newick_str = infile.readline()
+    tree = MetaWinTree.read_newick_tree(newick_str).tree
+    n = len(tree)
+    a, b = numpy.divmod(numpy.arange(n*n), n)
+    common_ancestors = tree.common_ancestors(a, b)
+    distances = tree.tip_distances(a, b)
+    for x, y, anc, dist in zip(a, b, common_ancestors, distances):
+        ancestors = []
+        node = x
+        while node >= 0:
+            ancestors.append(node)
+            node = tree.parent[node]
+        node = y
+        while node not in ancestors:
+            node = tree.parent[node]
+        assert anc == node
+        assert math.isclose(dist, tree.distance_to_ancestor(x, anc) + tree.distance_to_ancestor(y, anc),
+                            abs_tol=1e-9)
+    shared = tree.shared_path_lengths(a, b)
+    assert numpy.allclose(shared, tree.depths()[common_ancestors])
+
+
+def test_phylogenetic_correlation():
+    """
+    the single-pass correlation matrix must match comparing every pair of tips on the tree, including tips
+    repeated by more than one study
+    """
+    with open("mammal_tree.txt", "r") as infile:
+        newick_str = infile.readline()
+    tree = MetaWinTree.read_newick_tree(newick_str)
+    all_tips = tree.tip_names()
+    tip_names = all_tips[3:17] + all_tips[5:8]
+    n = len(tip_names)
+    tips = [tree.find_tip_by_name(name) for name in tip_names]
+    mrca = tips[0]
+    for tip in tips[1:]:
+        mrca = tip.common_ancestor(mrca)
+    max_depth = mrca.max_node_tip_length()
+    expected = numpy.identity(n)
+    for i in range(n):
+        for j in range(i):
+            expected[i, j] = tips[i].common_ancestor(tips[j]).distance_to_ancestor(mrca) / max_depth
+            expected[j, i] = expected[i, j]
+    assert numpy.array_equal(MetaWinPhylogenetics.phylogenetic_correlation(tip_names, tree), expected)
+
+
+def test_phylogenetic_correlation_cache():
+    """
+    cached correlation matrices, and those sliced from a cached superset of the tips, must match calculating the
+    matrix anew, and the cache must be discarded when the tree changes
+    """
+    with open("mammal_tree.txt", "r") as infile:
+        newick_str = infile.readline()
+    tree = MetaWinTree.read_newick_tree(newick_str)
+    all_tips = tree.tip_names()
+    tip_names = all_tips[3:17] + all_tips[5:8]
+    subset_names = tip_names[:1] + tip_names[4:]
+    MetaWinPhylogenetics.clear_phylogenetic_cache()
+    subset_p = MetaWinPhylogenetics.phylogenetic_correlation(subset_names, tree)
+    MetaWinPhylogenetics.clear_phylogenetic_cache()
+    p = MetaWinPhylogenetics.phylogenetic_correlation(tip_names, tree)
+    assert MetaWinPhylogenetics.phylogenetic_correlation(tip_names, tree) is p
+    sliced_p = MetaWinPhylogenetics.phylogenetic_correlation(subset_names, tree)
+    assert numpy.array_equal(sliced_p, subset_p)
+    assert len(MetaWinPhylogenetics.phylogenetic_correlation_cache) == 2
+
+    # a tip repeated more times than in the cached matrix cannot be sliced from it
+    repeated_names = tip_names + tip_names[:1]
+    repeated_p = MetaWinPhylogenetics.phylogenetic_correlation(repeated_names, tree)
+    assert numpy.array_equal(repeated_p[:-1, :-1], p)
+
+    # modifying the tree must invalidate the cached matrices
+    tree.tree.branch_lengths[tree.find_tip_by_name(tip_names[0]).index] = 100
+    tree.tree.modified()
+    new_p = MetaWinPhylogenetics.phylogenetic_correlation(tip_names, tree)
+    assert not numpy.array_equal(new_p, p)
+
+    # the least recently used matrices are discarded to keep within the memory limit
+    limit = MetaWinPhylogenetics.PHYLOGENETIC_CACHE_BYTES
+    MetaWinPhylogenetics.PHYLOGENETIC_CACHE_BYTES = new_p.nbytes + p.nbytes
+    MetaWinPhylogenetics.phylogenetic_correlation(all_tips[:10], tree)
+    assert MetaWinPhylogenetics.phylogenetic_correlation(tip_names, tree) is new_p
+    MetaWinPhylogenetics.PHYLOGENETIC_CACHE_BYTES = limit
+    assert sum(e.matrix.nbytes for e in MetaWinPhylogenetics.phylogenetic_correlation_cache.values()) <= \
+        new_p.nbytes + p.nbytes
+    MetaWinPhylogenetics.clear_phylogenetic_cache()
+
+
+def test_pruned_phylogeny():
+    """
+    the tree pruned to the tips of an analysis must give the same correlations as the full tree, including for
+    repeated tips, while keeping only the nodes connecting the tips
+    """
+    with open("mammal_tree.txt", "r") as infile:
+        newick_str = infile.readline()
+    tree = MetaWinTree.read_newick_tree(newick_str)
+    all_tips = tree.tip_names()
+    rng = numpy.random.default_rng(11)
+    MetaWinPhylogenetics.clear_phylogenetic_cache()
+    for _ in range(20):
+        tip_names = list(rng.choice(all_tips, size=rng.integers(2, 40), replace=False))
+        tip_names += tip_names[:rng.integers(0, 4)]
+        pruned = MetaWinPhylogenetics.pruned_phylogeny(tip_names, tree)
+        assert numpy.allclose(MetaWinPhylogenetics.phylogenetic_correlation(tip_names, pruned),
+                              MetaWinPhylogenetics.phylogenetic_correlation(tip_names, tree), rtol=1e-12)
+        assert set(tip_names) <= set(pruned.tip_names())
+        # apart from the ancestors of the tips, no node is left with a single descendant
+        tip_ancestors = {pruned.tree.parent[tip] for tip in pruned.tree.tips()}
+        assert all(len(pruned.tree.children(i)) != 1 for i in range(len(pruned.tree)) if i not in tip_ancestors)
+
+    # the pruned tree is reused for a subset of the tips with the same common ancestor
+    tip_names = all_tips[3:17]
+    pruned = MetaWinPhylogenetics.pruned_phylogeny(tip_names, tree)
+    assert MetaWinPhylogenetics.pruned_phylogeny(tip_names[:1] + tip_names[4:], tree) is pruned
+    assert len(MetaWinPhylogenetics.pruned_tree_cache) <= MetaWinPhylogenetics.PRUNED_TREE_CACHE_SIZE
+    tree.tree.modified()
+    assert MetaWinPhylogenetics.pruned_phylogeny(tip_names, tree) is not pruned
+    MetaWinPhylogenetics.clear_phylogenetic_cache()
+    assert len(MetaWinPhylogenetics.pruned_tree_cache) == 0
+
+    # nodes with a single descendant are collapsed into it, adding their branch lengths
+    root = MetaWinTree.read_newick_tree("((A:1,(B:2,C:1):1):1,(D:1,E:1):2);")
+    a, b, d = (root.tree.find_by_name(0, name) for name in ("A", "B", "D"))
+    subtree = root.tree.induced_subtree([a, b, d], 0)
+    assert subtree.newick(0, "0.0f") == "((A:1,B:3):1,D:3):1"
+
+
 def test_jackknife():
     data, _ = import_test_data("lepidoptera.txt")
     options = MetaWinAnalysis.MetaAnalysisOptions()
@@ -1534,6 +2210,183 @@ def test_jackknife():
         test_win.exec()
 
 
+
+def test_jackknife_statistics():
+    """
+    the leave-one-out sums and medians of the jackknife analysis must match analyzing the studies with each one left
+    out separately, for fixed and random effects, including equal weights where the median falls between two effects
+    """
+    rng = numpy.random.default_rng(23)
+    n = 121
+    for v_data in (rng.uniform(0.01, 1, size=n), numpy.full(n, 0.3)):
+        e_data = rng.normal(size=n) + 25
+        w_data = numpy.reciprocal(v_data)
+        for random_effects in (False, True):
+            for norm_ci in (True, False):
+                stats = MetaWinAnalysisFunctions.jackknife_statistics(e_data, w_data, v_data, random_effects, 0.05,
+                                                                      norm_ci)
+                for j in range(n):
+                    tmp_e, tmp_w, tmp_v = (numpy.delete(x, j) for x in (e_data, w_data, v_data))
+                    mean_e, var_e, qt, sum_w, sum_w2, _ = MetaWinAnalysisFunctions.mean_effect_var_and_q(tmp_e, tmp_w)
+                    pooled_var = MetaWinAnalysisFunctions.pooled_var_no_structure(qt, sum_w, sum_w2, n - 2)
+                    median_e = MetaWinAnalysisFunctions.median_effect(tmp_e, tmp_w)
+                    if random_effects:
+                        ws_data = 1/(tmp_v + pooled_var)
+                        mean_e, var_e, qt, *_ = MetaWinAnalysisFunctions.mean_effect_var_and_q(tmp_e, ws_data)
+                        median_e = MetaWinAnalysisFunctions.median_effect(tmp_e, ws_data)
+                    if norm_ci:
+                        interval = scipy.stats.norm.interval(0.95, loc=mean_e, scale=math.sqrt(var_e))
+                    else:
+                        interval = scipy.stats.t.interval(0.95, df=n - 2, loc=mean_e, scale=math.sqrt(var_e))
+                    expected = (mean_e, var_e, qt, pooled_var, median_e, numpy.mean(tmp_v)) + tuple(interval)
+                    assert numpy.allclose([value[j] for value in stats], expected, rtol=1e-9, atol=1e-12)
+    e_data = rng.normal(size=n - 1)
+    assert numpy.allclose(MetaWinAnalysisFunctions.leave_one_out_medians(e_data, numpy.ones(n - 1)),
+                          [numpy.median(numpy.delete(e_data, j)) for j in range(n - 1)])
+
+
+
+def test_deletion_statistics():
+    """
+    the sums and medians found by subtraction for deletions of several studies at once, whether groups of studies
+    or random subsets, must match analyzing the remaining studies separately, for fixed and random effects
+    """
+    rng = numpy.random.default_rng(29)
+    n = 90
+    group_codes = rng.integers(0, 12, size=n)
+    subsets = MetaWinResamplingTasks.leave_k_out_subsets(rng, 50, n, 7)
+    assert all(len(numpy.unique(subset)) == 7 for subset in subsets)
+    group_rows = numpy.argsort(group_codes, kind="stable")
+    deletions = [(group_rows, group_codes[group_rows], 12),
+                 (subsets.ravel(), numpy.repeat(numpy.arange(50), 7), 50)]
+    for v_data in (rng.uniform(0.01, 1, size=n), numpy.full(n, 0.3)):
+        e_data = rng.normal(size=n) + 25
+        w_data = numpy.reciprocal(v_data)
+        for deleted, deletion, n_deletions in deletions:
+            for random_effects in (False, True):
+                stats = MetaWinAnalysisFunctions.deletion_statistics(e_data, w_data, v_data, deleted, deletion,
+                                                                     n_deletions, random_effects, 0.05, False)
+                for j in range(n_deletions):
+                    tmp_e, tmp_w, tmp_v = (numpy.delete(x, deleted[deletion == j]) for x in (e_data, w_data, v_data))
+                    ns = len(tmp_e)
+                    mean_e, var_e, qt, sum_w, sum_w2, _ = MetaWinAnalysisFunctions.mean_effect_var_and_q(tmp_e, tmp_w)
+                    pooled_var = MetaWinAnalysisFunctions.pooled_var_no_structure(qt, sum_w, sum_w2, ns - 1)
+                    median_e = MetaWinAnalysisFunctions.median_effect(tmp_e, tmp_w)
+                    if random_effects:
+                        ws_data = 1/(tmp_v + pooled_var)
+                        mean_e, var_e, qt, *_ = MetaWinAnalysisFunctions.mean_effect_var_and_q(tmp_e, ws_data)
+                        median_e = MetaWinAnalysisFunctions.median_effect(tmp_e, ws_data)
+                    interval = scipy.stats.t.interval(0.95, df=ns - 1, loc=mean_e, scale=math.sqrt(var_e))
+                    expected = (mean_e, var_e, qt, pooled_var, median_e, numpy.mean(tmp_v)) + tuple(interval)
+                    assert numpy.allclose([value[j] for value in stats], expected, rtol=1e-9, atol=1e-12)
+
+
+def test_jackknife_bootstrap():
+    data, _ = import_test_data("lepidoptera.txt")
+    options = MetaWinAnalysis.MetaAnalysisOptions()
+    options.structure = MetaWinAnalysis.JACKKNIFE
+    options.effect_data = data.cols[4]
+    options.effect_vars = data.cols[5]
+    options.random_effects = True
+    options.bootstrap_mean = 999
+    options.jackknife_bootstrap = True
+    options.random_seed = 11
+
+    output, chart_data, analysis_values = MetaWinAnalysis.do_meta_analysis(data, options, 4)
+    print_test_output(output)
+
+    # the deletions give the same replicates when the data are shared with worker processes
+    rng = numpy.random.default_rng(5)
+    boot_data = numpy.column_stack((rng.normal(size=30), rng.uniform(0.1, 2, size=30)))
+    deletions = [([j], 0.1*j, 100 + j) for j in range(4)]
+    serial = MetaWinResampling.run_tasks(MetaWinResamplingTasks.deletion_bootstrap_means, deletions, (999, True),
+                                         n_workers=1, shared=boot_data)
+    parallel = MetaWinResampling.run_tasks(MetaWinResamplingTasks.deletion_bootstrap_means, deletions, (999, True),
+                                           n_workers=2, shared=boot_data)
+    for j, (rows, pooled_var, seed) in enumerate(deletions):
+        expected = MetaWinResampling.run_replicates(MetaWinResamplingTasks.bootstrap_replicate_means, 999,
+                                                    (numpy.delete(boot_data, rows, axis=0), pooled_var, True), seed)
+        assert numpy.array_equal(serial[j], expected)
+        assert numpy.array_equal(parallel[j], expected)
+
+
+def test_jackknife_groups():
+    data, _ = import_test_data("lepidoptera.txt")
+    options = MetaWinAnalysis.MetaAnalysisOptions()
+    options.structure = MetaWinAnalysis.JACKKNIFE
+    options.effect_data = data.cols[4]
+    options.effect_vars = data.cols[5]
+    options.jackknife_groups = data.cols[1]
+    options.create_graph = True
+
+    output, chart_data, analysis_values = MetaWinAnalysis.do_meta_analysis(data, options, 4)
+    print_test_output(output)
+
+    if TEST_FIGURES:
+        test_win = TestFigureDialog(chart_data)
+        test_win.exec()
+
+
+def test_jackknife_leave_k_out():
+    data, _ = import_test_data("lepidoptera.txt")
+    options = MetaWinAnalysis.MetaAnalysisOptions()
+    options.structure = MetaWinAnalysis.JACKKNIFE
+    options.effect_data = data.cols[4]
+    options.effect_vars = data.cols[5]
+    options.random_effects = True
+    options.jackknife_k = 3
+    options.jackknife_samples = 999
+    options.random_seed = 7
+    options.create_graph = True
+
+    output, chart_data, analysis_values = MetaWinAnalysis.do_meta_analysis(data, options, 4)
+    print_test_output(output)
+
+    if TEST_FIGURES:
+        test_win = TestFigureDialog(chart_data)
+        test_win.exec()
+
+
+def test_gls_glm_matches_weight_matrix():
+    """
+    the Cholesky-based GLS fit must give the same fit and pooled variance as inverting the phylogenetic covariance
+    matrix, and a singular covariance matrix must be detected from the factorization
+    """
+    with open("mammal_tree.txt", "r") as infile:
+        newick_str = infile.readline()
+    tree = MetaWinTree.read_newick_tree(newick_str)
+    tip_names = tree.tip_names()[:40]
+    n = len(tip_names)
+    rng = numpy.random.default_rng(41)
+    e_data = rng.normal(size=n)
+    v_data = rng.uniform(0.1, 2, size=n)
+    x_data = numpy.column_stack((numpy.ones(n), rng.uniform(0, 20, size=n)))
+    p_matrix = MetaWinPhylogenetics.phylogenetic_correlation(tip_names, tree)
+    v_matrix = MetaWinPhylogenetics.phylogenetic_covariance(p_matrix, v_data)
+    for i in range(n):
+        for j in range(n):
+            if i == j:
+                assert v_matrix[i, j] == v_data[i]
+            else:
+                assert math.isclose(v_matrix[i, j], p_matrix[i, j]*math.sqrt(v_data[i])*math.sqrt(v_data[j]),
+                                    rel_tol=1e-12)
+    w_matrix = numpy.linalg.inv(v_matrix)
+    qm, qe, beta, sigma_b = MetaWinAnalysisFunctions.calculate_glm(e_data, x_data, w_matrix)
+    pooled_var = MetaWinAnalysisFunctions.pooled_var_glm(qe, n, w_matrix, x_data)
+    chol = MetaWinPhylogenetics.cholesky_factor(v_matrix)
+    c_qm, c_qe, c_beta, c_sigma_b, whitened_x = MetaWinPhylogenetics.gls_glm(e_data, x_data, chol)
+    c_pooled_var = MetaWinPhylogenetics.pooled_var_gls_glm(c_qe, n, x_data, chol, c_sigma_b, whitened_x)
+    assert math.isclose(qm, c_qm, rel_tol=1e-8)
+    assert math.isclose(qe, c_qe, rel_tol=1e-8)
+    assert numpy.allclose(beta, c_beta, rtol=1e-8)
+    assert numpy.allclose(sigma_b, c_sigma_b, rtol=1e-8)
+    assert math.isclose(pooled_var, c_pooled_var, rel_tol=1e-8)
+
+    # tips which are perfectly correlated make the covariance matrix singular
+    v_matrix = MetaWinPhylogenetics.phylogenetic_covariance(numpy.ones((n, n)), v_data)
+    assert MetaWinPhylogenetics.cholesky_factor(v_matrix) is None
+
+
 def test_phylogenetic_simple_test():
     """
     simple example from chapter 17 of Meta Analysis handbook    
@@ -1567,6 +2420,174 @@ def test_phylogenetic_simple_test():
     print_test_output(output)
 
 
+def test_phylogenetic_randomization_matches_refitting():
+    """
+    the batched randomization tests must match refitting the phylogenetic glm to each permutation separately,
+    whether the effects are permuted against the predictors or the studies are rearranged among the tips
+    """
+    with open("mammal_tree.txt", "r") as infile:
+        newick_str = infile.readline()
+    tree = MetaWinTree.read_newick_tree(newick_str)
+    tip_names = tree.tip_names()[10:45]
+    n = len(tip_names)
+    rng = numpy.random.default_rng(43)
+    e_data = rng.normal(size=n)
+    v_data = rng.uniform(0.1, 2, size=n)
+    x_data = numpy.column_stack((numpy.ones(n), rng.uniform(0, 20, size=n), rng.integers(0, 2, size=n)))
+    p_matrix = MetaWinPhylogenetics.phylogenetic_correlation(tip_names, tree)
+    chol = MetaWinPhylogenetics.cholesky_factor(MetaWinPhylogenetics.phylogenetic_covariance(p_matrix,
+                                                                                             v_data))
+    chol_p = MetaWinPhylogenetics.cholesky_factor(numpy.array(p_matrix))
+    nreps = 50
+
+    wx = scipy.linalg.cho_solve((chol, True), x_data)
+    projection = MetaWinPhylogenetics.gls_model_projection(x_data, wx)
+    rand_qm = MetaWinResamplingTasks.glm_randomization_qm(numpy.random.default_rng(5), nreps, e_data, projection)
+    rand_qe = MetaWinPhylogenetics.phylogeny_randomization_qe(numpy.random.default_rng(5), nreps, e_data, x_data,
+                                                              v_data, chol_p)
+    rng = numpy.random.default_rng(5)
+    for rep in range(nreps):
+        order = rng.permutation(n)
+        qm, _, _, _, _ = MetaWinPhylogenetics.gls_glm(e_data[order], x_data, chol)
+        assert math.isclose(rand_qm[rep], qm, rel_tol=1e-8)
+        rearranged_chol = MetaWinPhylogenetics.cholesky_factor(
+            MetaWinPhylogenetics.phylogenetic_covariance(p_matrix, v_data[order]))
+        _, qe, _, _, _ = MetaWinPhylogenetics.gls_glm(e_data[order], x_data[order], rearranged_chol)
+        assert math.isclose(rand_qe[rep], qe, rel_tol=1e-8)
+
+
+def test_tree_gls_matches_dense_gls():
+    """
+    the linear-time study tree calculations must match those from the dense phylogenetic correlation matrix,
+    including studies which share a tip
+    """
+    with open("mammal_tree.txt", "r") as infile:
+        newick_str = infile.readline()
+    tree = MetaWinTree.read_newick_tree(newick_str)
+    all_tips = tree.tip_names()
+    tip_names = all_tips[5:50] + all_tips[20:24] + all_tips[20:21]
+    n = len(tip_names)
+    rng = numpy.random.default_rng(47)
+    e_data = rng.normal(size=n)
+    v_data = rng.uniform(0.1, 2, size=n)
+    x_data = numpy.column_stack((numpy.ones(n), rng.uniform(0, 20, size=n), rng.integers(0, 2, size=n)))
+    p_matrix = MetaWinPhylogenetics.phylogenetic_correlation(tip_names, tree)
+    structure = MetaWinPhylogenetics.study_tree(tip_names, tree)
+    p_inv = numpy.linalg.inv(p_matrix)
+    assert numpy.allclose(MetaWinPhylogenetics.study_tree_precision_product(structure, x_data),
+                          numpy.matmul(p_inv, x_data), rtol=1e-8, atol=1e-8)
+    assert numpy.allclose(MetaWinPhylogenetics.study_tree_precision_diagonal(structure), numpy.diagonal(p_inv),
+                          rtol=1e-8)
+
+    for random_effects in (False, True):
+        dense_fit = MetaWinPhylogenetics.phylogenetic_glm(e_data, x_data, v_data, p_matrix, random_effects)
+        tree_fit = MetaWinPhylogenetics.tree_phylogenetic_glm(e_data, x_data, v_data, structure, random_effects)
+        for dense_value, tree_value in zip(dense_fit, tree_fit):
+            assert numpy.allclose(dense_value, tree_value, rtol=1e-8, atol=1e-10)
+
+    orders = numpy.array([rng.permutation(n) for _ in range(5)])
+    chol_p = MetaWinPhylogenetics.cholesky_factor(numpy.array(p_matrix))
+    assert numpy.allclose(MetaWinPhylogenetics.phylogenetic_arrangement_qe(e_data, x_data, v_data, chol_p, orders),
+                          MetaWinPhylogenetics.phylogenetic_arrangement_qe(e_data, x_data, v_data, structure,
+                                                                           orders), rtol=1e-8)
+
+
+def test_phylogenetic_randomization():
+    data, _ = import_test_data("herbivore_data.txt")
+    with open("herbivore_tree.txt", "r") as infile:
+        newick_str = infile.read()
+    tree = MetaWinTree.read_newick_tree(newick_str)
+
+    options = MetaWinAnalysis.MetaAnalysisOptions()
+    options.structure = MetaWinAnalysis.PHYLOGENETIC_MA
+    options.effect_data = data.cols[1]
+    options.effect_vars = data.cols[2]
+    options.tip_names = data.cols[0]
+    options.continuous_vars = [data.cols[2]]
+    options.randomize_model = 999
+    options.randomize_phylogeny = 999
+    options.random_seed = 17
+    output, _, _ = MetaWinAnalysis.do_meta_analysis(data, options, 4, tree=tree)
+    print_test_output(output)
+    assert output == MetaWinAnalysis.do_meta_analysis(data, options, 4, tree=tree)[0]
+    options.tree_gls = True
+    output, _, _ = MetaWinAnalysis.do_meta_analysis(data, options, 4, tree=tree)
+    print_test_output(output)
+
+
+def test_phylogenetic_single_study():
+    """
+    an analysis with a single study in the tree must report too few studies rather than fail building the phylogeny
+    """
+    data, _ = import_test_data("herbivore_data.txt")
+    tree = MetaWinTree.read_newick_tree("(Betula_pendula:1,Quercus_absent:1);")
+    options = MetaWinAnalysis.MetaAnalysisOptions()
+    options.structure = MetaWinAnalysis.PHYLOGENETIC_MA
+    options.effect_data = data.cols[1]
+    options.effect_vars = data.cols[2]
+    options.tip_names = data.cols[0]
+    for tree_gls in (False, True):
+        options.tree_gls = tree_gls
+        output, _, _ = MetaWinAnalysis.do_meta_analysis(data, options, 4, tree=tree)
+        print_test_output(output)
+        assert any(get_text("Fewer than two studies were valid for analysis") in str(block) for block in output)
+    assert MetaWinPhylogenetics.study_tree(["Betula_pendula"],
+                                           MetaWinPhylogenetics.pruned_phylogeny(["Betula_pendula"], tree)) is None
+
+
+def test_phylogenetic_tree_sample(tmp_path):
+    data, _ = import_test_data("herbivore_data.txt")
+    with open("herbivore_tree.txt", "r") as infile:
+        newick_str = infile.read()
+    rng = numpy.random.default_rng(5)
+    trees = []
+    for _ in range(4):
+        tree = MetaWinTree.read_newick_tree(newick_str)
+        tree.tree.branch_lengths = [b * rng.uniform(0.5, 1.5) for b in tree.tree.branch_lengths]
+        trees.append(tree)
+    tree_file = tmp_path / "tree_sample.txt"
+    with open(tree_file, "w") as outfile:
+        for tree in trees:
+            outfile.write(tree.output_newick("0.6f") + "\n")
+
+    options = MetaWinAnalysis.MetaAnalysisOptions()
+    options.structure = MetaWinAnalysis.PHYLOGENETIC_MA
+    options.effect_data = data.cols[1]
+    options.effect_vars = data.cols[2]
+    options.tip_names = data.cols[0]
+    options.continuous_vars = [data.cols[2]]
+    options.random_effects = True
+    options.tree_sample = True
+    output, _, _ = MetaWinAnalysis.do_meta_analysis(data, options, 4, tree=trees[0], tree_file=str(tree_file))
+    print_test_output(output)
+
+    # each tree in the file must give the same fit as when analyzed on its own
+    with open(tree_file, "r") as infile:
+        file_trees = list(MetaWinTree.read_trees(infile))
+    extracted = MetaWinAnalysisFunctions.extract_analysis_data(data, options.effect_data, options.effect_vars,
+                                                               number_cols=tuple(options.continuous_vars),
+                                                               tip_col=options.tip_names,
+                                                               tree_tips=trees[0].tip_names())
+    x_data, _, _ = MetaWinAnalysisFunctions.glm_design_matrix(extracted, options.continuous_vars, [])
+    args = (extracted.tips, extracted.e, x_data, extracted.v, True, False)
+    fits = MetaWinResampling.run_tasks(MetaWinPhylogenetics.fit_sample_tree, iter(file_trees), args, n_workers=1)
+    assert len(fits) == 4
+    for tree, fit in zip(file_trees, fits):
+        p_matrix = MetaWinPhylogenetics.phylogenetic_correlation(extracted.tips, tree)
+        qm, qe, beta, _, pooled_var, _ = MetaWinPhylogenetics.phylogenetic_glm(extracted.e, x_data, extracted.v,
+                                                                               p_matrix, True)
+        assert numpy.allclose(fit[2], beta)
+        assert numpy.allclose((fit[0], fit[1], fit[3]), (qm, qe, pooled_var))
+    parallel_fits = MetaWinResampling.run_tasks(MetaWinPhylogenetics.fit_sample_tree, iter(file_trees), args,
+                                                n_workers=2)
+    for fit, parallel_fit in zip(fits, parallel_fits):
+        assert numpy.allclose(fit[2], parallel_fit[2])
+    tree_fits = MetaWinResampling.run_tasks(MetaWinPhylogenetics.fit_sample_tree, iter(file_trees),
+                                            args[:-1] + (True,), n_workers=1)
+    for fit, tree_fit in zip(fits, tree_fits):
+        assert numpy.allclose(fit[2], tree_fit[2])
+
+
 def test_phylogenetic_glm_simple():
     data, _ = import_test_data("herbivore_data.txt")
     with open("herbivore_tree.txt", "r") as infile: